@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Benchmark the md_to_pdf pipeline on synthetic reports and catch regressions.
+
+Each size renders a report shaped like the inconsistencies report (summary
+table, sections of h2 + paragraphs + note box, courses of h3 + table, page
+header/footer) with that many table rows in total. Every size runs in a
+fresh process so its peak RSS is its own. Wall time, peak memory and PDF
+size are saved as JSON and compared with a stored baseline.
+
+Usage:
+    python bench_pdf.py                        # 10, 1k, 10k, 100k rows vs bench_baseline.json
+    python bench_pdf.py --sizes 10 1000        # quick run
+    python bench_pdf.py --save-baseline        # record the current numbers as the baseline
+    python bench_pdf.py --max-time 0.25 --max-memory 0.1 --max-size 0.02
+    python bench_pdf.py --sizes 100000 --parallel 4   # section-parallel layout (pdf_parallel.py)
+    python bench_pdf.py --toc                  # with a table of contents (pdf_toc.py)
+
+Exits with status 1 when any metric regresses past its threshold. Timings
+are only comparable on the machine the baseline was recorded on.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import md_to_pdf
+
+default_baseline = os.path.join(os.path.dirname(__file__), "bench_baseline.json")
+DEFAULT_SIZES = (10, 1000, 10000, 100000)
+
+# Allowed growth over the baseline before a metric counts as a regression
+DEFAULT_THRESHOLDS = {"seconds": 0.20, "peak_rss_mb": 0.20, "bytes": 0.05}
+
+COURSES = ["Infantil 4", "Infantil 5", "Primer de Primària", "Tercer de Primària",
+           "Quart de Primària", "Sisè de Primària", "Primer d'ESO", "Quart d'ESO"]
+DETAILS = ["—", "Dislèxia. Logopeda setmanal.",
+           "Nouvingut del Marroc (maig 2025). No parla català ni castellà. Cal PI nouvingut 25/26."]
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# SYNTHETIC REPORT
+# ═══════════════════════════════════════════════════════════════════════
+def synthetic_blocks(rows, seed=1):
+    """md_to_pdf blocks of a report with ``rows`` table rows over three sections."""
+    rnd = random.Random(seed)
+    per_section = [rows // 3 + (1 if i < rows % 3 else 0) for i in range(3)]
+
+    yield ("heading", 1, "Informe d'inconsistències (benchmark)")
+    yield ("paragraph", ["**Data**: 22 de febrer de 2026", "**Curs escolar**: 2024-2025 → 2025-2026"])
+    yield ("hr",)
+    yield ("heading", 2, "Resum")
+    yield ("table", ["Inconsistència", "Alumnes afectats"],
+           [[f"{i + 1}. Secció sintètica {i + 1}", str(n)] for i, n in enumerate(per_section)])
+
+    for section, count in enumerate(per_section, 1):
+        yield ("hr",)
+        yield ("heading", 2, f"{section}. Secció sintètica amb {count} alumnes")
+        yield ("paragraph", ["Aquests alumnes consten a la base de dades de Clickedu però **no apareixen** "
+                             "a cap dels Excels de traspàs de tutories."])
+        yield ("quote", ["**Nota**: Dades generades per al benchmark; la forma imita l'informe real."])
+        yield ("paragraph", ["**Acció necessària**: Cap, és un informe de proves."])
+        groups = [count // len(COURSES) + (1 if i < count % len(COURSES) else 0) for i in range(len(COURSES))]
+        for course, n in zip(COURSES, groups):
+            if not n:
+                continue
+            yield ("heading", 3, f"{course} ({n} alumnes)")
+            if section == 3:
+                yield ("table", ["Nom", "Cognoms", "SSD", "NISE", "Mesura NESE", "Detall"], [
+                    [f"Nom{i}", f"Cognom{i % 97} Cognom{i % 13}", rnd.choice(["Sí", "No"]),
+                     rnd.choice(["—", "NISE", "No"]), rnd.choice(["—", "PI", "DUA / MISU"]),
+                     rnd.choice(DETAILS)] for i in range(n)
+                ])
+            else:
+                yield ("table", ["Nom", "Cognoms"],
+                       [[f"Nom{i}", f"Cognom{i % 97} Cognom{i % 13}"] for i in range(n)])
+    yield ("hr",)
+    yield ("paragraph", ["*Informe generat per bench_pdf.py.*"])
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# RUN
+# ═══════════════════════════════════════════════════════════════════════
+def run_size(rows, parallel=None, toc=False):
+    """Render one synthetic report; runs in its own process."""
+    md_to_pdf.get_styles()   # style setup is per process, not per render
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        if parallel:
+            from pdf_parallel import render_parallel
+            stats = render_parallel(synthetic_blocks(rows), path, jobs=parallel, toc=toc)
+        else:
+            stats = md_to_pdf.render_blocks(synthetic_blocks(rows), path, toc=toc)
+        seconds = time.perf_counter() - start
+        return {"rows": rows, "seconds": round(seconds, 3), "peak_rss_mb": round(md_to_pdf.peak_rss_mb(), 1),
+                "bytes": stats["bytes"], "pages": stats["pages"]}
+    finally:
+        os.unlink(path)
+
+
+def run_suite(sizes, repeat=1, parallel=None, toc=False):
+    """Best of ``repeat`` runs per size, each run in a fresh spawned process."""
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for rows in sizes:
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+                runs.append(pool.submit(run_size, rows, parallel, toc).result())
+        best = min(runs, key=lambda r: r["seconds"])
+        best["peak_rss_mb"] = min(r["peak_rss_mb"] for r in runs)
+        best["rows_per_s"] = round(rows / best["seconds"], 1)
+        results.append(best)
+        print(f"{rows:>7} rows  {best['seconds']:>8.2f}s  {best['peak_rss_mb']:>7.1f} MB  "
+              f"{best['bytes'] / 1024:>9.1f} KB  {best['pages']:>5} pages", flush=True)
+    return results
+
+
+def compare(results, baseline, thresholds):
+    """Regression messages for every metric that grew past its threshold."""
+    previous = {r["rows"]: r for r in baseline.get("results", [])}
+    problems = []
+    for r in results:
+        base = previous.get(r["rows"])
+        if base is None:
+            continue
+        for metric, limit in thresholds.items():
+            if not base.get(metric):
+                continue
+            change = r[metric] / base[metric] - 1
+            if change > limit:
+                problems.append(f"{r['rows']} rows: {metric} {base[metric]} -> {r[metric]} "
+                                f"(+{change:.0%}, limit +{limit:.0%})")
+    return problems
+
+
+def environment(parallel=None, toc=False):
+    env = {"python": platform.python_version(), "machine": platform.machine(),
+           "system": platform.system(), "cpus": os.cpu_count(),
+           "renderer": md_to_pdf.RENDERER_VERSION}
+    if parallel:
+        env["parallel"] = parallel
+    if toc:
+        env["toc"] = True
+    return env
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="table rows per report")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per size, the fastest is kept")
+    parser.add_argument("--baseline", default=default_baseline, help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("-o", "--output", help="write the results JSON here")
+    parser.add_argument("--max-time", type=float, default=DEFAULT_THRESHOLDS["seconds"],
+                        help="allowed wall time growth (fraction, default 0.20)")
+    parser.add_argument("--max-memory", type=float, default=DEFAULT_THRESHOLDS["peak_rss_mb"],
+                        help="allowed peak RSS growth (fraction, default 0.20)")
+    parser.add_argument("--max-size", type=float, default=DEFAULT_THRESHOLDS["bytes"],
+                        help="allowed PDF size growth (fraction, default 0.05)")
+    parser.add_argument("--parallel", type=int, metavar="JOBS",
+                        help="lay each report out across JOBS processes (not compared with a sequential baseline)")
+    parser.add_argument("--toc", action="store_true",
+                        help="render each report with a table of contents (not compared with a baseline without)")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment(args.parallel, args.toc),
+              "results": run_suite(args.sizes, args.repeat, args.parallel, args.toc)}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Results written: {os.path.abspath(args.output)}")
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+            fh.write("\n")
+        print(f"Baseline saved: {os.path.abspath(args.baseline)}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with (run with --save-baseline)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    if baseline["environment"].get("parallel") != args.parallel:
+        print("Baseline was recorded with a different --parallel setting; not compared")
+        return 0
+    if baseline["environment"].get("toc", False) != args.toc:
+        print("Baseline was recorded with a different --toc setting; not compared")
+        return 0
+    thresholds = {"seconds": args.max_time, "peak_rss_mb": args.max_memory, "bytes": args.max_size}
+    problems = compare(report["results"], baseline, thresholds)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if not problems:
+        print("No regressions against the baseline")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
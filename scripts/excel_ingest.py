@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""Stream student rows out of the traspàs de tutories and Alumnat NESE workbooks.
+
+Workbooks are opened read-only and every sheet is consumed as a row
+generator: the header row is located and mapped to the known columns once
+per sheet, and each student row becomes a single ``Record`` tuple. Nothing
+but the row being read is held in memory, so a whole school year of
+workbooks streams through in bounded memory.
+
+Usable as a library::
+
+    from excel_ingest import iter_records
+    for record in iter_records(["../docs/examples/PRI_Alumnat NESE 25-26.xlsx"]):
+        print(record.course.label, record.name, record.nise)
+
+or from the command line, rendering the workbooks straight to PDF tables::
+
+    python excel_ingest.py ../docs/examples -o /tmp/workbooks.pdf
+    python excel_ingest.py "../docs/examples/*NESE*.xlsx" --stats
+"""
+
+from typing import NamedTuple
+import argparse
+import glob
+import os
+import re
+import sys
+import unicodedata
+
+RE_NON_ALPHA = re.compile(r"[^A-Z]+")
+RE_NON_ALNUM = re.compile(r"[^A-Z0-9]+")
+
+# Rows above the header (titles, instructions) that are searched for it
+HEADER_SEARCH_ROWS = 15
+
+# Names that are notes left in the name column, not students
+GARBAGE_PATTERNS = [re.compile(p, re.I) for p in (r"^\* ", r"^si cal", r"^renovar", r"^model de pi")]
+
+
+def fold(text, keep=RE_NON_ALPHA):
+    """Upper case, accents removed, anything but letters collapsed to single spaces."""
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return keep.sub(" ", text.upper()).strip()
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# COURSES
+# ═══════════════════════════════════════════════════════════════════════
+ETAPES = ("infantil", "primaria", "eso")
+ETAPA_SHORT = {"infantil": "INF", "primaria": "PRI", "eso": "ESO"}
+ORDINALS = {1: "Primer", 2: "Segon", 3: "Tercer", 4: "Quart", 5: "Cinquè", 6: "Sisè"}
+RE_LEVEL = re.compile(r"\b([IP])?\s?(\d)")
+
+
+class Course(NamedTuple):
+    etapa: str
+    level: int
+
+    @property
+    def label(self):
+        if self.etapa == "infantil":
+            return f"Infantil {self.level}"
+        if self.etapa == "primaria":
+            return f"{ORDINALS[self.level]} de Primària"
+        return f"{ORDINALS[self.level]} d'ESO"
+
+    @property
+    def order(self):
+        return (ETAPES.index(self.etapa), self.level)
+
+
+def parse_course(text, etapa=None):
+    """Course of a class or sheet name: "4t ESO B", "I4", "P5", "3r a 4t" (-> 4t).
+
+    For "from a to" sheet names the target course is returned; when the
+    level goes down (e.g. "I5 a 1r", "6è a 1r") the target is in the next etapa.
+    """
+    folded = fold(text, RE_NON_ALNUM)
+    parts = re.split(r" A | I ", folded)
+    if len(parts) == 2 and all(RE_LEVEL.search(part) for part in parts):
+        source, target = parse_course(parts[0], etapa), parse_course(parts[-1], etapa)
+        if source and target and target.order <= source.order and target.etapa == source.etapa:
+            following = ETAPES.index(source.etapa) + 1
+            if following < len(ETAPES):
+                return Course(ETAPES[following], target.level)
+        return target
+    m = RE_LEVEL.search(folded)
+    if not m:
+        return None
+    prefix, level = m.group(1), int(m.group(2))
+    if prefix in ("I", "P") and 3 <= level <= 5:
+        return Course("infantil", level)
+    if "ESO" in folded:
+        return Course("eso", level)
+    if "PRI" in folded:
+        return Course("primaria", level)
+    if etapa == "infantil" and level > 2:
+        return Course("infantil", level)
+    if etapa in ETAPES and etapa != "infantil":
+        return Course(etapa, level)
+    return Course("primaria", level)
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# RECORDS
+# ═══════════════════════════════════════════════════════════════════════
+class Record(NamedTuple):
+    """One student row. Columns the workbook kind does not have are None."""
+    kind: str        # "traspass" or "nese"
+    etapa: str
+    course: Course
+    name: str
+    graella_nese: object = None
+    dades_familiars: object = None
+    academic: object = None
+    observacions: object = None
+    nise: object = None
+    ssd: object = None
+    mesura_nese: object = None
+    dades_rellevants: object = None
+
+    @property
+    def source(self):
+        return f"{'Traspàs' if self.kind == 'traspass' else 'NESE'} {ETAPA_SHORT[self.etapa]}"
+
+
+COLUMN_FIELDS = Record._fields[4:]
+
+# Header tests per workbook kind, on the folded header text; "name" must be first
+COLUMNS = {
+    "traspass": {
+        "name": lambda h: h == "NOM",
+        "graella_nese": lambda h: "GRAELLA NESE" in h,
+        "dades_familiars": lambda h: "DADES FAMILIARS" in h,
+        "academic": lambda h: h.startswith("ACADEMIC"),
+        "observacions": lambda h: "OBSERVAC" in h,
+    },
+    "nese": {
+        "name": lambda h: "ALUMNE" in h or h == "NOM",
+        "nise": lambda h: "NISE" in h,
+        "ssd": lambda h: "SSD" in h,
+        "mesura_nese": lambda h: "MESUR" in h and "NESE" in h,
+        "observacions": lambda h: "OBSERVAC" in h,
+        "dades_rellevants": lambda h: "DADES RELLEVANTS" in h,
+    },
+}
+
+# Rows between the header and the first student (NESE headers span two rows)
+HEADER_DEPTH = {"traspass": 0, "nese": 1}
+
+COLUMN_TITLES = {
+    "name": "Nom",
+    "graella_nese": "Graella NESE",
+    "dades_familiars": "Dades familiars",
+    "academic": "Acadèmic",
+    "observacions": "Observacions",
+    "nise": "NISE",
+    "ssd": "SSD",
+    "mesura_nese": "Mesura NESE",
+    "dades_rellevants": "Dades rellevants",
+}
+
+
+def workbook_kind(path):
+    """("traspass" | "nese", etapa) from the workbook file name."""
+    name = fold(os.path.basename(path))
+    kind = "nese" if "NESE" in name else "traspass"
+    if "INF" in name:
+        etapa = "infantil"
+    elif "PRI" in name:
+        etapa = "primaria"
+    else:
+        etapa = "eso"
+    return kind, etapa
+
+
+def map_columns(header, columns):
+    """{field: column index} for the header cells that pass a column test."""
+    mapping = {}
+    for index, value in enumerate(header):
+        if value is None:
+            continue
+        h = fold(str(value))
+        for field, test in columns.items():
+            if field not in mapping and h and test(h):
+                mapping[field] = index
+    return mapping
+
+
+def iter_sheet(rows, kind, etapa, course):
+    """Records of one sheet, given its rows as a generator of value tuples."""
+    columns = COLUMNS[kind]
+    getters = None
+    skip = HEADER_DEPTH[kind]
+    for number, row in enumerate(rows):
+        if getters is None:
+            if number >= HEADER_SEARCH_ROWS:
+                return
+            mapping = map_columns(row, columns)
+            if "name" in mapping:
+                name_at = mapping["name"]
+                getters = tuple(mapping.get(field) for field in COLUMN_FIELDS)
+            continue
+        if skip:
+            skip -= 1
+            continue
+        if name_at >= len(row) or row[name_at] is None:
+            continue
+        name = str(row[name_at]).strip()
+        if not name or any(p.search(name) for p in GARBAGE_PATTERNS):
+            continue
+        if any(isinstance(v, str) and "exemple" in v.lower() for v in row[name_at + 1:]):
+            continue
+        width = len(row)
+        yield Record(kind, etapa, course, name,
+                     *(row[i] if i is not None and i < width else None for i in getters))
+
+
+def iter_workbook(path):
+    """Stream the records of one workbook, sheet by sheet, in read-only mode."""
+    import openpyxl
+
+    kind, etapa = workbook_kind(path)
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            course = parse_course(ws.title, etapa)
+            yield from iter_sheet(ws.iter_rows(values_only=True), kind, etapa, course)
+    finally:
+        wb.close()
+
+
+def expand_workbooks(patterns):
+    """Resolve files, directories (every .xlsx in them) and glob patterns, in order."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths.extend(sorted(glob.glob(os.path.join(pattern, "*.xlsx"))))
+        elif glob.has_magic(pattern):
+            paths.extend(sorted(glob.glob(pattern)))
+        else:
+            paths.append(pattern)
+    return [p for p in paths if not os.path.basename(p).startswith("~$")]   # Excel lock files
+
+
+def iter_records(paths):
+    for path in paths:
+        yield from iter_workbook(path)
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# PDF TABLES
+# ═══════════════════════════════════════════════════════════════════════
+def cell_text(value):
+    if value is None:
+        return ""
+    if value is True:
+        return "Sí"
+    if value is False:
+        return "No"
+    return " ".join(str(value).split())
+
+
+def workbook_blocks(paths):
+    """md_to_pdf blocks listing every workbook, one table per sheet/course.
+
+    Rows go straight from the sheet generator into the table block; no
+    markdown is produced along the way.
+    """
+    yield ("heading", 1, "Excels de traspàs i NESE")
+    for path in paths:
+        kind, _ = workbook_kind(path)
+        fields = ("name",) + tuple(f for f in COLUMN_FIELDS if f in COLUMNS[kind])
+        yield ("heading", 2, os.path.splitext(os.path.basename(path))[0].strip())
+        course, rows = None, []
+        for record in iter_workbook(path):
+            if record.course != course and rows:
+                yield from _course_table(course, fields, rows)
+                rows = []
+            course = record.course
+            rows.append([cell_text(getattr(record, f)) for f in fields])
+        if rows:
+            yield from _course_table(course, fields, rows)
+
+
+def _course_table(course, fields, rows):
+    label = course.label if course else "Curs desconegut"
+    yield ("heading", 3, f"{label} ({len(rows)})")
+    yield ("table", [COLUMN_TITLES[f] for f in fields], rows)
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("workbooks", nargs="+", help=".xlsx files, directories or glob patterns")
+    parser.add_argument("-o", "--output", help="render every sheet as PDF tables")
+    parser.add_argument("--stats", action="store_true", help="print record counts per workbook")
+    args = parser.parse_args(argv)
+
+    paths = expand_workbooks(args.workbooks)
+    if not paths:
+        parser.error("no workbooks found")
+    if args.stats or not args.output:
+        for path in paths:
+            count = sum(1 for _ in iter_workbook(path))
+            print(f"{count:>6}  {os.path.basename(path)}")
+    if args.output:
+        import md_to_pdf
+
+        stats = md_to_pdf.render_blocks(workbook_blocks(paths), args.output)
+        print(f"PDF generated: {os.path.abspath(args.output)} ({stats['pages']} pages)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,194 +1,320 @@
 #!/usr/bin/env python3
-"""Convert the inconsistencies report from markdown to a formatted PDF."""
-
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import mm, cm
-from reportlab.lib.colors import HexColor, black, white
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
-from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
-    PageBreak, HRFlowable, KeepTogether
-)
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+"""Convert markdown documents (by default the inconsistencies report) to formatted PDFs.
+
+Usable as a library::
+
+    from md_to_pdf import render
+    stats = render("docs/PRD.md", "docs/PRD.pdf")
+
+or from the command line::
+
+    python md_to_pdf.py [source.md] [-o output.pdf]
+    python md_to_pdf.py ../docs -j 4            # every .md under docs/, in parallel
+    python md_to_pdf.py "../docs/*.md" --out-dir /tmp/pdfs
+    python md_to_pdf.py ../docs --no-cache      # force a full rebuild
+    python md_to_pdf.py --profile report.json --trace trace.json
+    python md_to_pdf.py --font DejaVuSans.ttf DejaVuSans-Bold.ttf
+    python md_to_pdf.py big.md --parallel -j 8  # lay out one document's sections in parallel
+    python md_to_pdf.py ../docs --toc           # with a table of contents
+    python md_to_pdf.py --watch                 # re-render on every save (see render_watch.py)
+    python md_to_pdf.py --output-profile screen # smaller images, for email (see PROFILES)
+    python md_to_pdf.py --deterministic         # byte-identical PDFs for identical sources
+
+Renders go through a content-addressed cache (see render_cache.py): an
+unchanged document is copied from the cache outright, and when only some
+sections changed the flowables of the others are reused.
+
+Importing the module has no side effects: reportlab is only loaded when a
+document is actually rendered, and the paragraph styles of each theme are
+built once per process and reused by every later render.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import NamedTuple
+from xml.sax.saxutils import escape
+import argparse
+import glob
+import io
 import os
+import re
+import sys
+import time
+import zlib
+
+from render_cache import RenderCache, file_digest, make_key
+
+CM = 72 / 2.54
+
+# Bump when the output changes in a way the module hash would not catch.
+RENDERER_VERSION = "9"
+
+# ── Theme ───────────────────────────────────────────────────────────────
+class Theme(NamedTuple):
+    primary: str = "#1a365d"       # Dark blue
+    secondary: str = "#2b6cb0"     # Medium blue
+    accent: str = "#e53e3e"        # Red for warnings
+    light_bg: str = "#ebf4ff"      # Light blue bg
+    table_header: str = "#2b6cb0"  # Blue header
+    table_alt: str = "#f7fafc"     # Light gray alternating rows
+    note_bg: str = "#fffff0"       # Light yellow for notes
+    note_border: str = "#d69e2e"   # Yellow border
+    border_color: str = "#cbd5e0"  # Gray border
+    text_color: str = "#2d3748"    # Dark gray text
+    muted: str = "#718096"         # Muted gray
+    note_text: str = "#744210"     # Dark yellow note text
+    margin: float = 2 * CM
+    fonts: tuple = ()              # TTF paths: regular[, bold[, italic[, bold italic]]]
+
+
+DEFAULT_THEME = Theme()
+
+
+# ── Output profiles ─────────────────────────────────────────────────────
+# How a document is written, as opposed to how it looks (Theme). Content
+# streams are always Flate-compressed; reportlab's default ASCII85 layer on
+# top only makes them 7-bit clean, at +25% per stream and a pure-Python
+# encoder. Images are resampled for the size they are drawn at (image_for).
+class OutputProfile(NamedTuple):
+    name: str
+    a85: bool = False                 # ASCII85 over Flate (7-bit clean)
+    image_dpi: int = 0                # downsample images drawn above this resolution (0: keep)
+    image_quality: int = 0            # JPEG quality for recompressed images (0: lossless)
+    deterministic: bool = False       # fixed timestamps and /ID: the same input gives the same bytes
+                                      # (and no build date unless SOURCE_DATE_EPOCH, see build_date)
 
-# ── Colors ──────────────────────────────────────────────────────────────
-PRIMARY = HexColor("#1a365d")       # Dark blue
-SECONDARY = HexColor("#2b6cb0")     # Medium blue
-ACCENT = HexColor("#e53e3e")        # Red for warnings
-LIGHT_BG = HexColor("#ebf4ff")      # Light blue bg
-TABLE_HEADER = HexColor("#2b6cb0")  # Blue header
-TABLE_ALT = HexColor("#f7fafc")     # Light gray alternating rows
-NOTE_BG = HexColor("#fffff0")       # Light yellow for notes
-NOTE_BORDER = HexColor("#d69e2e")   # Yellow border
-BORDER_COLOR = HexColor("#cbd5e0")  # Gray border
-TEXT_COLOR = HexColor("#2d3748")     # Dark gray text
-MUTED = HexColor("#718096")         # Muted gray
+
+PROFILES = {
+    "screen": OutputProfile("screen", image_dpi=150, image_quality=80),   # email, on-screen reading
+    "print": OutputProfile("print", image_dpi=300),
+    "archive": OutputProfile("archive", deterministic=True),              # full images, reproducible
+}
+DEFAULT_PROFILE = PROFILES["print"]
+# Resampling adds in-between colors that deflate worse than flat artwork: it
+# only pays off when it drops a good share of the pixels
+RESAMPLE_BELOW = 0.75
 
 # ── Page setup ──────────────────────────────────────────────────────────
-PAGE_W, PAGE_H = A4
-MARGIN = 2 * cm
+PAGE_W, PAGE_H = 210 * CM / 10, 297 * CM / 10   # A4
+TOP_MARGIN = 2.5 * CM
+BOTTOM_MARGIN = 2 * CM
 
-output_path = os.path.join(os.path.dirname(__file__), "..", "docs", "inconsistències_BD.pdf")
+default_source = os.path.join(os.path.dirname(__file__), "..", "docs", "inconsistències_BD.md")
+header_logo = os.path.join(os.path.dirname(__file__), "..", "docs", "Logo-El-Turo.png")
 
-doc = SimpleDocTemplate(
-    output_path,
-    pagesize=A4,
-    leftMargin=MARGIN,
-    rightMargin=MARGIN,
-    topMargin=2.5 * cm,
-    bottomMargin=2 * cm,
-)
 
 # ── Styles ──────────────────────────────────────────────────────────────
-styles = getSampleStyleSheet()
-
-style_title = ParagraphStyle(
-    "CustomTitle",
-    parent=styles["Title"],
-    fontSize=22,
-    textColor=PRIMARY,
-    spaceAfter=6,
-    leading=26,
-)
-
-style_subtitle = ParagraphStyle(
-    "CustomSubtitle",
-    parent=styles["Normal"],
-    fontSize=11,
-    textColor=MUTED,
-    spaceAfter=4,
-)
-
-style_h1 = ParagraphStyle(
-    "CustomH1",
-    parent=styles["Heading1"],
-    fontSize=16,
-    textColor=PRIMARY,
-    spaceBefore=20,
-    spaceAfter=8,
-    borderWidth=0,
-    borderPadding=0,
-)
-
-style_h2 = ParagraphStyle(
-    "CustomH2",
-    parent=styles["Heading2"],
-    fontSize=12,
-    textColor=SECONDARY,
-    spaceBefore=14,
-    spaceAfter=6,
-)
-
-style_body = ParagraphStyle(
-    "CustomBody",
-    parent=styles["Normal"],
-    fontSize=9,
-    textColor=TEXT_COLOR,
-    leading=13,
-    alignment=TA_JUSTIFY,
-    spaceAfter=6,
-)
-
-style_note = ParagraphStyle(
-    "CustomNote",
-    parent=styles["Normal"],
-    fontSize=9,
-    textColor=HexColor("#744210"),
-    leading=13,
-    leftIndent=8,
-)
-
-style_action = ParagraphStyle(
-    "CustomAction",
-    parent=styles["Normal"],
-    fontSize=9,
-    textColor=ACCENT,
-    leading=13,
-    spaceAfter=8,
-)
-
-style_table_cell = ParagraphStyle(
-    "TableCell",
-    parent=styles["Normal"],
-    fontSize=8,
-    textColor=TEXT_COLOR,
-    leading=11,
-)
-
-style_table_header = ParagraphStyle(
-    "TableHeader",
-    parent=styles["Normal"],
-    fontSize=8,
-    textColor=white,
-    leading=11,
-)
-
-style_footer = ParagraphStyle(
-    "Footer",
-    parent=styles["Normal"],
-    fontSize=8,
-    textColor=MUTED,
-    alignment=TA_CENTER,
-)
-
-story = []
-
-
-def add_hr():
-    story.append(Spacer(1, 4))
-    story.append(HRFlowable(width="100%", thickness=1, color=BORDER_COLOR, spaceAfter=8))
-
-
-def make_table(headers, rows, col_widths=None):
-    """Create a styled table."""
-    avail_width = PAGE_W - 2 * MARGIN
-
-    header_cells = [Paragraph(f"<b>{h}</b>", style_table_header) for h in headers]
-    data = [header_cells]
+@lru_cache(maxsize=None)
+def get_styles(theme=DEFAULT_THEME):
+    """Build the colors and paragraph styles of a theme (once per process)."""
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.colors import HexColor, white
+    from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
 
-    for row in rows:
-        data.append([Paragraph(str(cell), style_table_cell) for cell in row])
+    st = SimpleNamespace(theme=theme, avail=PAGE_W - 2 * theme.margin, list_styles={})
+    for field in theme._fields:
+        if field not in ("margin", "fonts"):
+            setattr(st, field, HexColor(getattr(theme, field)))
+
+    styles = getSampleStyleSheet()
+
+    st.style_title = ParagraphStyle(
+        "CustomTitle",
+        parent=styles["Title"],
+        fontSize=22,
+        textColor=st.primary,
+        spaceAfter=6,
+        leading=26,
+    )
+
+    st.style_subtitle = ParagraphStyle(
+        "CustomSubtitle",
+        parent=styles["Normal"],
+        fontSize=11,
+        textColor=st.muted,
+        spaceAfter=4,
+    )
+
+    st.style_h1 = ParagraphStyle(
+        "CustomH1",
+        parent=styles["Heading1"],
+        fontSize=16,
+        textColor=st.primary,
+        spaceBefore=20,
+        spaceAfter=8,
+        borderWidth=0,
+        borderPadding=0,
+    )
+
+    st.style_h2 = ParagraphStyle(
+        "CustomH2",
+        parent=styles["Heading2"],
+        fontSize=12,
+        textColor=st.secondary,
+        spaceBefore=14,
+        spaceAfter=6,
+    )
+
+    st.style_body = ParagraphStyle(
+        "CustomBody",
+        parent=styles["Normal"],
+        fontSize=9,
+        textColor=st.text_color,
+        leading=13,
+        alignment=TA_JUSTIFY,
+        spaceAfter=6,
+    )
+
+    st.style_note = ParagraphStyle(
+        "CustomNote",
+        parent=styles["Normal"],
+        fontSize=9,
+        textColor=st.note_text,
+        leading=13,
+        leftIndent=8,
+    )
+
+    st.style_action = ParagraphStyle(
+        "CustomAction",
+        parent=styles["Normal"],
+        fontSize=9,
+        textColor=st.accent,
+        leading=13,
+        spaceAfter=8,
+    )
+
+    st.style_list = ParagraphStyle(
+        "CustomList",
+        parent=st.style_body,
+        alignment=TA_LEFT,
+        leftIndent=14,
+        bulletIndent=4,
+        spaceAfter=3,
+    )
+
+    st.style_code = ParagraphStyle(
+        "CustomCode",
+        parent=styles["Code"],
+        fontSize=7.5,
+        leading=9.5,
+        textColor=st.text_color,
+        backColor=st.light_bg,
+        borderPadding=4,
+        spaceBefore=4,
+        spaceAfter=8,
+    )
+
+    st.style_table_cell = ParagraphStyle(
+        "TableCell",
+        parent=styles["Normal"],
+        fontSize=8,
+        textColor=st.text_color,
+        leading=11,
+    )
+
+    st.style_table_header = ParagraphStyle(
+        "TableHeader",
+        parent=styles["Normal"],
+        fontSize=8,
+        textColor=white,
+        leading=11,
+    )
+
+    st.style_toc_title = ParagraphStyle("TocTitle", parent=st.style_h1)   # not bookmarked itself
+
+    st.style_toc = ParagraphStyle(
+        "TocEntry",
+        parent=styles["Normal"],
+        fontSize=9.5,
+        textColor=st.text_color,
+        leading=15,
+    )
+
+    st.style_toc_sub = ParagraphStyle(
+        "TocEntrySub",
+        parent=st.style_toc,
+        fontSize=8.5,
+        leading=13,
+        leftIndent=14,
+        textColor=st.muted,
+    )
+
+    st.style_footer = ParagraphStyle(
+        "Footer",
+        parent=styles["Normal"],
+        fontSize=8,
+        textColor=st.muted,
+        alignment=TA_CENTER,
+    )
+
+    st.font, st.font_bold = "Helvetica", "Helvetica-Bold"
+    if theme.fonts:
+        import pdf_fonts
+
+        names = pdf_fonts.register_family(theme.fonts)
+        st.font, st.font_bold = names["regular"], names["bold"]
+        for style in vars(st).values():
+            if isinstance(style, ParagraphStyle) and style.fontName in pdf_fonts.BASE14_VARIANTS:
+                style.fontName = names[pdf_fonts.BASE14_VARIANTS[style.fontName]]
+    return st
+
+
+def list_style(st, depth):
+    if depth not in st.list_styles:
+        from reportlab.lib.styles import ParagraphStyle
+
+        st.list_styles[depth] = ParagraphStyle(
+            f"ListItem{depth}",
+            parent=st.style_list,
+            leftIndent=st.style_list.leftIndent + 12 * depth,
+            bulletIndent=st.style_list.bulletIndent + 12 * depth,
+        )
+    return st.list_styles[depth]
+
+
+def make_table(st, headers, rows, col_widths=None):
+    """Create a styled table.
+
+    Tables longer than pdf_tables.LONG_TABLE_ROWS become a LongTable, which
+    is laid out one page-sized chunk at a time.
+    """
+    from reportlab.platypus import Table, TableStyle
+    import pdf_tables
+    from pdf_tables import (
+        CELL_PADDING, LongTable, make_header_cells, table_cell, table_style_cmds,
+    )
 
     if col_widths is None:
-        col_widths = [avail_width / len(headers)] * len(headers)
+        col_widths = [st.avail / len(headers)] * len(headers)
+    fits = [w - 2 * CELL_PADDING for w in col_widths]
+    header_cells = make_header_cells(st, headers, fits)
 
-    t = Table(data, colWidths=col_widths, repeatRows=1)
+    if len(rows) > pdf_tables.LONG_TABLE_ROWS:
+        return LongTable(st, header_cells, rows, col_widths)
+
+    data = [header_cells]
+    cell_style = st.style_table_cell
+    for row in rows:
+        data.append([table_cell(str(cell), cell_style, st.font, fits[i])
+                     for i, cell in enumerate(row)])
 
-    table_style = [
-        ("BACKGROUND", (0, 0), (-1, 0), TABLE_HEADER),
-        ("TEXTCOLOR", (0, 0), (-1, 0), white),
-        ("FONTSIZE", (0, 0), (-1, 0), 8),
-        ("BOTTOMPADDING", (0, 0), (-1, 0), 6),
-        ("TOPPADDING", (0, 0), (-1, 0), 6),
-        ("LEFTPADDING", (0, 0), (-1, -1), 6),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 6),
-        ("GRID", (0, 0), (-1, -1), 0.5, BORDER_COLOR),
-        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-        ("FONTSIZE", (0, 1), (-1, -1), 8),
-        ("TOPPADDING", (0, 1), (-1, -1), 4),
-        ("BOTTOMPADDING", (0, 1), (-1, -1), 4),
-    ]
-
-    # Alternating row colors
-    for i in range(1, len(data)):
-        if i % 2 == 0:
-            table_style.append(("BACKGROUND", (0, i), (-1, i), TABLE_ALT))
-
-    t.setStyle(TableStyle(table_style))
+    t = Table(data, colWidths=col_widths, repeatRows=1)
+    t.setStyle(TableStyle(table_style_cmds(st)))
     return t
 
 
-def make_note_box(text):
+def make_note_box(st, text):
     """Create a note box with yellow background."""
-    avail = PAGE_W - 2 * MARGIN
-    data = [[Paragraph(text, style_note)]]
-    t = Table(data, colWidths=[avail - 4])
+    from reportlab.platypus import Paragraph, Table, TableStyle
+
+    data = [[Paragraph(text, st.style_note)]]
+    t = Table(data, colWidths=[st.avail - 4])
     t.setStyle(TableStyle([
-        ("BACKGROUND", (0, 0), (-1, -1), NOTE_BG),
-        ("BOX", (0, 0), (-1, -1), 1, NOTE_BORDER),
+        ("BACKGROUND", (0, 0), (-1, -1), st.note_bg),
+        ("BOX", (0, 0), (-1, -1), 1, st.note_border),
         ("LEFTPADDING", (0, 0), (-1, -1), 10),
         ("RIGHTPADDING", (0, 0), (-1, -1), 10),
         ("TOPPADDING", (0, 0), (-1, -1), 8),
@@ -198,345 +324,1027 @@ def make_note_box(text):
 
 
 # ═══════════════════════════════════════════════════════════════════════
-# HEADER
+# MARKDOWN TOKENIZER
 # ═══════════════════════════════════════════════════════════════════════
-story.append(Paragraph("Informe d'inconsistències de la Base de Dades", style_title))
-story.append(Paragraph("<b>Escola el Turó</b> — Turonia", style_subtitle))
-story.append(Paragraph("Data: 22 de febrer de 2026 &nbsp; | &nbsp; Curs escolar: 2024-2025 → 2025-2026", style_subtitle))
-story.append(Spacer(1, 6))
-add_hr()
+# Single pass over the source: only the block currently being read is kept
+# in memory, every finished block is yielded as soon as it ends.
 
-# ═══════════════════════════════════════════════════════════════════════
-# SUMMARY TABLE
-# ═══════════════════════════════════════════════════════════════════════
-story.append(Paragraph("Resum", style_h1))
-
-avail = PAGE_W - 2 * MARGIN
-summary_table = make_table(
-    ["Inconsistència", "Alumnes afectats"],
-    [
-        ["1. Alumnes a Clickedu sense dades de traspàs als Excels", "30"],
-        ["2. Alumnes als Excels que no existeixen a Clickedu", "22 (16 persones úniques)"],
-        ["3. Alumnes amb registre NESE sense graella_nese al traspàs", "56"],
-    ],
-    col_widths=[avail * 0.8, avail * 0.2],
-)
-story.append(summary_table)
-story.append(Spacer(1, 6))
-add_hr()
+RE_HEADING = re.compile(r"^(#{1,6})\s+(.*?)(?:\s+#+)?\s*$")   # a closing run needs a space: "C#"
+RE_HR = re.compile(r"^\s{0,3}([-*_])(\s*\1){2,}\s*$")
+RE_TABLE_SEP = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+RE_LIST_ITEM = re.compile(r"^(\s*)([-*+]|\d+[.)])\s+(.*)$")
+RE_FENCE = re.compile(r"^\s*(```|~~~)\s*(\S*)")
+RE_CELL_SPLIT = re.compile(r"(?<!\\)\|")
+
+
+def split_row(line):
+    """Split a pipe-table row into stripped cells (escaped pipes are kept)."""
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    return [cell.strip().replace("\\|", "|") for cell in RE_CELL_SPLIT.split(line)]
+
+
+def iter_blocks(lines):
+    """Tokenize markdown lines into blocks.
+
+    Yields tuples whose first element is the block kind:
+    ("heading", level, text), ("paragraph", lines), ("quote", lines),
+    ("table", headers, rows), ("list_item", depth, marker, text),
+    ("code", text) and ("hr",). report_ir adds the column types to tables
+    as a fourth item, which the PDF does not use.
+    """
+    para, quote, rows = [], [], []
+    header = None       # headers of the table being read
+    candidate = None    # pipe line that may turn out to be a table header
+    item = None         # [depth, marker, text] of the list item being read
+    fence = None        # opening marker of the code block being read
+    code = []
+
+    def close_blocks():
+        nonlocal header, item
+        if para:
+            yield ("paragraph", para[:])
+            para.clear()
+        if quote:
+            yield ("quote", quote[:])
+            quote.clear()
+        if header is not None:
+            yield ("table", header, rows[:])
+            rows.clear()
+            header = None
+        if item is not None:
+            yield ("list_item", *item)
+            item = None
+
+    for raw in lines:
+        line = raw.rstrip("\n").rstrip("\r")
+        stripped = line.strip()
+
+        if fence is not None:
+            if stripped.startswith(fence):
+                yield ("code", "\n".join(code))
+                code.clear()
+                fence = None
+            else:
+                code.append(line)
+            continue
+
+        if candidate is not None:
+            previous, candidate = candidate, None
+            if RE_TABLE_SEP.match(line):
+                yield from close_blocks()
+                header = split_row(previous)
+                continue
+            para.append(previous)
+
+        if header is not None:
+            if stripped.startswith("|"):
+                rows.append(split_row(stripped))
+                continue
+            yield from close_blocks()
+
+        if not stripped:
+            yield from close_blocks()
+            continue
+
+        m = RE_FENCE.match(line)
+        if m:
+            yield from close_blocks()
+            fence = m.group(1)
+            continue
+
+        m = RE_HEADING.match(line)
+        if m:
+            yield from close_blocks()
+            yield ("heading", len(m.group(1)), m.group(2))
+            continue
+
+        if RE_HR.match(line):
+            yield from close_blocks()
+            yield ("hr",)
+            continue
+
+        if stripped.startswith(">"):
+            if not quote:
+                yield from close_blocks()
+            quote.append(stripped[1:].strip())
+            continue
+
+        if stripped.startswith("|") and not para:
+            yield from close_blocks()
+            candidate = stripped
+            continue
+
+        m = RE_LIST_ITEM.match(line)
+        if m:
+            yield from close_blocks()
+            item = [len(m.group(1).expandtabs(4)) // 2, m.group(2), m.group(3)]
+            continue
+
+        if item is not None:
+            item[2] += " " + stripped
+        elif quote:
+            quote[-1] += " " + stripped
+        else:
+            para.append(line)
+
+    if candidate is not None:
+        para.append(candidate)
+    if fence is not None:
+        yield ("code", "\n".join(code))
+    yield from close_blocks()
+
+
+def iter_markdown(blocks):
+    """Inverse of iter_blocks: yield markdown text for each block."""
+    def row(cells):
+        return "| " + " | ".join(str(c).replace("|", "\\|") for c in cells) + " |\n"
+
+    for block in blocks:
+        kind = block[0]
+        if kind == "heading":
+            yield f"{'#' * block[1]} {block[2]}\n\n"
+        elif kind == "paragraph":
+            yield "\n".join(block[1]) + "\n\n"
+        elif kind == "quote":
+            yield "".join(f"> {line}\n" for line in block[1]) + "\n"
+        elif kind == "table":
+            headers, rows = block[1], block[2]   # report_ir tables also carry column types
+            yield row(headers) + row("---" for _ in headers) + "".join(row(r) for r in rows) + "\n"
+        elif kind == "list_item":
+            _, depth, marker, text = block
+            yield f"{'  ' * depth}{marker} {text}\n\n"
+        elif kind == "code":
+            yield f"```\n{block[1]}\n```\n\n"
+        elif kind == "hr":
+            yield "---\n\n"
+
+
+# ── Inline markup ───────────────────────────────────────────────────────
+RE_CODE_SPAN = re.compile(r"(`[^`]+`)")
+RE_BOLD = re.compile(r"\*\*(.+?)\*\*")
+RE_ITALIC = re.compile(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*(?![\w*])")
+RE_LINK = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)")
+RE_INLINE_CHARS = re.compile(r"[`*\[&<>]")
+RE_CODE_SLOT = re.compile(r"\x00(\d+)\x00")   # where convert_inline set a code span aside
+QUOTE_ENTITY = {'"': "&quot;"}
+
+
+def convert_inline(text, code, bold, italic, link):
+    """Apply the markdown span rules to ``text`` with the given templates.
+
+    Code spans are set aside first (``code`` formats their escaped text) so
+    the other rules don't touch their contents, but still apply across them:
+    a bold phrase can contain a code span. ``bold``, ``italic`` and ``link``
+    are re.sub templates (\\1 the text, \\2 the link target). Quotes are
+    escaped too, since the link target lands in an attribute.
+    """
+    if not RE_INLINE_CHARS.search(text):
+        return text
+    spans = []
+
+    def set_aside(match):
+        spans.append(code.format(escape(match.group(1)[1:-1])))
+        return f"\x00{len(spans) - 1}\x00"
+
+    text = escape(RE_CODE_SPAN.sub(set_aside, text), QUOTE_ENTITY)
+    text = RE_BOLD.sub(bold, text)
+    text = RE_ITALIC.sub(italic, text)
+    text = RE_LINK.sub(link, text)
+    return RE_CODE_SLOT.sub(lambda match: spans[int(match.group(1))], text) if spans else text
+
+
+def inline(text, link_color=None):
+    """Convert markdown bold/italic/code/link spans to reportlab paragraph markup."""
+    link_color = link_color or DEFAULT_THEME.secondary
+    return convert_inline(text, '<font name="Courier">{}</font>', r"<b>\1</b>", r"<i>\1</i>",
+                          rf'<link href="\2" color="{link_color}">\1</link>')
+
+
+def plain(text):
+    """Strip markdown emphasis markers (for canvas strings and metadata)."""
+    return RE_LINK.sub(r"\1", text).replace("**", "").replace("`", "").strip("* ")
+
+
+CATALAN_MONTHS = {
+    "gener": 1, "febrer": 2, "març": 3, "abril": 4, "maig": 5, "juny": 6,
+    "juliol": 7, "agost": 8, "setembre": 9, "octubre": 10, "novembre": 11, "desembre": 12,
+}
+RE_CATALAN_DATE = re.compile(r"(\d{1,2}) d(?:e |')(\w+) de (\d{4})")
+
+
+def short_date(text):
+    """'22 de febrer de 2026' -> '22/02/2026' (unparseable dates are returned as is)."""
+    m = RE_CATALAN_DATE.search(text)
+    if not m or m.group(2).lower() not in CATALAN_MONTHS:
+        return text
+    return f"{int(m.group(1)):02d}/{CATALAN_MONTHS[m.group(2).lower()]:02d}/{m.group(3)}"
 
-# ═══════════════════════════════════════════════════════════════════════
-# SECTION 1
-# ═══════════════════════════════════════════════════════════════════════
-story.append(Paragraph("1. Alumnes a Clickedu sense dades de traspàs als Excels", style_h1))
-story.append(Paragraph(
-    "Aquests 30 alumnes consten a la base de dades de Clickedu (són alumnes actius del centre) "
-    "però <b>no apareixen a cap dels Excels de traspàs de tutories</b>. Per tant, no tenim cap "
-    "dada de traspàs (dades familiars, acadèmiques, comportament, acords de tutoria, etc.) per a ells.",
-    style_body
-))
-story.append(make_note_box(
-    "<b>Nota:</b> S'han exclòs els 21 alumnes d'Infantil 3, ja que són nous al centre "
-    "i és esperable que no tinguin traspàs previ."
-))
-story.append(Spacer(1, 4))
-story.append(Paragraph(
-    "<b>Acció necessària:</b> Confirmeu si aquests alumnes haurien de tenir fitxa de traspàs "
-    "o si és correcte que no en tinguin.",
-    style_action
-))
-
-# Section 1 data
-s1_groups = [
-    ("Infantil 4 (1 alumne)", [
-        ["German Isaac", "Castro Navas"],
-    ]),
-    ("Infantil 5 (1 alumne)", [
-        ["Zixi", "Yang"],
-    ]),
-    ("Cinquè de Primària (1 alumne)", [
-        ["Danial", "Amjid Khanum"],
-    ]),
-    ("Sisè de Primària (2 alumnes)", [
-        ["Pol", "Carmona Romera"],
-        ["Daniela", "Díaz González"],
-    ]),
-    ("Segon de Primària — repetidor (1 alumne)", [
-        ["Anderson Saul", "Martínez Coronel"],
-    ]),
-    ("Quart de Primària (19 alumnes)", [
-        ["Sara", "Amjid Khanum"],
-        ["Ferdaus", "Boukayour Chahbouni"],
-        ["Yassine", "Chamlal"],
-        ["Ashly Jhoana", "Duarte Hernández"],
-        ["Yahya", "El Haddouchi"],
-        ["Gerard", "García Saavedra"],
-        ["Alma", "González Mateo"],
-        ["Haroun", "Harrak El Jibari"],
-        ["Núria", "Hernández Villodres"],
-        ["Eimy Gabriela", "Jiménez Mina"],
-        ["Iyad", "Lorenzo El Faraa"],
-        ["Roumayssae", "Maalem"],
-        ["Marc", "Martínez Fernández"],
-        ["Sergio", "Murcia Díaz"],
-        ["Aroa", "Ortiz Rhu"],
-        ["Martí", "Poveda López"],
-        ["Maria Elisabet", "Ramos Sánchez"],
-        ["Kimberly Andrea", "Romero León"],
-        ["Andrea", "Vilamala Ros"],
-    ]),
-    ("Primer d'ESO (3 alumnes)", [
-        ["Cesar", "Granado Cortés"],
-        ["Walid", "Mounachit El Guennouni"],
-        ["Jaqueline Dayanara", "Vega Solaeche"],
-    ]),
-    ("Tercer d'ESO (1 alumne)", [
-        ["Alae", "Harrak El Jibari"],
-    ]),
-    ("Quart d'ESO (2 alumnes)", [
-        ["Soufiane", "Chamlal"],
-        ["Alfonso Gerardo", "Lunar Flores"],
-    ]),
-]
-
-for group_name, rows in s1_groups:
-    story.append(Paragraph(group_name, style_h2))
-    t = make_table(["Nom", "Cognoms"], rows, col_widths=[avail * 0.35, avail * 0.65])
-    story.append(t)
-
-add_hr()
 
 # ═══════════════════════════════════════════════════════════════════════
-# SECTION 2
+# FLOWABLES
 # ═══════════════════════════════════════════════════════════════════════
-story.append(Paragraph("2. Alumnes als Excels que no existeixen a Clickedu", style_h1))
-story.append(Paragraph(
-    "Aquests 22 registres (16 persones úniques) apareixen als Excels de traspàs i/o NESE "
-    "però <b>no s'han pogut trobar a la base de dades de Clickedu</b>. Les seves dades no s'han pogut importar.",
-    style_body
-))
-story.append(Paragraph(
-    "<b>Acció necessària:</b> Confirmeu si aquests alumnes han causat baixa, han canviat de centre, "
-    "o si es tracta d'errors als Excels. Si han de continuar al centre, caldria donar-los d'alta a Clickedu.",
-    style_action
-))
-
-s2_groups = [
-    ("Infantil 3 (1 alumne)", [
-        ["Júlia Serrano", "NESE INF", "Sospita TEA. CDIAP setmanal. Baixa des del maig per motius personals."],
-    ]),
-    ("Segon de Primària (1 alumne)", [
-        ["Andy Martínez", "Traspàs PRI", "Nouvingut a final de curs 2025. Retenció a 2n. Monoparental. Molt disruptiu."],
-    ]),
-    ("Tercer de Primària (1 alumne)", [
-        ["Alba Borrego", "NESE PRI", "Canvia d'escola el curs 25-26. Sessions quinzenals amb psicòloga."],
-    ]),
-    ("Primer d'ESO (1 alumne)", [
-        ["Júlia Ríos Carmona", "Traspàs ESO + NESE ESO", "Discalcúlia i Dislèxia (informe 2020 CGO). Logopeda."],
-    ]),
-    ("Segon d'ESO (1 alumne)", [
-        ["Abram Cortés Jiménez", "Traspàs ESO + NESE ESO", "SSD. Retenció 1r PRI. Preinscripció CFGB Miquel Biada."],
-    ]),
-    ("Tercer d'ESO (3 alumnes)", [
-        ["Lucas Cortés", "NESE ESO", "UEC (Salesians). Causa baixa al complir 16 anys."],
-        ["Marc Alsinet Ortega", "Traspàs ESO + NESE ESO", "TDAH (F90.2) combinat. Dislèxia. Concerta. Coach setmanal."],
-        ["Tanisha Kishor Rani", "Traspàs ESO + NESE ESO", "SSD. Pare amb ordre d'allunyament. Pis de protecció. SS."],
-    ]),
-    ("Quart d'ESO (8 alumnes)", [
-        ["Pau Moragas", "NESE ESO", "Acceleració progressiva des de 4t PRI. Segueix amb normalitat."],
-        ["Nàhia Segarra", "NESE ESO", "TEA (ITA 2024). Protocol absentisme, no assisteix a classe."],
-        ["Yanira Jiménez", "NESE ESO", "Absentisme des d'octubre. Intenció de baixa als 16 anys. SS."],
-        ["Natalia Giménez", "NESE ESO", "No ha assistit cap dia a classe. Protocol absentisme. Ja té 16 anys."],
-        ["Lucía Martínez", "NESE ESO", "Dislèxia (falta informe). Li costa memoritzar."],
-        ["Donovan Romero", "NESE ESO", "Nouvingut 17/18. PI NISE fins 6è. SSD. No segueix el ritme."],
-        ["Lucía Valdivia", "NESE ESO", "Dislèxia (informe Volta 2020). Segueix amb normalitat."],
-        ["Javier Sarrias", "NESE ESO", "Protocol absentisme. Preinscripció PFI perruqueria. SS. Fiscalia."],
-        ["Ruchita Kishor", "NESE ESO", "SSD. Incorporació octubre 2024. SS Pineda. Divorci pares."],
-        ["Alisa Miroliubova", "NESE ESO", "NISE. Nouvinguda de Rússia (febrer 2024)."],
-    ]),
-]
-
-for group_name, rows in s2_groups:
-    story.append(Paragraph(group_name, style_h2))
-    t = make_table(
-        ["Nom", "Font Excel", "Notes"],
-        rows,
-        col_widths=[avail * 0.22, avail * 0.22, avail * 0.56],
+SCHOOL_LINE = "<b>Escola el Turó</b> — Turonia"
+ACTION_PREFIXES = ("**Acció necessària**",)
+
+
+def build_date(deterministic=False):
+    """Today, or the day of SOURCE_DATE_EPOCH when set (reproducible builds).
+
+    Deterministic output can't depend on the day it is rendered: without
+    SOURCE_DATE_EPOCH it gets None.
+    """
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if epoch:
+        return datetime.fromtimestamp(int(epoch), timezone.utc).date()
+    return None if deterministic else date.today()
+
+
+def new_meta(deterministic=False):
+    """Document metadata filled while the source streams through iter_flowables.
+
+    The header date is the build date until a "Data:" line replaces it; a
+    deterministic document without either has no date in its header.
+    """
+    day = build_date(deterministic)
+    return {"title": "", "date": day.strftime("%d/%m/%Y") if day else ""}
+
+
+def auto_col_widths(headers, rows, avail_width, font="Helvetica-Bold"):
+    """Share the available width by the average text length of each column.
+
+    No column is made narrower than its longest word (capped at 24 chars),
+    so short columns such as names don't get broken mid-word.
+    """
+    from pdf_tables import CELL_PADDING, text_width
+
+    n = len(headers)
+    totals = [0] * n
+    longest = [max(plain(h).split() or [""], key=len) for h in headers]
+    for row in rows:
+        for i, cell in enumerate(row[:n]):
+            totals[i] += min(len(cell), 80)
+            word = max(cell.split() or [""], key=len)
+            if len(word) > len(longest[i]):
+                longest[i] = word
+    count = max(len(rows), 1)
+    weights = [max(len(plain(h)) + 2, totals[i] / count, 4) for i, h in enumerate(headers)]
+    minimums = [text_width(plain(w)[:24], font) + 2 * CELL_PADDING + 1 for w in longest]
+
+    fixed = {}
+    widths = [avail_width * w / sum(weights) for w in weights]
+    while True:
+        narrow = [i for i in range(n) if i not in fixed and widths[i] < minimums[i]]
+        free = sum(weights[i] for i in range(n) if i not in fixed and i not in narrow)
+        if not narrow or not free:
+            break
+        fixed.update((i, minimums[i]) for i in narrow)
+        rest = avail_width - sum(fixed.values())
+        widths = [fixed.get(i, rest * weights[i] / free) for i in range(n)]
+    return widths
+
+
+def iter_flowables(st, blocks, meta):
+    """Map markdown blocks to the report's flowables, one block at a time."""
+    from reportlab.platypus import Paragraph, Spacer, HRFlowable, Preformatted
+
+    front_matter = False   # lines right under the title are rendered as subtitles
+    seen_title = bool(meta["title"])   # a later section or partition of the same document
+    link = st.theme.secondary
+
+    for block in blocks:
+        kind = block[0]
+
+        if kind == "heading":
+            level, text = block[1], block[2]
+            if level == 1 and not seen_title:
+                seen_title = front_matter = True
+                meta["title"] = plain(text)
+                yield Paragraph(inline(text, link), st.style_title)
+                yield Paragraph(SCHOOL_LINE, st.style_subtitle)
+                continue
+            front_matter = False
+            yield Paragraph(inline(text, link), st.style_h1 if level <= 2 else st.style_h2)
+
+        elif kind == "paragraph":
+            lines = block[1]
+            if front_matter:
+                for line in lines:
+                    label, _, value = plain(line).partition(":")
+                    if label.strip().lower() == "data" and value:
+                        meta["date"] = short_date(value.strip())
+                    yield Paragraph(inline(line.strip(), link), st.style_subtitle)
+                continue
+            text = " ".join(line.strip() for line in lines)
+            if text.startswith(ACTION_PREFIXES):
+                style = st.style_action
+            elif RE_ITALIC.fullmatch(text):
+                style = st.style_footer
+            else:
+                style = st.style_body
+            yield Paragraph(inline(text, link), style)
+
+        elif kind == "quote":
+            lines = [f"• {line[2:]}" if line.startswith(("- ", "* ")) else line for line in block[1]]
+            yield make_note_box(st, "<br/>".join(inline(line, link) for line in lines))
+            yield Spacer(1, 4)
+
+        elif kind == "table":
+            headers, rows = block[1], block[2]
+            n = len(headers)
+            rows = [(list(row) + [""] * n)[:n] for row in rows]
+            widths = auto_col_widths(headers, rows, st.avail, st.font_bold)
+            yield make_table(
+                st,
+                [inline(h, link) for h in headers],
+                [[inline(cell, link) for cell in row] for row in rows],
+                col_widths=widths,
+            )
+
+        elif kind == "list_item":
+            depth, marker, text = block[1], block[2], block[3]
+            bullet = marker if marker[0].isdigit() else "•"
+            yield Paragraph(inline(text, link), list_style(st, depth), bulletText=bullet)
+
+        elif kind == "code":
+            yield Preformatted(block[1], st.style_code, maxLineLength=95)
+
+        elif kind == "hr":
+            yield Spacer(1, 4)
+            yield HRFlowable(width="100%", thickness=1, color=st.border_color, spaceAfter=8)
+
+        elif kind == "toc":   # inserted by pdf_toc.with_toc
+            from pdf_toc import toc_flowables
+            yield from toc_flowables(st, block[1], block[2], lambda text: inline(text, link))
+
+        front_matter = front_matter and kind == "paragraph"
+
+
+def iter_sections(blocks):
+    """Group blocks into sections, each starting at a level 1 or 2 heading."""
+    section = []
+    for block in blocks:
+        if block[0] == "heading" and block[1] <= 2 and section:
+            yield section
+            section = []
+        section.append(block)
+    if section:
+        yield section
+
+
+# Every module whose code shapes the flowables or the PDF bytes
+RENDERER_MODULES = ("md_to_pdf.py", "pdf_tables.py", "pdf_fonts.py", "pdf_toc.py")
+
+
+@lru_cache(maxsize=None)
+def renderer_fingerprint():
+    here = os.path.dirname(os.path.abspath(__file__))
+    return make_key(RENDERER_VERSION, *(file_digest(os.path.join(here, name)) for name in RENDERER_MODULES))
+
+
+def iter_cached_flowables(st, blocks, meta, cache, counts):
+    """Like iter_flowables, but reuses the flowables of sections already in the cache."""
+    for section in iter_sections(blocks):
+        key = make_key("section", renderer_fingerprint(), st.theme, bool(meta["title"]), section)
+        entry = cache.get_object(key)
+        if entry is None:
+            before = dict(meta)
+            flowables = list(iter_flowables(st, section, meta))
+            changed = {k: v for k, v in meta.items() if before.get(k) != v}
+            cache.put_object(key, (flowables, changed))
+        else:
+            flowables, changed = entry
+            meta.update(changed)
+            counts["sections_reused"] += 1
+        counts["sections"] += 1
+        yield from flowables
+
+
+# ── Page header / footer ────────────────────────────────────────────────
+# The static artwork (logo, rule, title, date) is drawn once per document
+# into a form XObject; every page then stamps the form and draws only its
+# own number. A 3,000-page report stores the header once instead of 3,000
+# times, and the logo is decoded once per process (load_image) and embedded
+# once per PDF. The form is only filled in when the canvas is saved: the
+# story streams in while the pages are laid out (see LazyStory), so the
+# title and date are not known yet when page 1 begins.
+LOGO_HEIGHT = 0.6 * CM
+PAGE_FORM = "PageTemplate"
+PAGE_NUMBER_Y = 1.2 * CM
+PAGE_NUMBER_SIZE = 8
+PAGE_LABEL = "Pàgina {} de {}"
+
+
+@lru_cache(maxsize=None)
+def load_image(path):
+    """Decoded image reader for ``path`` (None if missing), shared by every render of the process."""
+    if not path or not os.path.exists(path):
+        return None
+    from reportlab.lib.utils import ImageReader
+
+    reader = ImageReader(path)
+    reader.getRGBData()   # decode now, not while the first page is drawn
+    return reader
+
+
+@lru_cache(maxsize=None)
+def image_for(path, width, profile=DEFAULT_PROFILE):
+    """load_image for an image drawn ``width`` points wide, resampled for ``profile``.
+
+    Downsampled to ``profile.image_dpi`` at that width; with
+    ``profile.image_quality`` it is recompressed as JPEG, transparency
+    flattened on the white page. Otherwise the file is embedded as it is.
+    """
+    reader = load_image(path)
+    if reader is None or not (profile.image_dpi or profile.image_quality):
+        return reader
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+
+    image = Image.open(path)
+    pixels = round(width / 72 * profile.image_dpi)
+    resized = 0 < pixels < image.width * RESAMPLE_BELOW
+    if resized:
+        image = image.resize((pixels, max(1, round(image.height * pixels / image.width))), Image.LANCZOS)
+    out = io.BytesIO()
+    if profile.image_quality:
+        image = image.convert("RGBA")
+        flat = Image.new("RGB", image.size, "white")
+        flat.paste(image, mask=image.getchannel("A"))
+        flat.save(out, "JPEG", quality=profile.image_quality, optimize=True)
+    elif resized:
+        image.save(out, "PNG", optimize=True)
+    else:
+        return reader
+    out.seek(0)
+    reader = ImageReader(out)
+    reader.getRGBData()
+    return reader
+
+
+@contextmanager
+def output_settings(profile):
+    """reportlab's process-wide output switches, set for ``profile`` while a document is built and saved."""
+    from reportlab import rl_config
+
+    saved = rl_config.useA85
+    rl_config.useA85 = int(profile.a85)
+    try:
+        yield
+    finally:
+        rl_config.useA85 = saved
+
+
+def draw_page_template(canvas_obj, st, meta, profile=DEFAULT_PROFILE, logo=None):
+    """Header artwork; ``logo`` is an image reader the document already embeds, if any."""
+    margin = st.theme.margin
+    canvas_obj.setFillColor(st.muted)
+    canvas_obj.setStrokeColor(st.border_color)
+    canvas_obj.setLineWidth(0.5)
+    canvas_obj.line(margin, PAGE_H - 2 * CM, PAGE_W - margin, PAGE_H - 2 * CM)
+    x = margin
+    original = logo or load_image(header_logo)
+    if original is not None:
+        iw, ih = original.getSize()
+        width = LOGO_HEIGHT * iw / ih
+        logo = logo or image_for(header_logo, width, profile)
+        canvas_obj.drawImage(logo, x, PAGE_H - 1.9 * CM, width, LOGO_HEIGHT, mask="auto")
+        x += width + 0.3 * CM
+    canvas_obj.setFont(st.font, 7)
+    canvas_obj.drawString(x, PAGE_H - 1.8 * CM, f"Escola el Turó — {meta['title']}")
+    canvas_obj.drawRightString(PAGE_W - margin, PAGE_H - 1.8 * CM, meta["date"])
+
+
+# The reportlab releases whose internals seal_previous_page / finish_page,
+# pdf_fonts.make_font and render_profile were written against (see
+# requirements.txt). On any other version they take reportlab's stock path.
+REPORTLAB_TESTED = ((5, 0), (6, 0))
+
+
+@lru_cache(maxsize=None)
+def reportlab_internals():
+    """Whether the installed reportlab is within REPORTLAB_TESTED."""
+    import reportlab
+
+    version = tuple(int(part) for part in re.findall(r"\d+", reportlab.Version)[:2])
+    low, high = REPORTLAB_TESTED
+    return low <= version < high
+
+
+def before_save(canvas_obj, hook):
+    """Call hook(canvas_obj) after the last page, right before the canvas writes the PDF."""
+    save = canvas_obj.save
+
+    def hooked_save():
+        hook(canvas_obj)
+        save()
+
+    canvas_obj.save = hooked_save
+
+
+def seal_previous_page(canvas_obj):
+    """Compress the finished page's drawing operators now instead of when the PDF is written.
+
+    reportlab keeps every page's operators as a plain string until save();
+    a 3,000-page report holds ~25 MB of them. The page is deflated up to a
+    sync flush and left open, so write_page_numbers can still finish the
+    same stream with the footer once the page count is known (finish_page).
+    Skipped on an untested reportlab: the footer is then appended to the
+    plain operators and reportlab compresses them at save as usual.
+    """
+    if not reportlab_internals():
+        return
+    pages = canvas_obj._doc.Pages.pages
+    page = pages[-1] if pages else None
+    if page is None or not page.compression or not page.stream:
+        return
+    data = page.stream.encode("utf8")
+    z = zlib.compressobj()
+    page.sealed = (z.compress(data) + z.flush(zlib.Z_SYNC_FLUSH), zlib.adler32(data))
+    page.stream = None
+
+
+def finish_page(page, code):
+    """Append ``code`` to a page's operators and close its content stream.
+
+    A sealed page gets ``code`` as raw deflate blocks after its own and the
+    zlib checksum of the whole, with the filters reportlab applies at save:
+    still one content stream per page.
+    """
+    if getattr(page, "sealed", None) is None:   # compression off
+        page.stream = (page.stream or "") + code
+        return
+    from reportlab import rl_config
+    from reportlab.pdfbase.pdfdoc import (
+        PDFArray, PDFBase85Encode, PDFDictionary, PDFName, PDFStream, PDFZCompress,
     )
-    story.append(t)
 
-add_hr()
+    head, checksum = page.sealed
+    data = code.encode("utf8")
+    tail = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    content = head + tail.compress(data) + tail.flush() + zlib.adler32(data, checksum).to_bytes(4, "big")
+    filters = [PDFZCompress]
+    if rl_config.useA85:
+        filters.insert(0, PDFBase85Encode)
+        content = PDFBase85Encode.encode(content)
+    page.Contents = PDFStream(PDFDictionary({"Filter": PDFArray([PDFName(f.pdfname) for f in filters])}),
+                              content)
+    page.sealed = None
+
+
+def text_code(canvas_obj, x, y, text, font, size, color):
+    """PDF operators drawing ``text`` with its baseline starting at (x, y)."""
+    t = canvas_obj.beginText(x, y)
+    t.setFont(font, size)
+    t.setFillColor(color)
+    t.textOut(text)
+    return t.getCode()
+
+
+def add_page_template(canvas_obj, doc_obj):
+    """Stamp the header form; it is defined once per canvas, when the canvas is saved."""
+    if getattr(doc_obj, "page_form", None) is not canvas_obj:
+        doc_obj.page_form = canvas_obj   # one form per canvas, i.e. per output PDF
+
+        def define_form(canvas_obj):
+            canvas_obj.beginForm(PAGE_FORM)
+            draw_page_template(canvas_obj, doc_obj.st, doc_obj.meta, doc_obj.profile, doc_obj.logo)
+            canvas_obj.endForm()
+
+        before_save(canvas_obj, define_form)
+    canvas_obj.doForm(PAGE_FORM)
+
+
+def add_page_number(canvas_obj, doc_obj):
+    """Header on every page; the "Pàgina X de Y" footers are written when the canvas is saved.
+
+    Called as each page begins, which is also when the page before it is
+    sealed (see seal_previous_page).
+    """
+    if getattr(doc_obj, "page_numbers", None) is not canvas_obj:
+        doc_obj.page_numbers = canvas_obj
+        before_save(canvas_obj, lambda canvas_obj: write_page_numbers(canvas_obj, doc_obj))
+    seal_previous_page(canvas_obj)
+    add_page_template(canvas_obj, doc_obj)
+
+
+def write_page_numbers(canvas_obj, doc_obj):
+    """Footers and TOC page numbers, once the page count and the heading pages are known.
+
+    Nothing is laid out again: the few operators are appended to each
+    finished page (finish_page). ``doc_obj.place_pages`` (see pdf_parallel) can map the local
+    numbers when the document is one part of a larger one.
+    """
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    seal_previous_page(canvas_obj)   # the last page
+    pages = canvas_obj._doc.Pages.pages
+    first, total, heading_pages = 0, len(pages), doc_obj.heading_pages
+    if doc_obj.place_pages is not None:
+        first, total, heading_pages = doc_obj.place_pages(len(pages), heading_pages)
+
+    slots = {}
+    for slot in doc_obj.toc_slots:
+        slots.setdefault(slot["page"], []).append(slot)
+    st = doc_obj.st
+    for number, page in enumerate(pages, 1):
+        label = PAGE_LABEL.format(first + number, total)
+        width = stringWidth(label, st.font, PAGE_NUMBER_SIZE)
+        code = [text_code(canvas_obj, PAGE_W / 2 - width / 2, PAGE_NUMBER_Y, label,
+                          st.font, PAGE_NUMBER_SIZE, st.muted)]
+        for slot in slots.get(number, ()):
+            text = str(heading_pages[slot["entry"]])
+            x = slot["x"] - stringWidth(text, slot["font"], slot["size"])
+            code.append(text_code(canvas_obj, x, slot["y"], text, slot["font"], slot["size"], slot["color"]))
+        finish_page(page, "q\n" + "\n".join(code) + "\nQ\n")
+
+
+def add_outline_entry(doc_obj, flowable):
+    """Bookmark every section heading: level 1-2 headings at the top, level 3+ under them."""
+    name = getattr(getattr(flowable, "style", None), "name", None)   # cached flowables carry style copies
+    if name == doc_obj.st.style_h1.name:
+        level = 0
+    elif name == doc_obj.st.style_h2.name:
+        level = 1
+    else:
+        return
+    level = min(level, doc_obj.outline_level + 1)   # outlines can't skip a level
+    key = f"section{doc_obj.outline_count}"   # also the target of the TOC links (pdf_toc)
+    doc_obj.outline_count += 1
+    doc_obj.outline_level = level
+    canvas_obj = doc_obj.canv
+    doc_obj.heading_pages.append(canvas_obj.getPageNumber())
+    canvas_obj.bookmarkPage(key)
+    canvas_obj.addOutlineEntry(flowable.getPlainText(), key, level)
+
 
 # ═══════════════════════════════════════════════════════════════════════
-# SECTION 3
+# RENDER
 # ═══════════════════════════════════════════════════════════════════════
-story.append(Paragraph(
-    "3. Alumnes amb registre NESE sense indicació de graella_nese al traspàs",
-    style_h1
-))
-story.append(Paragraph(
-    "Aquests 56 alumnes tenen un registre a la <b>graella NESE</b> (Excels de NESE per nivell) "
-    "però <b>no estan marcats com a graella_nese = true</b> a la seva fitxa de traspàs de tutories. "
-    "Això pot ser correcte (alumnes amb seguiment SSD o observació que no estan formalment a la graella NESE del traspàs) "
-    "o pot indicar una manca de coordinació entre les dues fonts.",
-    style_body
-))
-story.append(Paragraph(
-    "<b>Acció necessària:</b> Reviseu si aquests alumnes haurien de tenir graella_nese = true "
-    "al traspàs o si és correcte que no el tinguin.",
-    style_action
-))
-
-# NESE summary
-story.append(Paragraph("Resum per tipus de situació NESE:", style_h2))
-nese_summary = make_table(
-    ["Tipus", "Alumnes"],
-    [
-        ["Sense NISE definit (seguiment, observació, SSD)", "32"],
-        ['NISE = "no" (explícitament sense NISE, però amb seguiment)', "15"],
-        ['NISE = "nise" (amb NISE reconegut, sense marcar al traspàs)', "7"],
-        ['NISE = "sls" (Situació Lleu de Salut)', "2"],
-    ],
-    col_widths=[avail * 0.8, avail * 0.2],
-)
-story.append(nese_summary)
-
-s3_headers = ["Nom", "Cognoms", "SSD", "NISE", "Mesura", "Detall"]
-s3_widths = [avail * 0.12, avail * 0.16, avail * 0.05, avail * 0.06, avail * 0.10, avail * 0.51]
-
-s3_groups = [
-    ("Infantil 4 (4 alumnes)", [
-        ["Daniela", "Alberich Díaz", "No", "—", "DUA/MISU", "Possible trastorn del llenguatge expressiu (CDIAP). Logopeda setmanal."],
-        ["Ouissal", "Grain", "Sí", "—", "—", "—"],
-        ["Leo", "Ibáñez Burgos", "No", "—", "DUA/MISU", "Retard del desenvolupament del llenguatge (CDIAP). Logopeda quinzenal."],
-        ["Zakaria", "Rahhli Azahriou", "Sí", "—", "—", "—"],
-    ]),
-    ("Infantil 5 (6 alumnes)", [
-        ["Malak", "Chmanti Haouari", "Sí", "—", "—", "—"],
-        ["Fatima", "El Khayat", "Sí", "—", "—", "—"],
-        ["Malak", "Ghanoura", "Sí", "—", "—", "—"],
-        ["Yassin", "Grain", "Sí", "—", "—", "—"],
-        ["Yanis", "Maati El Abbassi", "Sí", "—", "—", "—"],
-        ["Rodaina", "Ziadi", "Sí", "—", "—", "—"],
-    ]),
-    ("Primer de Primària (5 alumnes)", [
-        ["Janat", "Bilal", "Sí", "—", "—", "—"],
-        ["Adama", "Dabo", "Sí", "—", "—", "—"],
-        ["Hawa", "Dabo", "Sí", "—", "—", "—"],
-        ["Oumaya", "El Khayat", "Sí", "—", "—", "—"],
-        ["Alae", "El Mansouri", "Sí", "—", "—", "—"],
-    ]),
-    ("Segon de Primària (2 alumnes)", [
-        ["Zeinabu", "Ganess Kaloga", "Sí", "No", "S/mesures", "Dificultats gestió emocional. Candidata beca MEC."],
-        ["Anderson S.", "Martínez Coronel", "Sí", "NISE", "—", "Nouvingut abril 2025. Nivell molt baix. Retenció a 2n."],
-    ]),
-    ("Quart de Primària (10 alumnes)", [
-        ["Ferdaus", "Boukayour C.", "Sí", "—", "PI", "TDL (informe EAP). CAD 33%. Logopeda CLER quinzenal."],
-        ["Yassine", "Chamlal", "Sí", "NISE", "—", "Nouvingut del Marroc (maig 2025). Cal PI nouvingut 25/26."],
-        ["Ashly J.", "Duarte H.", "Sí", "NISE", "PI", "Nouvinguda de Veneçuela. PI nouvinguda. Pla Educatiu d'Entorn."],
-        ["Núria", "Hernández V.", "No", "—", "DUA/MISU", "Psicòloga mensual. Estancament acadèmic. Possible TDAH."],
-        ["Iyad", "Lorenzo El Faraa", "No", "—", "S/mesures", "TDAH + rasgos TEA a estudi. CSMIJ. Medicació Atenza 27mg."],
-        ["Marc", "Martínez F.", "No", "—", "PI", "Dislèxia (indicis). Teràpia visual. PI signat 20/12/2024."],
-        ["Sergio", "Murcia Díaz", "No", "—", "—", "Nivell molt baix. Millora progressiva. Pla Educatiu d'Entorn."],
-        ["Kimberly A.", "Romero León", "Sí", "—", "—", "Ritme lent, baixa autoestima. Pla Educatiu d'Entorn."],
-        ["Andrea", "Vilamala Ros", "No", "—", "—", "Millora lectoescriptura. Visió 10% ull dret."],
-    ]),
-    ("Cinquè de Primària (4 alumnes)", [
-        ["Júlia", "Avila González", "No", "—", "—", "Problemes de relació. Es recomana teràpia comunicació."],
-        ["Moisès", "Cortés Jiménez", "Sí", "—", "—", "Pla Educatiu d'Entorn. Família en seguiment de SS."],
-        ["Ona", "García López", "No", "—", "—", "Tractament hormonal (nov 24-25)."],
-        ["Vega", "Mayordomo C.", "No", "—", "—", "Acompanyant emocional mensual (centre Kènia)."],
-    ]),
-    ("Sisè de Primària (5 alumnes)", [
-        ["Diego José", "Castro Soliz", "Sí", "—", "S/mesures", "—"],
-        ["Amani", "El Mamouni", "Sí", "—", "—", "—"],
-        ["Blanca", "Meca Martínez", "No", "—", "S/mesures", "Deficiència auditiva del 90%."],
-        ["Lucas", "Valdivia Moreno", "No", "—", "—", "—"],
-        ["Nourhan", "Ziadi", "Sí", "—", "—", "Baixa acadèmica i emocional al 3r trimestre."],
-    ]),
-    ("Tercer d'ESO (10 alumnes)", [
-        ["Insaf", "Aghaddar", "Sí", "SLS", "—", "MISU en llengües i mates. Candidata beca MEC."],
-        ["Jan", "Baldà Ortego", "No", "No", "—", "Psicòloga privada quinzenal. Candidat beca MEC."],
-        ["Pol", "Gil Amor", "No", "No", "—", "Dislèxia + TDAH. Dificultats gestió emocional. Candidat beca MEC."],
-        ["Daniel", "Martínez F.", "No", "No", "—", "TDAH inatent. Dislèxia severa. Pla Ed. Entorn. Candidat beca MEC."],
-        ["Brian", "Pousada M.", "No", "SLS", "—", "No aprofita repetició. De Cuba (2022). Candidat beca MEC."],
-        ["Julen", "Robledo G.", "No", "No", "—", "Pendent diagnòstic (psico CAP). Absentisme. Candidat beca MEC."],
-        ["Dayana S.", "Sandoval E.", "Sí", "NISE", "—", "PI nouvinguda. Evolució complicada. Candidata beca MEC."],
-        ["Mahamadou", "Sillah Sillah", "Sí", "No", "—", "Dificultats llengües, mates, física. Valorar PFI."],
-        ["Anyelisteici", "Varela A.", "Sí", "NISE", "—", "PI nouvinguda. Psicòloga CAP quinzenal. Candidata beca MEC."],
-    ]),
-    ("Quart d'ESO (10 alumnes)", [
-        ["Abdel B.", "Ahdor", "Sí", "No", "—", "Informe NESE Annex 1. PI retirat a final de 2n ESO."],
-        ["Soufiane", "Chamlal", "Sí", "NISE", "—", "Nouvingut del Marroc (maig 2025). No parla cap llengua local."],
-        ["Jan", "Gascons P.", "No", "No", "—", "TDAH + trastorn comunicació social. CSMIJ. Psicòloga privada."],
-        ["Aicha", "Ndiaye", "Sí", "No", "—", "Dificultats però motivada. Reforç escolar."],
-        ["Fatima", "Ndiaye", "Sí", "No", "—", "Retard greu de l'aprenentatge (NESE Annex 1). Reforç escolar."],
-        ["Graciela", "Noguera A.", "Sí", "No", "—", "Centre obert Salesians. SS. Psico. Derivació psiquiatria."],
-        ["Danna G.", "Paz Melgara", "Sí", "NISE", "—", "Incorporació setembre 2023."],
-        ["Daniel", "Picazo P.", "No", "No", "—", "Possible dislèxia (valoració EAP). Candidat beca MEC."],
-        ["Guillem", "Rodríguez P.", "No", "No", "—", "TEA + TDAH combinat + Tr. adaptatiu. Psicòloga privada."],
-        ["Maija", "Scedrova", "Sí", "—", "—", "PI nouvinguda retirat. MISU català (retirant-se)."],
-        ["Pol", "Vivó Cortés", "No", "No", "—", "TDAH + Dislèxia (2025). Psicòloga. Reforç escolar. MISU català."],
-        ["Pengxiang", "Yin", "Sí", "No", "—", "TEA + TEL. CSMIJ. Informe NESE Annex 1. Candidat beca MEC."],
-    ]),
-]
-
-for group_name, rows in s3_groups:
-    story.append(Paragraph(group_name, style_h2))
-    t = make_table(s3_headers, rows, col_widths=s3_widths)
-    story.append(t)
-
-add_hr()
+class LazyStory:
+    """The list interface doc.build uses, over an iterator of flowables.
+
+    platypus only ever works at the front of its story: it looks at,
+    removes and puts back (split remainders, keepWithNext groups) the first
+    few flowables. LazyStory pulls flowables from the iterator as they are
+    needed, so each one can be freed as soon as it is placed instead of the
+    whole story staying alive until doc.build returns. ``count`` is the
+    number of flowables pulled so far.
+    """
+
+    LOOKAHEAD = 16   # flowables visible through len(): more than any keepWithNext run
+
+    def __init__(self, flowables):
+        self._source = iter(flowables)
+        self._buffer = []
+        self.count = 0
+
+    def _fill(self, n):
+        while len(self._buffer) < n:
+            try:
+                self._buffer.append(next(self._source))
+            except StopIteration:
+                return
+            self.count += 1
+
+    def _reach(self, index):
+        """Pull flowables up to ``index`` (an int or a slice from the front)."""
+        self._fill((index.stop or 0) if isinstance(index, slice) else index + 1)
+
+    def __len__(self):
+        self._fill(self.LOOKAHEAD)
+        return len(self._buffer)
+
+    def __getitem__(self, index):
+        self._reach(index)
+        return self._buffer[index]
+
+    def __setitem__(self, index, value):
+        self._reach(index)
+        self._buffer[index] = value
+
+    def __delitem__(self, index):
+        self._reach(index)
+        del self._buffer[index]
+
+    def insert(self, index, flowable):
+        self._buffer.insert(index, flowable)
+
+
+def new_doc(dest, st, meta, profile=DEFAULT_PROFILE):
+    from reportlab.platypus import SimpleDocTemplate
+
+    doc = SimpleDocTemplate(
+        dest,
+        pagesize=(PAGE_W, PAGE_H),
+        leftMargin=st.theme.margin,
+        rightMargin=st.theme.margin,
+        topMargin=TOP_MARGIN,
+        bottomMargin=BOTTOM_MARGIN,
+        invariant=int(profile.deterministic),
+    )
+    doc.st, doc.meta, doc.profile, doc.logo = st, meta, profile, None
+    doc.outline_count, doc.outline_level = 0, -1
+    doc.heading_pages, doc.toc_slots, doc.place_pages = [], [], None
+    doc.afterFlowable = lambda flowable: add_outline_entry(doc, flowable)
+    return doc
+
+
+def render(source, dest, theme=DEFAULT_THEME, cache=None, profiler=None, toc=False, profile=DEFAULT_PROFILE):
+    """Render a markdown file (path or open text file) to ``dest`` (path or binary file).
+
+    ``cache`` is an optional RenderCache and ``profiler`` an optional
+    render_profile.Profiler; ``toc`` adds a table of contents after the
+    title (see pdf_toc.py) and ``profile`` is an OutputProfile. Returns a dict of stats: source, dest, pages,
+    flowables, bytes, seconds, cache ("hit", "miss" or None), sections and
+    sections_reused.
+    """
+    start = time.perf_counter()
+    is_path = isinstance(source, (str, os.PathLike))
+    stats = {
+        "source": os.fspath(source) if is_path else "<stream>",
+        "dest": os.fspath(dest) if isinstance(dest, (str, os.PathLike)) else "<stream>",
+        "cache": None,
+        "sections": 0,
+        "sections_reused": 0,
+    }
+
+    doc_key = None
+    if cache is not None and is_path:
+        # the date is part of the key: sources without a "Data:" line get today's in the header
+        doc_key = make_key("document", renderer_fingerprint(), theme, toc, profile, build_date(profile.deterministic),
+                           file_digest(source))
+        if cache.get_document(doc_key, dest):
+            stats.update(cache="hit", pages=None, flowables=0, font_bytes=None,
+                         bytes=os.path.getsize(dest) if stats["dest"] != "<stream>" else dest.tell(),
+                         seconds=time.perf_counter() - start)
+            return stats
+        stats["cache"] = "miss"
+
+    fh = open(source, encoding="utf-8") if is_path else source
+    try:
+        return render_blocks(iter_blocks(fh), dest, theme, cache, profiler, toc, profile, _doc_key=doc_key,
+                             _stats=stats, _start=start)
+    finally:
+        if is_path:
+            fh.close()
+
+
+def render_blocks(blocks, dest, theme=DEFAULT_THEME, cache=None, profiler=None, toc=False,
+                  profile=DEFAULT_PROFILE, _doc_key=None, _stats=None, _start=None, _meta=None, _on_page=None):
+    """Render already tokenized blocks (see iter_blocks) to ``dest``.
+
+    This is the entry point for generated reports (e.g. reconcile.py) that
+    build their blocks from data instead of from a markdown file. With
+    ``toc`` the blocks are read in full first: the TOC needs every heading.
+    """
+    start = time.perf_counter() if _start is None else _start
+    stats = _stats if _stats is not None else {
+        "source": "<blocks>",
+        "dest": os.fspath(dest) if isinstance(dest, (str, os.PathLike)) else "<stream>",
+        "cache": None,
+        "sections": 0,
+        "sections_reused": 0,
+    }
+    st = get_styles(theme)
+    meta = new_meta(profile.deterministic) if _meta is None else _meta
+    on_page = add_page_number if _on_page is None else _on_page
+    if toc:
+        from pdf_toc import with_toc
+        blocks = with_toc(blocks)
+    if cache is not None:
+        make_story = lambda blocks: iter_cached_flowables(st, blocks, meta, cache, stats)
+    else:
+        make_story = lambda blocks: iter_flowables(st, blocks, meta)
+    if profiler is None:
+        story = LazyStory(make_story(blocks))
+    else:   # the profiler times the story on its own, so it builds it up front
+        profiler.source = stats["source"]
+        story = LazyStory(profiler.collect_story(blocks, make_story))
+
+    if _doc_key is not None and stats["dest"] == "<stream>":
+        target = io.BytesIO()
+    else:
+        target = dest
+    doc = new_doc(target, st, meta, profile)
+    with output_settings(profile):
+        if profiler is None:
+            doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
+        else:
+            profiler.build(doc, story, on_page)
+
+    if target is not dest:
+        data = target.getvalue()
+        dest.write(data)
+        cache.put_document_bytes(_doc_key, data)
+        size = len(data)
+    elif stats["dest"] != "<stream>":
+        size = os.path.getsize(dest)
+        if _doc_key is not None:
+            cache.put_document(_doc_key, dest)
+    else:
+        size = dest.tell()
+
+    font_bytes = 0
+    if theme.fonts:
+        from pdf_fonts import embedded_font_bytes
+        font_bytes = embedded_font_bytes(doc)
+    stats.update(pages=doc.page, flowables=story.count, bytes=size, font_bytes=font_bytes,
+                 seconds=time.perf_counter() - start)
+    return stats
+
 
 # ═══════════════════════════════════════════════════════════════════════
-# NOTES
+# BATCH
 # ═══════════════════════════════════════════════════════════════════════
-story.append(Paragraph("Notes per als professors", style_h1))
-
-notes = [
-    "<b>Secció 1:</b> Reviseu si aquests alumnes haurien de tenir fitxa de traspàs o si és correcte que no en tinguin.",
-    "<b>Secció 2:</b> Alguns d'aquests alumnes probablement han causat <b>baixa</b> "
-    "(Lucas Cortés — UEC, Alba Borrego — canvi d'escola, Natalia Giménez — 16 anys, "
-    "Yanira Jiménez — 16 anys). Confirmeu la situació de cadascun.",
-    "<b>Secció 3:</b> Molts alumnes amb <b>SSD</b> (Servei de Suport a la Diversitat) "
-    "apareixen a les graelles NESE però no estan marcats al traspàs. Això pot ser intencionat o un oblit. "
-    "Si us plau, reviseu si cal marcar-los com a graella_nese = true al traspàs.",
-    "<b>Alumnes que apareixen a les seccions 1 i 3:</b> Hi ha alumnes que apareixen a ambdues seccions "
-    "(per exemple, Ferdaus Boukayour, Yassine Chamlal, Ashly Jhoana Duarte, etc.). "
-    "Aquests alumnes tenen dades NESE però no tenen cap dada de traspàs. "
-    "Cal revisar si s'han oblidat d'omplir el traspàs o si hi ha algun altre motiu.",
-]
-
-for i, note in enumerate(notes, 1):
-    story.append(Paragraph(f"{i}. {note}", style_body))
-    story.append(Spacer(1, 4))
-
-story.append(Spacer(1, 20))
-add_hr()
-story.append(Paragraph(
-    "Informe generat automàticament per Turonia a partir de les dades dels Excels de traspàs i NESE del curs 2024-2025.",
-    style_footer
-))
-
-
-# ── Page numbering ──────────────────────────────────────────────────────
-def add_page_number(canvas_obj, doc_obj):
-    canvas_obj.saveState()
-    canvas_obj.setFont("Helvetica", 8)
-    canvas_obj.setFillColor(MUTED)
-    page_num = canvas_obj.getPageNumber()
-    text = f"Pàgina {page_num}"
-    canvas_obj.drawCentredString(PAGE_W / 2, 1.2 * cm, text)
-    # Header line
-    canvas_obj.setStrokeColor(BORDER_COLOR)
-    canvas_obj.setLineWidth(0.5)
-    canvas_obj.line(MARGIN, PAGE_H - 2 * cm, PAGE_W - MARGIN, PAGE_H - 2 * cm)
-    canvas_obj.setFont("Helvetica", 7)
-    canvas_obj.drawString(MARGIN, PAGE_H - 1.8 * cm, "Escola el Turó — Informe d'inconsistències BD")
-    canvas_obj.drawRightString(PAGE_W - MARGIN, PAGE_H - 1.8 * cm, "22/02/2026")
-    canvas_obj.restoreState()
+def expand_sources(patterns):
+    """Resolve files, directories (every .md below them) and glob patterns, in order."""
+    seen, sources = set(), []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "**", "*.md"), recursive=True))
+        elif os.path.exists(pattern) or not glob.has_magic(pattern):
+            matches = [pattern]   # a missing file is reported as a failed render
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+        for path in matches:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                sources.append(path)
+    return sources
+
+
+def output_for(source, out_dir=None):
+    name = os.path.splitext(os.path.basename(source))[0] + ".pdf"
+    return os.path.join(out_dir or os.path.dirname(source), name)
+
+
+def _init_worker(theme):
+    """Load reportlab and build the style set once per worker process."""
+    get_styles(theme)
+
+
+def pool_map(fn, tasks, jobs, initializer=_init_worker, initargs=(DEFAULT_THEME,)):
+    """``fn(*task)`` for every task across ``jobs`` worker processes; the results in task order.
+
+    With one job the tasks run in this process, after ``initializer``. ``fn``
+    should catch its own errors so one failed task doesn't stop the others.
+    """
+    if jobs == 1:
+        initializer(*initargs)
+        return [fn(*task) for task in tasks]
+    results = [None] * len(tasks)
+    with ProcessPoolExecutor(jobs, initializer=initializer, initargs=initargs) as pool:
+        futures = {pool.submit(fn, *task): i for i, task in enumerate(tasks)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)."""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _render_job(source, dest, theme, cache, toc=False, profile=DEFAULT_PROFILE):
+    try:
+        return render(source, dest, theme, cache, toc=toc, profile=profile)
+    except Exception as exc:  # reported in the summary, the batch goes on
+        return {"source": source, "dest": dest, "error": f"{type(exc).__name__}: {exc}"}
+
+
+def render_batch(sources, out_dir=None, jobs=None, theme=DEFAULT_THEME, cache=None, toc=False,
+                 profile=DEFAULT_PROFILE):
+    """Render many documents across a process pool; returns the stats in input order."""
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tasks = [(source, output_for(source, out_dir)) for source in sources]
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(tasks)))
+    return pool_map(_render_job, [(source, dest, theme, cache, toc, profile) for source, dest in tasks],
+                    jobs, initargs=(theme,))
+
+
+def print_summary(results, wall):
+    width = max([len(os.path.basename(r["source"])) for r in results] + [8])
+    print(f"{'Document':<{width}}  {'Pages':>5}  {'KB':>7}  {'Seconds':>7}")
+    for r in results:
+        name = os.path.basename(r["source"])
+        if "error" in r:
+            print(f"{name:<{width}}  FAILED  {r['error']}")
+        else:
+            pages = "-" if r["pages"] is None else r["pages"]
+            note = "  (cached)" if r.get("cache") == "hit" else ""
+            if r.get("sections_reused"):
+                note = f"  ({r['sections_reused']}/{r['sections']} sections reused)"
+            if r.get("font_bytes"):
+                note += f"  (fonts {r['font_bytes'] / 1024:.1f} KB)"
+            print(f"{name:<{width}}  {pages:>5}  {r['bytes'] / 1024:>7.1f}  {r['seconds']:>7.2f}{note}")
+    failed = sum("error" in r for r in results)
+    print(f"{len(results)} documents, {failed} failed, {wall:.2f}s wall")
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sources", nargs="*", default=[default_source],
+                        help="markdown files, directories or glob patterns")
+    parser.add_argument("-o", "--output", help="PDF path when rendering a single file")
+    parser.add_argument("--out-dir", help="directory for the PDFs (default: next to each source)")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--no-cache", action="store_true", help="render everything from scratch")
+    parser.add_argument("--cache-dir", help="cache location (default: ~/.cache/turonia/md_to_pdf)")
+    parser.add_argument("--cache-size", type=int, default=256, help="cache size limit in MB")
+    parser.add_argument("--profile", nargs="?", const="-", metavar="REPORT.json",
+                        help="time the render phases (implies --no-cache); JSON report to a file")
+    parser.add_argument("--trace", metavar="TRACE.json", help="with --profile, also write a Chrome trace")
+    parser.add_argument("--font", nargs="+", metavar="TTF",
+                        help="TrueType family to use instead of Helvetica: regular [bold [italic [bold italic]]]")
+    parser.add_argument("--toc", action="store_true", help="add a table of contents after the title")
+    parser.add_argument("--parallel", action="store_true",
+                        help="split a single document at its sections across -j processes (needs PyMuPDF)")
+    parser.add_argument("--watch", action="store_true",
+                        help="stay running and re-render each document whenever it is saved")
+    parser.add_argument("--output-profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE.name,
+                        help="image resolution and encoding of the PDF (default: %(default)s)")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="fixed timestamps and IDs, so identical sources give identical bytes")
+    args = parser.parse_args(argv)
+    theme = DEFAULT_THEME._replace(fonts=tuple(os.path.abspath(f) for f in args.font)) if args.font else DEFAULT_THEME
+    profile = PROFILES[args.output_profile]
+    if args.deterministic:
+        profile = profile._replace(deterministic=True)
+    profiling = args.profile is not None
+    if args.trace and not profiling:
+        parser.error("--trace needs --profile")
+    cache = None if args.no_cache or profiling else RenderCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+    sources = expand_sources(args.sources)
+    if not sources:
+        parser.error("no markdown files found")
+    single = len(sources) == 1 and os.path.isfile(args.sources[0]) and len(args.sources) == 1
+    if args.output and not single:
+        parser.error("--output only applies to a single source file; use --out-dir")
+    if profiling and not single:
+        parser.error("--profile only applies to a single source file")
+    if args.parallel and (not single or profiling):
+        parser.error("--parallel only applies to a single source file, without --profile")
+    if args.watch and (profiling or args.parallel):
+        parser.error("--watch can't be combined with --profile or --parallel")
+
+    if args.watch:
+        from render_watch import watch
+        if args.out_dir:
+            os.makedirs(args.out_dir, exist_ok=True)
+        outputs = [args.output] if single and args.output else [output_for(s, args.out_dir) for s in sources]
+        try:
+            watch(sources, outputs, theme, cache, args.toc, profile, log=lambda line: print(line, flush=True))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if single:
+        output = args.output or output_for(sources[0], args.out_dir)
+        profiler = None
+        if profiling:
+            from render_profile import Profiler
+            profiler = Profiler()
+        if args.parallel:
+            from pdf_parallel import render_parallel
+            with open(sources[0], encoding="utf-8") as fh:
+                stats = render_parallel(iter_blocks(fh), output, theme, args.jobs, cache, args.toc, profile)
+        else:
+            stats = render(sources[0], output, theme, cache, profiler, args.toc, profile)
+        detail = "unchanged, from cache" if stats["cache"] == "hit" else f"{stats['pages']} pages"
+        if stats.get("parts", 1) > 1:
+            detail += f" in {stats['parts']} partitions"
+        if stats["sections_reused"]:
+            detail += f", {stats['sections_reused']}/{stats['sections']} sections reused"
+        if stats["font_bytes"]:
+            detail += f", {stats['font_bytes'] / 1024:.0f} KB of embedded fonts"
+        print(f"PDF generated: {os.path.abspath(output)} "
+              f"({detail}, {stats['bytes'] / 1024:.0f} KB, {stats['seconds']:.2f}s)")
+        if profiler is not None:
+            print(profiler.summary())
+            if args.profile != "-":
+                profiler.write_report(args.profile)
+                print(f"Profile written: {os.path.abspath(args.profile)}")
+            if args.trace:
+                profiler.write_trace(args.trace)
+                print(f"Trace written: {os.path.abspath(args.trace)}")
+        return 0
+
+    start = time.perf_counter()
+    results = render_batch(sources, args.out_dir, args.jobs, theme, cache, args.toc, profile)
+    print_summary(results, time.perf_counter() - start)
+    return 1 if any("error" in r for r in results) else 0
 
 
-# ── Build ───────────────────────────────────────────────────────────────
-doc.build(story, onFirstPage=add_page_number, onLaterPages=add_page_number)
-print(f"PDF generated: {os.path.abspath(output_path)}")
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""TrueType font families for md_to_pdf.
+
+``register_family(paths)`` registers a regular / bold / italic / bold italic
+family with reportlab, once per process. Parsing a TTF (tables, glyph map,
+widths of every character) is the expensive part, so the parsed faces are
+pickled to a disk cache keyed on the font file's content: later runs and
+every batch worker load them instead of parsing again.
+
+reportlab embeds TrueType fonts as subsets, so a document carries only the
+glyphs it actually uses; ``embedded_font_bytes(doc)`` reports how much that
+is for a finished document.
+"""
+
+from functools import lru_cache
+import os
+import pickle
+import tempfile
+import zlib
+
+from reportlab import rl_config
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTEncoding, TTFont, TTFontFace
+import reportlab
+
+from render_cache import default_cache_dir, file_digest, make_key
+
+VARIANTS = ("regular", "bold", "italic", "bold_italic")
+
+# Base-14 names used by the default styles, and the variant that replaces them
+BASE14_VARIANTS = {
+    "Helvetica": "regular",
+    "Helvetica-Bold": "bold",
+    "Helvetica-Oblique": "italic",
+    "Helvetica-BoldOblique": "bold_italic",
+}
+
+
+def font_cache_dir():
+    """Next to the render cache, not in it: parsed faces don't count towards its size or get evicted."""
+    return os.path.join(os.path.dirname(default_cache_dir()), "fonts")
+
+
+def _scale(units_per_em):
+    """The face's font-units -> PDF glyph-space scale (a lambda in reportlab, so not picklable)."""
+    if units_per_em == 1000:
+        return lambda x: x
+    factor = 1000 / units_per_em
+    return lambda x: x * factor
+
+
+def load_face(path, cache_dir=None):
+    """Parsed TTFontFace for ``path``, from the disk cache when the file is unchanged."""
+    cache_dir = cache_dir or font_cache_dir()
+    key = make_key("ttf", reportlab.Version, file_digest(path))
+    cached = os.path.join(cache_dir, key + ".pkl")
+    try:
+        with open(cached, "rb") as fh:
+            state = pickle.load(fh)
+        face = TTFontFace.__new__(TTFontFace)
+        face.__dict__.update(state)
+        face._pdfScale = _scale(face.unitsPerEm)
+        return face
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        pass
+
+    face = TTFontFace(path)
+    state = {k: v for k, v in vars(face).items() if k != "_pdfScale"}
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump(state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cached)
+    except OSError:   # a read-only cache only costs the parse next time
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return face
+
+
+def make_font(name, face):
+    """A TTFont around an already parsed face (TTFont() itself would parse the file again)."""
+    font = TTFont.__new__(TTFont)
+    font.fontName = name
+    font.face = face
+    font.encoding = TTEncoding()
+    from weakref import WeakKeyDictionary
+    font.state = WeakKeyDictionary()
+    font._asciiReadable = rl_config.ttfAsciiReadable
+    font.shapable = False   # Catalan needs no complex-script shaping
+    return font
+
+
+@lru_cache(maxsize=None)
+def register_family(paths, cache_dir=None):
+    """Register TTF files (regular[, bold[, italic[, bold italic]]]) as one family.
+
+    Missing variants fall back to the closest one given. Returns
+    {variant: registered font name}. On a reportlab outside
+    md_to_pdf.REPORTLAB_TESTED the fonts are parsed by TTFont itself, with
+    no disk cache: make_font builds them from its internals.
+    """
+    from md_to_pdf import reportlab_internals
+
+    paths = tuple(paths) + (None,) * (len(VARIANTS) - len(paths))
+    regular, bold, italic, bold_italic = paths
+    files = {
+        "regular": regular,
+        "bold": bold or regular,
+        "italic": italic or regular,
+        "bold_italic": bold_italic or bold or italic or regular,
+    }
+    family = os.path.splitext(os.path.basename(regular))[0]
+    names, faces = {}, {}
+    for variant in VARIANTS:
+        path = os.path.abspath(files[variant])
+        name = family if variant == "regular" else f"{family}-{variant}"
+        if not reportlab_internals():
+            font = TTFont(name, path)
+        else:
+            if path not in faces:
+                faces[path] = load_face(path, cache_dir)
+            font = make_font(name, faces[path])
+        pdfmetrics.registerFont(font)
+        names[variant] = name
+    pdfmetrics.registerFontFamily(family, normal=names["regular"], bold=names["bold"],
+                                  italic=names["italic"], boldItalic=names["bold_italic"])
+    return names
+
+
+def embedded_font_bytes(doc):
+    """Compressed size of the font subsets embedded in a built document."""
+    pdf = doc.canv._doc
+    total = 0
+    for name, obj in pdf.idToObject.items():
+        if name.startswith("fontFile:"):
+            total += len(zlib.compress(obj.content)) if pdf.compression else len(obj.content)
+    return total
@@ -0,0 +1,218 @@
+"""Parallel layout of one large document.
+
+``doc.build`` lays a story out page by page in a single thread, so a
+3,000-page report takes as long as its longest chain of pages. For such
+documents ``render_parallel`` cuts the blocks at section headings (the
+``style_h1`` headings: markdown levels 1 and 2) into one partition of
+similar weight per worker, lays the partitions out side by side and
+stitches the PDFs together with PyMuPDF:
+
+* every partition draws the same running header, built from the metadata
+  of the whole document (title and date come from its first section);
+* the "Pàgina X de Y" footers are written by add_page_number as usual,
+  once every partition has reported its page count: each one is told the
+  pages before it and the total (``doc.place_pages``), so the numbering runs
+  on across partitions in the theme's font;
+* the bookmarks of each partition are shifted by the pages before it and
+  merged into one outline;
+* with ``toc`` the table of contents is laid out in the first partition.
+  Its page numbers come from the heading pages every partition reports,
+  and its links, which can't point into another partition's PDF, are added
+  when stitching.
+
+A section never straddles two partitions, so the page breaks only differ
+from a sequential render at the partition boundaries (each partition starts
+on a new page).
+
+PyMuPDF is only needed for this mode: ``pip install pymupdf``.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import io
+import multiprocessing
+import os
+import queue
+import time
+
+import md_to_pdf
+from md_to_pdf import DEFAULT_PROFILE, DEFAULT_THEME, PAGE_H
+
+ABORT = None   # sent instead of a placement when another partition failed
+
+
+def section_weight(section):
+    """Rough layout cost of a section: one per block plus one per table cell."""
+    return sum(1 + (len(block[1]) * len(block[2]) if block[0] == "table" else 0) for block in section)
+
+
+def partition(blocks, parts):
+    """Split blocks at section boundaries into at most ``parts`` runs of similar weight."""
+    sections = list(md_to_pdf.iter_sections(blocks))
+    target = sum(section_weight(s) for s in sections) / max(parts, 1)
+    partitions, current, weight = [], [], 0
+    for section in sections:
+        current.extend(section)
+        weight += section_weight(section)
+        if weight >= target * (len(partitions) + 1) and len(partitions) < parts - 1:
+            partitions.append(current)
+            current = []
+    if current:
+        partitions.append(current)
+    return partitions
+
+
+def document_meta(st, blocks, profile=DEFAULT_PROFILE):
+    """Title and date of the whole document, read from its first section."""
+    meta = md_to_pdf.new_meta(profile.deterministic)
+    first = next(md_to_pdf.iter_sections(blocks), [])
+    for _ in md_to_pdf.iter_flowables(st, first, meta):
+        pass
+    return meta
+
+
+def _render_part(index, blocks, theme, cache, meta, counts, placement, profile=DEFAULT_PROFILE):
+    """Lay out one partition (runs in a worker): returns (pdf bytes, stats, toc slots).
+
+    Once laid out, the partition reports its page count and heading pages on
+    ``counts`` and waits on ``placement`` for where it sits in the whole
+    document, then writes its footers and the PDF.
+    """
+    laid_out = {}
+
+    def place_pages(pages, heading_pages):
+        counts.put((index, pages, heading_pages))
+        placed = placement.get()
+        if placed is ABORT:
+            raise RuntimeError(f"partition {index}: another partition failed")
+        return placed
+
+    def on_page(canvas_obj, doc_obj):
+        if not laid_out:
+            laid_out["doc"] = doc_obj
+            doc_obj.place_pages = place_pages
+        md_to_pdf.add_page_number(canvas_obj, doc_obj)
+
+    # The first partition holds the title page and fills its own metadata;
+    # the others start from the document's, which also marks the title as seen.
+    out = io.BytesIO()
+    stats = md_to_pdf.render_blocks(blocks, out, theme, cache, profile=profile,
+                                    _meta=md_to_pdf.new_meta(profile.deterministic) if index == 0 else dict(meta),
+                                    _on_page=on_page)
+    slots = [{"page": slot["page"], "rect": slot["rect"], "entry": slot["entry"]}
+             for slot in laid_out["doc"].toc_slots]
+    return out.getvalue(), stats, slots
+
+
+def place_partitions(counts, placements, futures):
+    """Tell every partition (pages before it, total pages, heading pages of the document).
+
+    Only the total needs all of them, so nothing is sent until the last
+    partition reported. If one fails, the others are told to give up
+    (ABORT) before its exception is raised: they would wait forever, and
+    so would the pool's shutdown.
+    """
+    reported = {}
+    while len(reported) < len(placements):
+        try:
+            index, pages, heading_pages = counts.get(timeout=0.5)
+        except queue.Empty:
+            for future in futures:
+                if future.done() and future.exception() is not None:
+                    for placement in placements:
+                        placement.put(ABORT)
+                    raise future.exception()
+            continue
+        reported[index] = pages, heading_pages
+    firsts, total, heading_pages = [], 0, []
+    for index in range(len(placements)):
+        pages, headings = reported[index]
+        firsts.append(total)
+        heading_pages.extend(total + page for page in headings)
+        total += pages
+    for first, placement in zip(firsts, placements):
+        placement.put((first, total, heading_pages))
+
+
+def stitch(parts, toc_slots=(), profile=DEFAULT_PROFILE):
+    """PDF bytes of the partitions joined, with their bookmarks merged.
+
+    ``toc_slots`` are the TOC entries of the first partition: each gets a
+    link to the bookmark of its heading.
+    """
+    import pymupdf
+
+    out = pymupdf.open()
+    toc = []
+    for data in parts:
+        with pymupdf.open("pdf", data) as part:
+            offset = out.page_count
+            for level, title, page, dest in part.get_toc(simple=False):
+                toc.append([level, title, page + offset, dict(dest, page=page - 1 + offset)])
+            out.insert_pdf(part)
+    out.set_toc(toc)
+    for slot in toc_slots:
+        x0, y0, x1, y1 = slot["rect"]
+        _, _, page, dest = toc[slot["entry"]]
+        out[slot["page"] - 1].insert_link({"kind": pymupdf.LINK_GOTO, "page": page - 1,
+                                           "to": dest.get("to", pymupdf.Point(0, 0)),
+                                           "from": pymupdf.Rect(x0, PAGE_H - y1, x1, PAGE_H - y0)})
+    # garbage=4 folds the per-partition copies of the header and logo
+    data = out.tobytes(garbage=4, use_objstms=1, no_new_id=profile.deterministic)
+    out.close()
+    return data
+
+
+def render_parallel(blocks, dest, theme=DEFAULT_THEME, jobs=None, cache=None, toc=False,
+                    profile=DEFAULT_PROFILE):
+    """Render blocks to ``dest`` (path or binary file) laying sections out across ``jobs`` processes.
+
+    Returns render_blocks' stats plus ``parts`` and ``part_seconds``.
+    """
+    start = time.perf_counter()
+    blocks = list(blocks)
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    st = md_to_pdf.get_styles(theme)
+    partitions = partition(blocks, jobs)
+    if len(partitions) == 1:
+        stats = md_to_pdf.render_blocks(blocks, dest, theme, cache, toc=toc, profile=profile, _start=start)
+        stats.update(parts=1, part_seconds=[round(stats["seconds"], 3)])
+        return stats
+
+    if toc:   # lands in the first section, so in the first partition
+        from pdf_toc import with_toc
+        partitions = partition(with_toc(blocks, links=False), jobs)
+    meta = document_meta(st, blocks, profile)
+    # Every partition must be running at once: each one waits for the page
+    # counts of all the others.
+    with multiprocessing.Manager() as manager, \
+            ProcessPoolExecutor(len(partitions), initializer=md_to_pdf._init_worker,
+                                initargs=(theme,)) as pool:
+        counts = manager.Queue()
+        placements = [manager.Queue() for _ in partitions]
+        futures = [pool.submit(_render_part, i, part, theme, cache, meta, counts, placements[i], profile)
+                   for i, part in enumerate(partitions)]
+        place_partitions(counts, placements, futures)
+        results = [future.result() for future in futures]
+
+    data = stitch([pdf for pdf, _, _ in results], results[0][2], profile)
+    if isinstance(dest, (str, os.PathLike)):
+        with open(dest, "wb") as fh:
+            fh.write(data)
+    else:
+        dest.write(data)
+
+    part_stats = [stats for _, stats, _ in results]
+    return {
+        "source": "<blocks>",
+        "dest": os.fspath(dest) if isinstance(dest, (str, os.PathLike)) else "<stream>",
+        "cache": None,
+        "sections": sum(s["sections"] for s in part_stats),
+        "sections_reused": sum(s["sections_reused"] for s in part_stats),
+        "pages": sum(s["pages"] for s in part_stats),
+        "flowables": sum(s["flowables"] for s in part_stats),
+        "bytes": len(data),
+        "font_bytes": None,
+        "parts": len(partitions),
+        "part_seconds": [round(s["seconds"], 3) for s in part_stats],
+        "seconds": time.perf_counter() - start,
+    }
@@ -0,0 +1,89 @@
+"""Table of contents for md_to_pdf.
+
+The TOC is laid out once, with the rest of the document. Its entries come
+from the heading blocks, which are all known before layout starts, so the
+TOC takes the same room whatever the page numbers turn out to be. Each
+entry only records where its page number goes (``doc.toc_slots``). The
+numbers are written with the "Pàgina X de Y" footers when the canvas is
+saved, from the pages add_outline_entry saw the headings land on. There is
+no second layout pass the way multiBuild would need.
+
+Kept apart from md_to_pdf.py because TocEntry subclasses a reportlab
+Flowable, like pdf_tables.LongTable.
+"""
+
+from reportlab.pdfbase.pdfmetrics import getAscent
+from reportlab.platypus import Flowable, PageBreak, Paragraph
+
+TOC_TITLE = "Índex"
+NUMBER_WIDTH = 36   # right-hand column kept free for the page numbers
+
+
+class TocEntry(Flowable):
+    """One TOC line: the heading text, and a slot for its page number filled in at save."""
+
+    def __init__(self, paragraph, entry):
+        Flowable.__init__(self)
+        self.paragraph = paragraph
+        self.entry = entry
+
+    def wrap(self, availWidth, availHeight):
+        self.width = availWidth
+        self.height = self.paragraph.wrap(availWidth - NUMBER_WIDTH, availHeight)[1]
+        return self.width, self.height
+
+    def draw(self):
+        self.paragraph.drawOn(self.canv, 0, 0)
+        style = self.paragraph.style
+        baseline = self.height - getAscent(style.fontName, style.fontSize)
+        x0, y0 = self.canv.absolutePosition(0, 0)
+        x1, y1 = self.canv.absolutePosition(self.width, self.height)
+        self.canv._doctemplate.toc_slots.append({
+            "page": self.canv.getPageNumber(),
+            "x": x1,
+            "y": self.canv.absolutePosition(0, baseline)[1],
+            "entry": self.entry,
+            "rect": (x0, y0, x1, y1),
+            "font": style.fontName,
+            "size": style.fontSize,
+            "color": style.textColor,
+        })
+
+
+def toc_entries(blocks):
+    """(level, text) of every heading but the title: the headings add_outline_entry bookmarks."""
+    entries, seen_title = [], False
+    for block in blocks:
+        if block[0] == "heading":
+            if block[1] == 1 and not seen_title:
+                seen_title = True
+                continue
+            entries.append((block[1], block[2]))
+    return entries
+
+
+def with_toc(blocks, links=True):
+    """``blocks`` as a list with a ("toc", entries, links) block right before the first section."""
+    blocks = list(blocks)
+    entries = toc_entries(blocks)
+    if not entries:
+        return blocks
+    title_seen = False
+    for i, block in enumerate(blocks):
+        if block[0] == "heading":
+            if block[1] == 1 and not title_seen:
+                title_seen = True
+                continue
+            return blocks[:i] + [("toc", entries, links)] + blocks[i:]
+    return blocks
+
+
+def toc_flowables(st, entries, links, inline):
+    """The TOC title, one TocEntry per heading and a page break."""
+    yield Paragraph(TOC_TITLE, st.style_toc_title)
+    for i, (level, text) in enumerate(entries):
+        markup = inline(text)
+        if links:   # bookmark names given by md_to_pdf.add_outline_entry
+            markup = f'<a href="#section{i}">{markup}</a>'
+        yield TocEntry(Paragraph(markup, st.style_toc if level <= 2 else st.style_toc_sub), i)
+    yield PageBreak()
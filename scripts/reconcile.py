@@ -0,0 +1,606 @@
+#!/usr/bin/env python3
+"""Reconcile the Clickedu student list with the transfer (traspàs) and NESE workbooks.
+
+Computes the three sections of the inconsistencies report instead of
+copying them by hand:
+
+1. Clickedu students with no transfer data in any traspàs workbook
+   (Infantil 3 is left out: those students are new to the school).
+2. Excel records (traspàs and NESE) that match no Clickedu student.
+3. NESE records whose student has no traspàs row with graella_nese = true.
+
+plus the record / unique-person counts and the students that appear in
+both sections 1 and 3.
+
+Matching goes through hash indexes built once over the Clickedu list
+(names folded to unaccented upper case, word order ignored, an inverted
+token index and a one-edit deletion index for typos), so each Excel row
+costs a handful of dictionary lookups instead of a scan of every student.
+
+Usage:
+    python reconcile.py clickedu.csv -o ../docs/inconsistències_BD.pdf
+    python reconcile.py clickedu.json --examples ../docs/examples --markdown report.md
+    python reconcile.py clickedu.csv -o informe.pdf --html informe.html --xlsx informe.xlsx
+    python reconcile.py clickedu.csv --shard-dir /tmp/informes -j 4   # one PDF per course too
+
+With ``--shard-dir`` the reconciliation runs once and the combined report
+and one report per course (for each tutor) are rendered side by side
+across ``-j`` processes, with a manifest.json listing every file, its
+row counts and its sha256. With ``--deterministic`` (or the archive
+profile) identical inputs give identical files, so those hashes can be
+used to deduplicate stored reports; the report's date then comes from
+SOURCE_DATE_EPOCH, which must be set.
+
+The Clickedu dump is a CSV or JSON export of clickedu_students with at
+least first_name, last_name and class_name (is_repetidor and is_active are
+used when present; camelCase keys are accepted too).
+"""
+
+from collections import defaultdict
+from typing import NamedTuple
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+
+from excel_ingest import ETAPES, Course, expand_workbooks, fold, iter_records, parse_course
+from render_cache import file_digest
+import md_to_pdf
+import report_ir
+
+default_examples = os.path.join(os.path.dirname(__file__), "..", "docs", "examples")
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# NAMES
+# ═══════════════════════════════════════════════════════════════════════
+RE_INITIAL_DOT = re.compile(r"\b([A-Za-z])\.")
+
+
+def name_tokens(name):
+    """Tokens of a person's name, with "Cognoms, Nom" reordered to "Nom Cognoms"."""
+    name = name.split("\n")[0].replace("*", "")
+    name = RE_INITIAL_DOT.sub(r"\1", name)
+    if name.count(",") == 1:
+        surnames, given = (part.strip() for part in name.split(","))
+        if surnames and given:
+            name = f"{given} {surnames}"
+    return fold(name).split()
+
+
+def name_key(tokens):
+    """Order-independent key: "YIN PENGXIANG" and "PENGXIANG YIN" are the same person."""
+    return " ".join(sorted(tokens))
+
+
+def deletes(token):
+    """The token plus every variant with one letter removed (symmetric-delete index)."""
+    return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def within_one_edit(a, b):
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        return sum(x != y for x, y in zip(a, b)) == 1
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# INPUTS
+# ═══════════════════════════════════════════════════════════════════════
+class Student(NamedTuple):
+    first_name: str
+    last_name: str
+    course: Course
+    repetidor: bool
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+
+def _pick(row, *keys):
+    for key in keys:
+        if row.get(key) not in (None, ""):
+            return row[key]
+    return ""
+
+
+def _truthy(value):
+    return str(value).strip().lower() in ("true", "1", "sí", "si", "x", "yes", "t")
+
+
+def load_clickedu(path):
+    """Read a Clickedu clickedu_students dump (CSV or JSON)."""
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as fh:
+            rows = json.load(fh)
+        if isinstance(rows, dict):
+            rows = rows.get("students") or rows.get("data") or []
+    else:
+        with open(path, encoding="utf-8-sig", newline="") as fh:
+            rows = list(csv.DictReader(fh))
+
+    students = []
+    for row in rows:
+        active = _pick(row, "is_active", "isActive")
+        if active != "" and not _truthy(active):
+            continue
+        students.append(Student(
+            first_name=str(_pick(row, "first_name", "firstName")).strip(),
+            last_name=str(_pick(row, "last_name", "lastName")).strip(),
+            course=parse_course(str(_pick(row, "class_name", "className", "course"))),
+            repetidor=_truthy(_pick(row, "is_repetidor", "isRepetidor")),
+        ))
+    return students
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# INDEX
+# ═══════════════════════════════════════════════════════════════════════
+class StudentIndex:
+    """Hash indexes over the Clickedu students, built once in O(total name tokens)."""
+
+    def __init__(self, students):
+        self.students = students
+        self.by_key = defaultdict(list)       # sorted-token key -> student ids
+        self.by_token = defaultdict(set)      # token -> student ids
+        self.by_first = defaultdict(set)      # folded first name -> student ids
+        self.by_delete = defaultdict(set)     # one-letter-deleted token -> tokens
+        for sid, student in enumerate(students):
+            tokens = name_tokens(student.full_name)
+            self.by_key[name_key(tokens)].append(sid)
+            self.by_first[fold(student.first_name)].add(sid)
+            for token in tokens:
+                self.by_token[token].add(sid)
+                for variant in deletes(token):
+                    self.by_delete[variant].add(token)
+
+    def _with_all(self, tokens, lookup):
+        postings = sorted((lookup(t) for t in tokens), key=len)
+        if not postings or not postings[0]:
+            return set()
+        return set.intersection(*postings)
+
+    def _near(self, token):
+        if len(token) < 3:
+            return self.by_token.get(token, set())
+        ids = set()
+        for variant in deletes(token):
+            for candidate in self.by_delete.get(variant, ()):
+                if within_one_edit(token, candidate):
+                    ids |= self.by_token[candidate]
+        return ids
+
+    def match(self, name, course=None):
+        """Student id for an Excel name, or None when no single student fits."""
+        tokens = name_tokens(name)
+        if not tokens:
+            return None
+        strong = [t for t in tokens if len(t) > 1]   # initials such as "M" block matches
+        steps = (
+            lambda: set(self.by_key.get(name_key(tokens), ())),
+            lambda: self._with_all(strong, lambda t: self.by_token.get(t, set())) if len(strong) >= 2 else set(),
+            lambda: self._with_all(strong, self._near) if len(strong) >= 2 else set(),
+            lambda: set(self.by_first.get(tokens[0], ())) if len(tokens) == 1 else set(),
+        )
+        for step in steps:
+            ids = step()
+            if len(ids) > 1 and course is not None:
+                ids = {sid for sid in ids if self.students[sid].course == course} or ids
+            if len(ids) == 1:
+                return next(iter(ids))
+            if ids:
+                return None   # ambiguous: better reported than silently guessed
+        return None
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# RECONCILIATION
+# ═══════════════════════════════════════════════════════════════════════
+class Reconciliation(NamedTuple):
+    students: list
+    missing_transfer: list     # section 1: Student
+    excluded_i3: int
+    unknown: list              # section 2: (name, course, [sources], note)
+    unknown_records: int
+    nese_unflagged: list       # section 3: (Student, excel_ingest.Record)
+    overlap_1_3: list          # Students in both sections 1 and 3
+
+
+def nise_value(value):
+    v = str(value or "").strip().lower()
+    if not v:
+        return None
+    if "sls" in v:
+        return "sls"
+    if "nise" in v and "no" not in v:
+        return "nise"
+    if v.startswith("no"):
+        return "no"
+    return None
+
+
+def first_note(record, *names, limit=140):
+    for name in names:
+        value = str(getattr(record, name) or "").strip()
+        if value and value.lower() not in ("false", "true", "none"):
+            value = " ".join(value.split())
+            return value if len(value) <= limit else value[:limit - 1].rstrip() + "…"
+    return "—"
+
+
+def reconcile(students, records):
+    """Compare the Clickedu students with a stream of excel_ingest Records."""
+    index = StudentIndex(students)
+    has_transfer, flagged = set(), set()
+    unknown = {}   # person key -> [name, course, sources, note]
+    unknown_records = 0
+    nese_matches = []
+
+    # A student listed twice in the same kind of workbook keeps the later row
+    # (the most recent class), so only one record per person is held
+    latest = {}
+    for record in records:
+        tokens = name_tokens(record.name)
+        if tokens:
+            key = name_key(tokens)
+            latest.pop((record.source, key), None)
+            latest[(record.source, key)] = record
+
+    for (_, key), record in latest.items():
+        sid = index.match(record.name, record.course)
+        if sid is None:
+            unknown_records += 1
+            note = first_note(record, "observacions", "dades_rellevants", "dades_familiars", "academic")
+            display = record.name.split("\n")[0].strip()
+            entry = unknown.setdefault(key, [display, record.course, [], note])
+            if record.source not in entry[2]:
+                entry[2].append(record.source)
+            if entry[3] == "—":
+                entry[3] = note
+            continue
+        if record.kind == "traspass":
+            has_transfer.add(sid)
+            if _truthy(record.graella_nese):
+                flagged.add(sid)
+        else:
+            nese_matches.append((sid, record))
+
+    i3 = Course("infantil", 3)   # new to the school: no transfer expected
+    missing, excluded = [], []
+    for sid, student in enumerate(students):
+        if sid not in has_transfer:
+            (excluded if student.course == i3 else missing).append(sid)
+    unflagged = [(sid, record) for sid, record in nese_matches if sid not in flagged]
+    overlap = sorted(set(missing) & {sid for sid, _ in unflagged})
+
+    return Reconciliation(
+        students=students,
+        missing_transfer=[students[sid] for sid in missing],
+        excluded_i3=len(excluded),
+        unknown=[tuple(entry) for entry in unknown.values()],
+        unknown_records=unknown_records,
+        nese_unflagged=[(students[sid], record) for sid, record in unflagged],
+        overlap_1_3=[students[sid] for sid in overlap],
+    )
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# REPORT
+# ═══════════════════════════════════════════════════════════════════════
+MONTH_NAMES = {n: name for name, n in md_to_pdf.CATALAN_MONTHS.items()}
+
+
+def catalan_date(day):
+    month = MONTH_NAMES[day.month]
+    return f"{day.day} {'d' + chr(39) if month[0] in 'ao' else 'de '}{month} de {day.year}"
+
+
+def alumnes(n):
+    return f"{n} alumne" if n == 1 else f"{n} alumnes"
+
+
+def group_by_course(items, course_of, repetidor_of=lambda item: False):
+    groups = defaultdict(list)
+    for item in items:
+        groups[(course_of(item), repetidor_of(item))].append(item)
+    unknown_last = (len(ETAPES), 0)
+    for (course, repetidor) in sorted(groups, key=lambda k: (k[0].order if k[0] else unknown_last, k[1])):
+        label = course.label if course else "Curs desconegut"
+        if repetidor:
+            label += " - repetidor"
+        yield label, groups[(course, repetidor)]
+
+
+def yes_no(value):
+    return "Sí" if _truthy(value) else "No"
+
+
+def report_blocks(result, school_year="2024-2025 → 2025-2026", today=None, scope=None):
+    """The inconsistencies report as md_to_pdf blocks, computed from ``result``.
+
+    ``scope`` is the course label of a single-course report (see shard_by_course).
+    """
+    today = today or md_to_pdf.build_date()
+    s1, s2, s3 = result.missing_transfer, result.unknown, result.nese_unflagged
+    people_2 = len(s2)
+
+    title = "Informe d'inconsistències de la Base de Dades"
+    yield ("heading", 1, f"{title} — {scope}" if scope else title)
+    yield ("paragraph", [f"**Data**: {catalan_date(today)}", f"**Curs escolar**: {school_year}"])
+    yield ("hr",)
+
+    yield ("heading", 2, "Resum")
+    yield ("table", ["Inconsistència", "Alumnes afectats"], [
+        ["1. Alumnes a Clickedu sense dades de traspàs als Excels", str(len(s1))],
+        ["2. Alumnes als Excels que no existeixen a Clickedu",
+         f"{result.unknown_records} ({people_2} persones úniques)"],
+        ["3. Alumnes amb registre NESE sense `graella_nese` al traspàs", str(len(s3))],
+    ])
+    yield ("hr",)
+
+    yield ("heading", 2, "1. Alumnes a Clickedu sense dades de traspàs als Excels")
+    yield ("paragraph", [
+        f"Aquests {len(s1)} alumnes consten a la base de dades de Clickedu (són alumnes actius del centre) "
+        "però **no apareixen a cap dels Excels de traspàs de tutories**. Per tant, no tenim cap dada de "
+        "traspàs (dades familiars, acadèmiques, comportament, acords de tutoria, etc.) per a ells."
+    ])
+    if result.excluded_i3:
+        yield ("quote", [f"**Nota**: S'han exclòs els {result.excluded_i3} alumnes d'Infantil 3, ja que són "
+                         "nous al centre i és esperable que no tinguin traspàs previ."])
+    yield ("paragraph", ["**Acció necessària**: Confirmeu si aquests alumnes haurien de tenir fitxa de "
+                         "traspàs o si és correcte que no en tinguin."])
+    for label, group in group_by_course(s1, lambda s: s.course, lambda s: s.repetidor):
+        yield ("heading", 3, f"{label} ({alumnes(len(group))})")
+        yield ("table", ["Nom", "Cognoms"], [[s.first_name, s.last_name] for s in group])
+    yield ("hr",)
+
+    yield ("heading", 2, "2. Alumnes als Excels que no existeixen a Clickedu")
+    yield ("paragraph", [
+        f"Aquests {result.unknown_records} registres ({people_2} persones úniques) apareixen als Excels de "
+        "traspàs i/o NESE però **no s'han pogut trobar a la base de dades de Clickedu**. Les seves dades "
+        "no s'han pogut importar."
+    ])
+    yield ("paragraph", ["**Acció necessària**: Confirmeu si aquests alumnes han causat baixa, han canviat "
+                         "de centre, o si es tracta d'errors als Excels. Si han de continuar al centre, "
+                         "caldria donar-los d'alta a Clickedu."])
+    for label, group in group_by_course(s2, lambda u: u[1]):
+        yield ("heading", 3, f"{label} ({alumnes(len(group))})")
+        yield ("table", ["Nom", "Font Excel", "Notes"],
+               [[name, " + ".join(sources), note] for name, _, sources, note in group])
+    yield ("hr",)
+
+    yield ("heading", 2, "3. Alumnes amb registre NESE sense indicació de `graella_nese` al traspàs")
+    yield ("paragraph", [
+        f"Aquests {len(s3)} alumnes tenen un registre a la **graella NESE** (Excels de NESE per nivell) "
+        "però **no estan marcats com a `graella_nese = true`** a la seva fitxa de traspàs de tutories. "
+        "Això pot ser correcte (alumnes amb seguiment SSD o observació que no estan formalment a la "
+        "graella NESE del traspàs) o pot indicar una manca de coordinació entre les dues fonts."
+    ])
+    yield ("paragraph", ["**Acció necessària**: Reviseu si aquests alumnes haurien de tenir "
+                         "`graella_nese = true` al traspàs o si és correcte que no el tinguin."])
+    by_nise = defaultdict(int)
+    for _, record in s3:
+        by_nise[nise_value(record.nise)] += 1
+    yield ("heading", 3, "Resum per tipus de situació NESE:")
+    yield ("table", ["Tipus", "Alumnes"], [
+        [label, str(by_nise[key])] for key, label in (
+            (None, "Sense NISE definit (seguiment, observació, SSD)"),
+            ("no", 'NISE = "no" (explícitament sense NISE, però amb seguiment)'),
+            ("nise", 'NISE = "nise" (amb NISE reconegut, sense marcar al traspàs)'),
+            ("sls", 'NISE = "sls" (Situació Lleu de Salut)'),
+        ) if by_nise[key]
+    ])
+    nise_labels = {None: "—", "no": "No", "nise": "NISE", "sls": "SLS"}
+    for label, group in group_by_course(s3, lambda item: item[0].course):
+        yield ("heading", 3, f"{label} ({alumnes(len(group))})")
+        yield ("table", ["Nom", "Cognoms", "SSD", "NISE", "Mesura NESE", "Detall"], [
+            [s.first_name, s.last_name, yes_no(r.ssd), nise_labels[nise_value(r.nise)],
+             str(r.mesura_nese or "—").strip(), first_note(r, "observacions", "dades_rellevants")]
+            for s, r in group
+        ])
+    yield ("hr",)
+
+    yield ("heading", 2, "Notes per als professors")
+    notes = [
+        "**Secció 1**: Reviseu si aquests alumnes haurien de tenir fitxa de traspàs o si és correcte "
+        "que no en tinguin.",
+        "**Secció 2**: Alguns d'aquests alumnes probablement han causat **baixa**. Confirmeu la "
+        "situació de cadascun.",
+        "**Secció 3**: Molts alumnes amb **SSD** (Servei de Suport a la Diversitat) apareixen a les "
+        "graelles NESE però no estan marcats al traspàs. Això pot ser intencionat o un oblit. Si us "
+        "plau, reviseu si cal marcar-los com a `graella_nese = true` al traspàs.",
+    ]
+    if result.overlap_1_3:
+        names = ", ".join(s.full_name for s in result.overlap_1_3)
+        notes.append(
+            f"**Alumnes que apareixen a les seccions 1 i 3** ({len(result.overlap_1_3)}): {names}. "
+            "Aquests alumnes tenen dades NESE però no tenen cap dada de traspàs. Cal revisar si "
+            "s'han oblidat d'omplir el traspàs o si hi ha algun altre motiu."
+        )
+    for i, note in enumerate(notes, 1):
+        yield ("list_item", 0, f"{i}.", note)
+    yield ("hr",)
+    yield ("paragraph", ["*Informe generat automàticament per Turonia a partir de les dades dels Excels "
+                         "de traspàs i NESE.*"])
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# SHARDS
+# ═══════════════════════════════════════════════════════════════════════
+COMBINED_NAME = "inconsistencies.pdf"
+MANIFEST_NAME = "manifest.json"
+
+
+def shard_by_course(result):
+    """(course, the Reconciliation restricted to that course) for every course in it, in course order.
+
+    One pass over the three sections; Students and Records are shared with
+    ``result``, not copied. The course of an unmatched Excel record is the
+    one the workbook gave it, and None when it had none.
+    """
+    shards = defaultdict(lambda: ([], [], [], []))
+    for student in result.missing_transfer:
+        shards[student.course][0].append(student)
+    for entry in result.unknown:
+        shards[entry[1]][1].append(entry)
+    for student, record in result.nese_unflagged:
+        shards[student.course][2].append((student, record))
+    for student in result.overlap_1_3:
+        shards[student.course][3].append(student)
+    unknown_last = (len(ETAPES), 0)
+    for course in sorted(shards, key=lambda c: c.order if c else unknown_last):
+        missing, unknown, unflagged, overlap = shards[course]
+        yield course, result._replace(
+            missing_transfer=missing,
+            excluded_i3=result.excluded_i3 if course == Course("infantil", 3) else 0,
+            unknown=unknown,
+            unknown_records=sum(len(sources) for _, _, sources, _ in unknown),   # one record per source
+            nese_unflagged=unflagged,
+            overlap_1_3=overlap,
+        )
+
+
+def shard_filename(course):
+    name = unicodedata.normalize("NFD", course.label if course else "Curs desconegut")
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    return "inconsistencies-" + re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") + ".pdf"
+
+
+def row_counts(result):
+    """Table rows per section of a report."""
+    return {
+        "missing_transfer": len(result.missing_transfer),
+        "unknown": len(result.unknown),
+        "nese_unflagged": len(result.nese_unflagged),
+    }
+
+
+def _render_report(blocks, dest, profile):
+    try:
+        return md_to_pdf.render_blocks(blocks, dest, profile=profile)
+    except Exception as exc:  # reported in the manifest, the other shards go on
+        return {"dest": dest, "error": f"{type(exc).__name__}: {exc}"}
+
+
+def render_shards(result, out_dir, jobs=None, school_year="2024-2025 → 2025-2026", today=None,
+                  profile=md_to_pdf.DEFAULT_PROFILE):
+    """Render the combined report and one report per course into ``out_dir`` across ``jobs`` processes.
+
+    The blocks of every report are built here from the one ``result``, so
+    the workers only lay them out. Writes manifest.json and returns it.
+    """
+    today = today or md_to_pdf.build_date()
+    os.makedirs(out_dir, exist_ok=True)
+    reports = [(None, result, COMBINED_NAME)]   # the largest first, so it doesn't start last
+    reports += [(course.label if course else "Curs desconegut", shard, shard_filename(course))
+                for course, shard in shard_by_course(result)]
+    tasks = [(list(report_blocks(shard, school_year, today, label)), os.path.join(out_dir, name))
+             for label, shard, name in reports]
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(tasks)))
+
+    start = time.perf_counter()
+    stats = md_to_pdf.pool_map(_render_report, [(blocks, dest, profile) for blocks, dest in tasks], jobs)
+
+    files = []
+    for (label, shard, name), st in zip(reports, stats):
+        entry = {"file": name, "course": label, "rows": row_counts(shard)}   # course None: every course
+        entry["total_rows"] = sum(entry["rows"].values())
+        if "error" in st:
+            entry["error"] = st["error"]
+        else:
+            entry.update(pages=st["pages"], bytes=st["bytes"], sha256=file_digest(st["dest"]),
+                         seconds=round(st["seconds"], 3))
+        files.append(entry)
+    manifest = {
+        "generated": today.isoformat(),
+        "school_year": school_year,
+        "profile": profile.name,
+        "deterministic": profile.deterministic,
+        "jobs": jobs,
+        "seconds": round(time.perf_counter() - start, 3),
+        "files": files,
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=2)
+        fh.write("\n")
+    return manifest
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("clickedu", help="Clickedu students dump (.csv or .json)")
+    parser.add_argument("--examples", default=default_examples,
+                        help="directory with the traspàs and NESE workbooks")
+    parser.add_argument("-o", "--output", help="PDF report path")
+    parser.add_argument("--markdown", help="also write the report as markdown")
+    parser.add_argument("--html", help="also write the report as a web page")
+    parser.add_argument("--xlsx", help="also write the report as a workbook, a sheet per section")
+    parser.add_argument("--shard-dir", help="write the combined report and one per course here, with a manifest")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes for --shard-dir (default: one per core)")
+    parser.add_argument("--output-profile", choices=sorted(md_to_pdf.PROFILES),
+                        default=md_to_pdf.DEFAULT_PROFILE.name, help="see md_to_pdf.PROFILES (default: %(default)s)")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="fixed timestamps and IDs, so identical inputs give identical PDFs")
+    args = parser.parse_args(argv)
+    profile = md_to_pdf.PROFILES[args.output_profile]
+    if args.deterministic:
+        profile = profile._replace(deterministic=True)
+
+    if profile.deterministic and md_to_pdf.build_date(deterministic=True) is None:
+        parser.error(f"the {profile.name} profile is deterministic: set SOURCE_DATE_EPOCH to the report's date")
+    workbooks = expand_workbooks([args.examples])
+    students = load_clickedu(args.clickedu)
+    result = reconcile(students, iter_records(workbooks))
+
+    print(f"Clickedu students: {len(students)}")
+    print(f"1. Sense traspàs: {len(result.missing_transfer)} (+{result.excluded_i3} d'Infantil 3 exclosos)")
+    print(f"2. No trobats a Clickedu: {result.unknown_records} registres, {len(result.unknown)} persones")
+    print(f"3. NESE sense graella_nese: {len(result.nese_unflagged)}")
+    print(f"   Seccions 1 i 3: {len(result.overlap_1_3)}")
+
+    if args.markdown or args.output or args.html or args.xlsx:   # one document model for every format
+        doc = report_ir.from_blocks(report_blocks(result))
+    if args.markdown:
+        with open(args.markdown, "w", encoding="utf-8") as fh:
+            fh.writelines(md_to_pdf.iter_markdown(doc.blocks()))
+        print(f"Markdown written: {os.path.abspath(args.markdown)}")
+    if args.output:
+        stats = md_to_pdf.render_blocks(doc.blocks(), args.output, profile=profile)
+        print(f"PDF generated: {os.path.abspath(args.output)} ({stats['pages']} pages)")
+    if args.html:
+        from report_html import write_html
+        write_html(doc, args.html)
+        print(f"HTML written: {os.path.abspath(args.html)}")
+    if args.xlsx:
+        from report_xlsx import write_xlsx
+        write_xlsx(doc, args.xlsx)
+        print(f"XLSX written: {os.path.abspath(args.xlsx)}")
+    if args.shard_dir:
+        manifest = render_shards(result, args.shard_dir, args.jobs, profile=profile)
+        failed = [f for f in manifest["files"] if "error" in f]
+        for entry in failed:
+            print(f"FAILED {entry['file']}: {entry['error']}")
+        print(f"{len(manifest['files'])} reports ({len(manifest['files']) - 1} courses, {len(failed)} failed) "
+              f"in {manifest['seconds']:.2f}s with {manifest['jobs']} workers: "
+              f"{os.path.abspath(os.path.join(args.shard_dir, MANIFEST_NAME))}")
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
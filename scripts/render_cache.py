@@ -0,0 +1,159 @@
+"""Content-addressed on-disk cache for md_to_pdf renders.
+
+Two kinds of entries live under the cache root:
+
+* ``docs/<ab>/<key>.pdf``      finished documents, keyed on source + theme + renderer
+* ``sections/<ab>/<key>.pkl``  pickled flowables of a single section
+
+Writes are atomic (temp file + rename) so batch workers can share one cache
+directory. The total size is bounded: the cache counts the bytes it writes
+(after one walk of the tree to learn where it starts) and only when the
+count goes over ``max_bytes`` does ``evict()`` remove the least recently
+used entries until the cache fits again. Each process keeps its own count,
+so with shared workers the cache can overshoot until one of them evicts,
+which re-reads the real total.
+"""
+
+from itertools import chain
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+KINDS = ("docs", "sections")   # the only directories the cache sizes, evicts and clears
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "turonia", "md_to_pdf")
+
+
+def make_key(*parts):
+    """sha256 over the parts (str or bytes), separated so that ("ab", "c") != ("a", "bc")."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class RenderCache:
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.size = None   # bytes under root, as far as this process knows
+
+    def _path(self, kind, key, ext):
+        return os.path.join(self.root, kind, key[:2], key + ext)
+
+    def _write(self, path, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                write(fh)
+            written = os.path.getsize(tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        if self.size is None:
+            self.size = self._walk()[1]
+        else:
+            self.size += written   # an overwritten entry counts twice: evict() corrects it
+        if self.size > self.max_bytes:
+            self.evict()
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    # ── Whole documents ────────────────────────────────────────────────
+    def get_document(self, key, dest):
+        """Copy a cached PDF to ``dest`` (path or binary file); False on a miss."""
+        path = self._path("docs", key, ".pdf")
+        if not self._touch(path):
+            return False
+        try:
+            if isinstance(dest, (str, os.PathLike)):
+                shutil.copyfile(path, dest)
+            else:
+                with open(path, "rb") as fh:
+                    shutil.copyfileobj(fh, dest)
+        except FileNotFoundError:   # evicted by another worker in between
+            return False
+        return True
+
+    def put_document(self, key, pdf_path):
+        def write(fh):
+            with open(pdf_path, "rb") as src:
+                shutil.copyfileobj(src, fh)
+
+        self._write(self._path("docs", key, ".pdf"), write)
+
+    def put_document_bytes(self, key, data):
+        self._write(self._path("docs", key, ".pdf"), lambda fh: fh.write(data))
+
+    # ── Pickled objects (section flowables) ────────────────────────────
+    def get_object(self, key):
+        path = self._path("sections", key, ".pkl")
+        if not self._touch(path):
+            return None
+        try:
+            with open(path, "rb") as fh:
+                return pickle.load(fh)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def put_object(self, key, obj):
+        self._write(self._path("sections", key, ".pkl"),
+                    lambda fh: pickle.dump(obj, fh, protocol=pickle.HIGHEST_PROTOCOL))
+
+    # ── Eviction ───────────────────────────────────────────────────────
+    def _walk(self):
+        """(mtime, size, path) of every entry, and their total size."""
+        entries, total = [], 0
+        for dirpath, _, filenames in chain.from_iterable(os.walk(os.path.join(self.root, kind)) for kind in KINDS):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, path))
+                total += info.st_size
+        return entries, total
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        entries, total = self._walk()
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.size = total
+        return total
+
+    def clear(self):
+        for kind in KINDS:
+            shutil.rmtree(os.path.join(self.root, kind), ignore_errors=True)
@@ -0,0 +1,183 @@
+"""Per-phase profiling of md_to_pdf renders.
+
+A ``Profiler`` is passed to ``render``/``render_blocks`` (or enabled with
+``md_to_pdf.py --profile``). It records:
+
+* ``story.<block kind>``  tokenizing and building the flowables of each block
+  kind (Paragraph markup, table cells and TableStyle setup, note boxes, ...)
+* ``layout``              platypus layout and drawing inside ``doc.build``
+* ``page_callback``       the add_page_number header/footer
+* ``write``               serializing the PDF and writing it out
+
+plus flowable counts by type, pages, table rows and the layout time of every
+page. ``report()`` returns all of it as a dict (JSON-ready) and
+``chrome_trace()`` as a Chrome trace (chrome://tracing, Perfetto).
+
+Hooks are plain callables registered with ``add_hook``; each one receives
+an event dict (name, start, seconds, args) as soon as a phase or page ends.
+
+When no profiler is given the renderer takes its usual path: nothing in
+this module is imported or called.
+"""
+
+from collections import Counter, defaultdict
+import json
+import os
+import threading
+import time
+
+
+class Profiler:
+    def __init__(self, hooks=()):
+        self.hooks = list(hooks)
+        self.origin = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.flowables = Counter()
+        self.table_rows = 0
+        self.pages = 0
+        self.page_seconds = []
+        self.events = []
+        self.source = None
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def _emit(self, name, start, seconds, **args):
+        event = {"name": name, "start": start - self.origin, "seconds": seconds, "args": args}
+        self.events.append(event)
+        for hook in self.hooks:
+            hook(event)
+
+    # ── Story ──────────────────────────────────────────────────────────
+    def collect_story(self, blocks, make_flowables):
+        """list(make_flowables(blocks)), timing each flowable against the block kind it came from."""
+        kind = ["start"]
+
+        def tap(blocks):
+            for block in blocks:
+                kind[0] = block[0]
+                if block[0] == "table":
+                    self.table_rows += len(block[2])
+                yield block
+
+        per_kind = defaultdict(float)
+        story = []
+        start = last = time.perf_counter()
+        for flowable in make_flowables(tap(blocks)):
+            now = time.perf_counter()
+            per_kind[kind[0]] += now - last
+            last = now
+            self.flowables[type(flowable).__name__] += 1
+            story.append(flowable)
+        per_kind[kind[0]] += time.perf_counter() - last   # trailing blocks that made no flowable
+
+        for name, seconds in per_kind.items():
+            self.phases[f"story.{name}"] += seconds
+        self.phases["story"] += last - start
+        self._emit("story", start, last - start, flowables=len(story))
+        return story
+
+    # ── Document build ─────────────────────────────────────────────────
+    def instrument(self, doc, on_page):
+        """Time the page callback, each page and the final save of ``doc``; returns the wrapped callback."""
+        page_start = [None]
+        callback = [0.0]
+        timed_canvas = [None]
+
+        def time_save(canvas_obj):
+            """Wrap the save of each new canvas, before the page callback adds its own hooks to it."""
+            save = canvas_obj.save
+
+            def timed_save():
+                start = time.perf_counter()
+                save()
+                self.phases["write"] += time.perf_counter() - start
+                self._emit("write", start, time.perf_counter() - start)
+
+            canvas_obj.save = timed_save
+            timed_canvas[0] = canvas_obj
+
+        def timed_on_page(canvas_obj, doc_obj):
+            if canvas_obj is not timed_canvas[0]:
+                time_save(canvas_obj)
+            start = time.perf_counter()
+            on_page(canvas_obj, doc_obj)
+            seconds = time.perf_counter() - start
+            self.phases["page_callback"] += seconds
+            callback[0] += seconds
+            if page_start[0] is None:
+                page_start[0] = start
+
+        def after_page():
+            now = time.perf_counter()
+            seconds = now - page_start[0] - callback[0]
+            self.pages += 1
+            self.page_seconds.append(seconds)
+            self._emit(f"page {self.pages}", page_start[0], now - page_start[0], layout=seconds)
+            page_start[0], callback[0] = now, 0.0
+
+        doc.afterPage = after_page
+        return timed_on_page
+
+    def build(self, doc, story, on_page):
+        """doc.build(story) with the layout time separated from callbacks and writing."""
+        timed_on_page = self.instrument(doc, on_page)
+        before = self.phases["page_callback"] + self.phases["write"]
+        start = time.perf_counter()
+        doc.build(story, onFirstPage=timed_on_page, onLaterPages=timed_on_page)
+        seconds = time.perf_counter() - start
+        self.phases["build"] += seconds
+        self.phases["layout"] += seconds - (self.phases["page_callback"] + self.phases["write"] - before)
+        self._emit("build", start, seconds, pages=doc.page)
+
+    # ── Output ─────────────────────────────────────────────────────────
+    def report(self):
+        pages = self.page_seconds
+        return {
+            "source": self.source,
+            "phases": {name: round(seconds, 6) for name, seconds in sorted(self.phases.items())},
+            "flowables": dict(self.flowables.most_common()),
+            "pages": self.pages,
+            "table_rows": self.table_rows,
+            "page_layout": {
+                "mean": round(sum(pages) / len(pages), 6) if pages else 0,
+                "max": round(max(pages), 6) if pages else 0,
+                "slowest_page": pages.index(max(pages)) + 1 if pages else None,
+                "seconds": [round(s, 6) for s in pages],
+            },
+        }
+
+    def chrome_trace(self):
+        pid, tid = os.getpid(), threading.get_ident()
+        return {"traceEvents": [
+            {"name": e["name"], "ph": "X", "pid": pid, "tid": tid,
+             "ts": round(e["start"] * 1e6), "dur": round(e["seconds"] * 1e6), "args": e["args"]}
+            for e in self.events
+        ]}
+
+    def write_report(self, path):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.report(), fh, indent=2)
+
+    def write_trace(self, path):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.chrome_trace(), fh)
+
+    def summary(self):
+        """Short human-readable table of the phases."""
+        total = self.phases["story"] + self.phases["build"]
+        lines = [f"{'Phase':<22} {'Seconds':>8} {'Share':>6}"]
+        for name in ("story", "layout", "page_callback", "write"):
+            seconds = self.phases[name]
+            lines.append(f"{name:<22} {seconds:>8.3f} {seconds / total if total else 0:>6.1%}")
+            if name == "story":
+                for sub, sub_seconds in sorted(self.phases.items(), key=lambda kv: -kv[1]):
+                    if sub.startswith("story."):
+                        lines.append(f"  {sub[6:]:<20} {sub_seconds:>8.3f}")
+        flowables = ", ".join(f"{n} {name}" for name, n in self.flowables.most_common())
+        lines.append(f"{self.pages} pages, {self.table_rows} table rows, flowables: {flowables}")
+        if self.page_seconds:
+            slowest = max(self.page_seconds)
+            lines.append(f"page layout: mean {sum(self.page_seconds) / len(self.page_seconds) * 1000:.1f} ms, "
+                         f"slowest page {self.page_seconds.index(slowest) + 1} ({slowest * 1000:.1f} ms)")
+        return "\n".join(lines)
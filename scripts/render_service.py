@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""Local HTTP render service: md_to_pdf kept warm behind a bounded worker pool.
+
+The Next.js routes can POST a document here instead of cold-starting Python
+(or building the PDF with jsPDF) for every export. Each worker process
+loads reportlab, the styles and the fonts once, in its initializer.
+
+Endpoints:
+
+    POST /render    markdown (text/markdown) or a JSON document (application/json)
+                    -> application/pdf
+    GET  /health    {"status": "ok", "workers": ..., "in_flight": ..., ...}
+    GET  /metrics   Prometheus text format
+
+A JSON document is one of::
+
+    {"markdown": "# Title\\n..."}
+    {"title": "...", "subtitle": ["**Data**: ..."], "sections": [
+        {"heading": "...", "paragraphs": ["..."], "note": "...", "action": "...",
+         "tables": [{"heading": "...", "headers": [...], "rows": [[...], ...]}]}]}
+    {"blocks": [["heading", 1, "..."], ["table", [...], [[...]]], ...]}
+
+At most ``jobs`` renders run at once and ``queue`` more wait; beyond that the
+service answers 503 with Retry-After instead of piling up requests. A
+worker that dies or a render that times out gets the pool replaced; /health
+answers 503 "degraded" when it finds the pool broken. Every PDF response
+carries X-Render-Queue-Ms, X-Render-Ms, X-Render-Pages and a
+Server-Timing header.
+
+Usage:
+    python render_service.py --port 8765 -j 4 --queue 16
+    curl --data-binary @../docs/PRD.md -H "Content-Type: text/markdown" \\
+        localhost:8765/render -o PRD.pdf
+"""
+
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout, wait
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+import md_to_pdf
+from render_cache import RenderCache
+
+MAX_BODY = 8 * 1024 * 1024
+CHUNK = 64 * 1024
+# The fields after the kind of each block (see md_to_pdf.iter_blocks); "lines" is a list of strings
+BLOCK_FIELDS = {
+    "heading": (int, str), "paragraph": ("lines",), "quote": ("lines",), "table": ("lines", "rows"),
+    "list_item": (int, str, str), "code": (str,), "hr": (),
+}
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# DOCUMENTS
+# ═══════════════════════════════════════════════════════════════════════
+class BadDocument(ValueError):
+    pass
+
+
+def _is_lines(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _fits(value, field):
+    if field == "lines":
+        return _is_lines(value)
+    if field == "rows":
+        return isinstance(value, list) and all(_is_lines(row) for row in value)
+    return isinstance(value, field) and not isinstance(value, bool)
+
+
+def checked_block(block):
+    """A JSON block as an md_to_pdf block tuple; raises BadDocument unless it has its kind's fields."""
+    if not isinstance(block, list) or not block or block[0] not in BLOCK_FIELDS:
+        raise BadDocument(f"a block is a list starting with one of {sorted(BLOCK_FIELDS)}")
+    fields = BLOCK_FIELDS[block[0]]
+    if len(block) != len(fields) + 1 or not all(_fits(v, f) for v, f in zip(block[1:], fields)):
+        names = ", ".join(f if isinstance(f, str) else f.__name__ for f in fields)
+        raise BadDocument(f'a "{block[0]}" block is [kind{", " if names else ""}{names}]')
+    return tuple(block)
+
+
+def section_blocks(doc):
+    """md_to_pdf blocks for a {"title", "subtitle", "sections"} document."""
+    if doc.get("title"):
+        yield ("heading", 1, str(doc["title"]))
+    if doc.get("subtitle"):
+        yield ("paragraph", [str(line) for line in doc["subtitle"]])
+        yield ("hr",)
+    for section in doc.get("sections", []):
+        if section.get("heading"):
+            yield ("heading", int(section.get("level", 2)), str(section["heading"]))
+        for paragraph in section.get("paragraphs", []):
+            yield ("paragraph", [str(paragraph)])
+        if section.get("note"):
+            yield ("quote", [str(section["note"])])
+        if section.get("action"):
+            yield ("paragraph", [f"**Acció necessària**: {section['action']}"])
+        for item in section.get("items", []):
+            yield ("list_item", 0, "-", str(item))
+        for table in section.get("tables", []):
+            if table.get("heading"):
+                yield ("heading", 3, str(table["heading"]))
+            yield ("table", [str(h) for h in table["headers"]],
+                   [[str(cell) for cell in row] for row in table.get("rows", [])])
+
+
+def document_blocks(content_type, body):
+    """Blocks for a request body; raises BadDocument for anything unusable."""
+    if content_type.startswith("application/json"):
+        try:
+            doc = json.loads(body)
+        except ValueError as exc:
+            raise BadDocument(f"invalid JSON: {exc}") from None
+        if not isinstance(doc, dict):
+            raise BadDocument("the document must be a JSON object")
+        if "markdown" in doc:
+            return list(md_to_pdf.iter_blocks(io.StringIO(str(doc["markdown"]))))
+        if "blocks" in doc:
+            if not isinstance(doc["blocks"], list):
+                raise BadDocument('"blocks" must be a list')
+            return [checked_block(block) for block in doc["blocks"]]
+        if "sections" in doc or "title" in doc:
+            sections = doc.get("sections", [])
+            if not isinstance(sections, list) or not all(isinstance(s, dict) for s in sections):
+                raise BadDocument('"sections" must be a list of objects')
+            try:
+                return list(section_blocks(doc))
+            except (KeyError, TypeError, ValueError, AttributeError, IndexError) as exc:
+                raise BadDocument(f"invalid section document: {exc!r}") from None
+        raise BadDocument('expected "markdown", "blocks" or "sections"')
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        raise BadDocument("markdown must be UTF-8") from None
+    return list(md_to_pdf.iter_blocks(io.StringIO(text)))
+
+
+def _render_request(blocks, theme, cache):
+    """Runs in a worker: returns (pdf bytes, stats)."""
+    out = io.BytesIO()
+    stats = md_to_pdf.render_blocks(blocks, out, theme, cache)
+    return out.getvalue(), stats
+
+
+def _retire_pool(pool, futures, timeout):
+    """Let a replaced pool finish its other renders, then stop its workers: a stuck one never ends."""
+    wait(futures, timeout=timeout)
+    terminate = getattr(pool, "terminate_workers", None)   # Python 3.14+
+    if terminate is not None:
+        terminate()
+    else:
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# SERVICE
+# ═══════════════════════════════════════════════════════════════════════
+class RenderService:
+    """The worker pool, the admission limit and the counters behind /metrics.
+
+    The pool is replaced when it breaks (a worker died) and when a render
+    times out while running, since that worker would stay busy for good.
+    The old pool finishes its other renders in the background before its
+    workers are stopped.
+    """
+
+    def __init__(self, jobs, queue, theme=md_to_pdf.DEFAULT_THEME, cache=None, timeout=120):
+        self.jobs, self.queue, self.theme, self.cache, self.timeout = jobs, queue, theme, cache, timeout
+        self.pool = self._new_pool()
+        self.pool_futures = set()    # renders submitted to the current pool and not done
+        self.restarts = {}           # reason -> pool replacements
+        self.slots = threading.BoundedSemaphore(jobs + queue)
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.in_flight = 0
+        self.responses = {}          # (path, status) -> count
+        self.render_seconds = 0.0
+        self.queue_seconds = 0.0
+        self.rendered = 0
+        self.pages = 0
+        self.bytes = 0
+
+    def _new_pool(self):
+        pool = ProcessPoolExecutor(self.jobs, initializer=md_to_pdf._init_worker, initargs=(self.theme,))
+        # Start every worker now so the first requests don't pay for it
+        for _ in range(self.jobs):
+            pool.submit(len, ())
+        return pool
+
+    def _replace_pool(self, old, reason):
+        with self.lock:
+            if self.pool is not old:   # another request replaced it already
+                return
+            self.pool, futures = self._new_pool(), self.pool_futures
+            self.pool_futures = set()
+            self.restarts[reason] = self.restarts.get(reason, 0) + 1
+        threading.Thread(target=_retire_pool, args=(old, futures, self.timeout), daemon=True).start()
+
+    def count(self, path, status):
+        with self.lock:
+            self.responses[path, status] = self.responses.get((path, status), 0) + 1
+
+    def _finished(self, future):
+        with self.lock:
+            self.in_flight -= 1
+            self.pool_futures.discard(future)
+        self.slots.release()
+
+    def render(self, blocks):
+        """(pdf, stats, queue seconds) or None when the service is saturated.
+
+        The admission slot is held until the render is really over, not until
+        the request gives up on it: a render that timed out still occupies a
+        worker, and releasing its slot early would let requests pile up in
+        the pool's unbounded queue.
+        """
+        if not self.slots.acquire(blocking=False):
+            return None
+        submitted = time.perf_counter()
+        with self.lock:
+            self.in_flight += 1
+        for attempt in range(2):
+            with self.lock:
+                pool = self.pool
+                try:
+                    future = pool.submit(_render_request, blocks, self.theme, self.cache)
+                    self.pool_futures.add(future)
+                    failed = None
+                except BaseException as exc:
+                    failed = exc
+            if not isinstance(failed, BrokenProcessPool):
+                break
+            # the document never ran: it is safe to try once more on a fresh pool
+            self._replace_pool(pool, "crash")
+        if failed is not None:
+            self._finished(None)
+            raise failed
+        future.add_done_callback(self._finished)
+        try:
+            pdf, stats = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            if not future.cancel():   # running: its worker is lost to us
+                self._replace_pool(pool, "timeout")
+            raise
+        except BrokenProcessPool:
+            self._replace_pool(pool, "crash")
+            raise
+        total = time.perf_counter() - submitted
+        queued = max(total - stats["seconds"], 0.0)
+        with self.lock:
+            self.rendered += 1
+            self.render_seconds += stats["seconds"]
+            self.queue_seconds += queued
+            self.pages += stats["pages"]
+            self.bytes += len(pdf)
+        return pdf, stats, queued
+
+    def health(self):
+        """"ok", or "degraded" when the pool turned out to be broken (it is being replaced)."""
+        pool = self.pool
+        try:
+            pool.submit(len, ())   # fails once the pool noticed a dead worker, even an idle one
+            status = "ok"
+        except BrokenProcessPool:
+            self._replace_pool(pool, "crash")
+            status = "degraded"
+        with self.lock:
+            return {"status": status, "workers": self.jobs, "queue": self.queue,
+                    "in_flight": self.in_flight, "pool_restarts": dict(self.restarts),
+                    "uptime_s": round(time.time() - self.started, 1)}
+
+    def metrics(self):
+        with self.lock:
+            lines = [
+                "# TYPE render_requests_total counter",
+                *(f'render_requests_total{{path="{p}",status="{s}"}} {n}'
+                  for (p, s), n in sorted(self.responses.items())),
+                "# TYPE render_in_flight gauge",
+                f"render_in_flight {self.in_flight}",
+                "# TYPE render_pool_restarts_total counter",
+                *(f'render_pool_restarts_total{{reason="{r}"}} {n}' for r, n in sorted(self.restarts.items())),
+                "# TYPE render_capacity gauge",
+                f"render_capacity {self.jobs + self.queue}",
+                "# TYPE render_seconds_total counter",
+                f"render_seconds_total {self.render_seconds:.6f}",
+                "# TYPE render_queue_seconds_total counter",
+                f"render_queue_seconds_total {self.queue_seconds:.6f}",
+                "# TYPE render_documents_total counter",
+                f"render_documents_total {self.rendered}",
+                "# TYPE render_pages_total counter",
+                f"render_pages_total {self.pages}",
+                "# TYPE render_bytes_total counter",
+                f"render_bytes_total {self.bytes}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "TuroniaRender/1"
+    protocol_version = "HTTP/1.1"
+    service = None   # set by serve()
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _send(self, status, body, content_type, headers=None):
+        self.service.count(self.path if self.path in ("/render", "/health", "/metrics") else "other", status)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        for i in range(0, len(body), CHUNK):
+            self.wfile.write(body[i:i + CHUNK])
+
+    def _json(self, status, obj, headers=None):
+        self._send(status, json.dumps(obj).encode("utf-8"), "application/json", headers)
+
+    def do_GET(self):
+        if self.path == "/health":
+            health = self.service.health()
+            self._json(200 if health["status"] == "ok" else 503, health)
+        elif self.path == "/metrics":
+            self._send(200, self.service.metrics().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/render":
+            self._json(404, {"error": "not found"})
+            return
+        length = self.headers.get("Content-Length") or "0"
+        if not (length.isascii() and length.isdigit()):   # a negative length would read until the client hangs up
+            self._json(400, {"error": "invalid Content-Length"}, {"Connection": "close"})
+            self.close_connection = True
+            return
+        length = int(length)
+        if length > MAX_BODY:
+            self._json(413, {"error": f"document larger than {MAX_BODY} bytes"},
+                       {"Connection": "close"})
+            self.close_connection = True
+            return
+        body = self.rfile.read(length)
+        try:
+            blocks = document_blocks(self.headers.get("Content-Type", "text/markdown"), body)
+        except BadDocument as exc:
+            self._json(400, {"error": str(exc)})
+            return
+
+        try:
+            result = self.service.render(blocks)
+        except FutureTimeout:
+            self._json(504, {"error": "render timed out"})
+            return
+        except BrokenProcessPool:
+            self._json(503, {"error": "a render worker died; restarting the pool"}, {"Retry-After": "1"})
+            return
+        except Exception as exc:  # a broken document must not take the service down
+            self._json(500, {"error": f"{type(exc).__name__}: {exc}"})
+            return
+        if result is None:
+            self._json(503, {"error": "render queue full"}, {"Retry-After": "1"})
+            return
+
+        pdf, stats, queued = result
+        self._send(200, pdf, "application/pdf", {
+            "X-Render-Queue-Ms": f"{queued * 1000:.1f}",
+            "X-Render-Ms": f"{stats['seconds'] * 1000:.1f}",
+            "X-Render-Pages": str(stats["pages"]),
+            "Server-Timing": f"queue;dur={queued * 1000:.1f}, render;dur={stats['seconds'] * 1000:.1f}",
+        })
+
+
+def serve(host, port, jobs, queue, theme=md_to_pdf.DEFAULT_THEME, cache=None, verbose=False):
+    service = RenderService(jobs, queue, theme, cache)
+    handler = type("BoundHandler", (Handler,), {"service": service})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    httpd.verbose = verbose
+    print(f"Rendering on http://{host}:{httpd.server_port} ({jobs} workers, queue {queue})", flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.close()
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="bind address (default: localhost only)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="render worker processes")
+    parser.add_argument("--queue", type=int, default=16, help="requests allowed to wait for a worker")
+    parser.add_argument("--font", nargs="+", metavar="TTF", help="TrueType family (see md_to_pdf.py --font)")
+    parser.add_argument("--no-cache", action="store_true", help="don't reuse cached section flowables")
+    parser.add_argument("--cache-dir", help="cache location (default: ~/.cache/turonia/md_to_pdf)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    theme = md_to_pdf.DEFAULT_THEME
+    if args.font:
+        theme = theme._replace(fonts=tuple(os.path.abspath(f) for f in args.font))
+    cache = None if args.no_cache else RenderCache(args.cache_dir)
+    serve(args.host, args.port, max(1, args.jobs), max(0, args.queue), theme, cache, args.verbose)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
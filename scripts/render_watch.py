@@ -0,0 +1,163 @@
+"""Watch mode for md_to_pdf: re-render documents every time they are saved.
+
+``watch(sources, outputs)`` keeps one process resident, with reportlab, the
+styles and the fonts already loaded, and re-renders a document each time
+its file changes. The sections an edit did not touch come from the render
+cache as ready flowables, so a save only pays for the edited sections and
+the page layout: about 0.1 s for the inconsistencies report.
+
+Each PDF is rendered in memory, written to a temp file next to the target
+and renamed over it, so a viewer that reloads on change never opens a
+half-written file.
+
+Changes are picked up from filesystem events with watchdog when it is
+installed (``pip install watchdog``); without it the files are polled.
+"""
+
+import io
+import os
+import queue
+import tempfile
+import threading
+import time
+
+import md_to_pdf
+from md_to_pdf import DEFAULT_PROFILE, DEFAULT_THEME
+from render_cache import file_digest
+
+POLL_INTERVAL = 0.1
+SETTLE = 0.05   # editors save in several steps (write, rename, chmod): wait for the last one
+
+
+def write_atomic(path, data):
+    """Replace ``path`` with ``data`` in a single rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".", suffix=".pdf.tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def render_atomic(source, dest, theme=DEFAULT_THEME, cache=None, toc=False, profile=DEFAULT_PROFILE):
+    """md_to_pdf.render into memory, then write_atomic to ``dest``; returns the stats."""
+    out = io.BytesIO()
+    stats = md_to_pdf.render(source, out, theme, cache, toc=toc, profile=profile)
+    write_atomic(dest, out.getvalue())
+    stats["dest"] = os.fspath(dest)
+    return stats
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# CHANGES
+# ═══════════════════════════════════════════════════════════════════════
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _poll(paths, changed, stopped):
+    stamps = {path: _stamp(path) for path in paths}
+    while not stopped.wait(POLL_INTERVAL):
+        for path in paths:
+            stamp = _stamp(path)
+            if stamp != stamps[path]:
+                stamps[path] = stamp
+                changed.put(path)
+
+
+def start_watching(paths, changed):
+    """Put every changed path (absolute) on the ``changed`` queue; returns a function that stops."""
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        stopped = threading.Event()
+        threading.Thread(target=_poll, args=(paths, changed, stopped), daemon=True).start()
+        return stopped.set
+
+    watched = set(paths)
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            # editors that save through a temp file show up as a move onto the source
+            for path in (event.src_path, getattr(event, "dest_path", "")):
+                path = os.path.abspath(os.fsdecode(path)) if path else ""
+                if path in watched:
+                    changed.put(path)
+
+    observer = Observer()
+    for directory in sorted({os.path.dirname(path) for path in paths}):
+        observer.schedule(Handler(), directory, recursive=False)
+    observer.start()
+
+    def stop():
+        observer.stop()
+        observer.join()
+    return stop
+
+
+def settled(changed):
+    """The paths changed in the next burst of events, once SETTLE has passed without another."""
+    paths = {changed.get()}
+    while True:
+        try:
+            paths.add(changed.get(timeout=SETTLE))
+        except queue.Empty:
+            return paths
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# WATCH
+# ═══════════════════════════════════════════════════════════════════════
+def watch(sources, outputs, theme=DEFAULT_THEME, cache=None, toc=False, profile=DEFAULT_PROFILE, log=print):
+    """Render every source to its output now and again whenever it changes, until interrupted."""
+    targets = {os.path.abspath(source): dest for source, dest in zip(sources, outputs)}
+    digests = {}
+    md_to_pdf.get_styles(theme)
+
+    def update(path, initial=False):
+        name = os.path.basename(path)
+        try:
+            digest = file_digest(path)
+            saved = os.stat(path).st_mtime
+        except FileNotFoundError:   # between the unlink and the rename of a save
+            return
+        if digests.get(path) == digest:
+            return
+        digests[path] = digest
+        try:
+            stats = render_atomic(path, targets[path], theme, cache, toc, profile)
+        except Exception as exc:   # a half-typed table must not end the session
+            log(f"{name}: FAILED {type(exc).__name__}: {exc}")
+            return
+        detail = "unchanged, from cache" if stats["cache"] == "hit" else f"{stats['pages']} pages"
+        if stats["sections_reused"]:
+            detail += f", {stats['sections_reused']}/{stats['sections']} sections reused"
+        if not initial:
+            detail += f", {max(time.time() - saved, 0.0):.2f}s after save"
+        log(f"{name} -> {os.path.basename(stats['dest'])} ({detail}, render {stats['seconds']:.2f}s)")
+
+    changed = queue.Queue()
+    stop = start_watching(list(targets), changed)
+    try:
+        for path in targets:
+            update(path, initial=True)
+        log(f"Watching {len(targets)} document(s); Ctrl+C to stop")
+        while True:
+            for path in sorted(settled(changed)):
+                update(path)
+    finally:
+        stop()
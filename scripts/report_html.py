@@ -0,0 +1,112 @@
+"""HTML writer for report_ir documents: one self-contained page.
+
+The page mirrors the PDF: the same theme colours, the title with the school
+line, note boxes, striped tables with a blue header. Number columns (see
+report_ir.column_types) are right-aligned. No scripts, fonts or images: the
+styles are inline, so the file can be mailed or opened offline.
+"""
+
+from xml.sax.saxutils import escape
+
+from md_to_pdf import ACTION_PREFIXES, DEFAULT_THEME, RE_ITALIC, SCHOOL_LINE, convert_inline
+
+CSS = """\
+body {{ font-family: Helvetica, Arial, sans-serif; font-size: 10pt; line-height: 1.35;
+       color: {text_color}; max-width: 50em; margin: 2em auto; padding: 0 1em; }}
+h1.title {{ color: {primary}; font-size: 20pt; margin-bottom: 0.2em; }}
+h2 {{ color: {primary}; font-size: 14pt; margin-top: 1.4em; }}
+h3 {{ color: {secondary}; font-size: 11pt; }}
+p.subtitle {{ color: {muted}; margin: 0.1em 0; }}
+p.action {{ color: {accent}; }}
+p.footer {{ color: {muted}; font-size: 8pt; text-align: center; }}
+a {{ color: {secondary}; }}
+aside.note {{ background: {note_bg}; border-left: 3px solid {note_border}; color: {note_text};
+             padding: 0.5em 0.8em; margin: 0.6em 0; }}
+table {{ border-collapse: collapse; width: 100%; margin: 0.6em 0; font-size: 9pt; }}
+th {{ background: {table_header}; color: #fff; text-align: left; }}
+th, td {{ border: 0.5px solid {border_color}; padding: 3px 5px; vertical-align: top; }}
+tbody tr:nth-child(even) {{ background: {table_alt}; }}
+td.num {{ text-align: right; }}
+pre {{ background: {light_bg}; padding: 0.5em; font-size: 8pt; overflow-x: auto; }}
+hr {{ border: 0; border-top: 1px solid {border_color}; }}
+"""
+
+
+def inline_html(text):
+    """Like md_to_pdf.inline, but to HTML."""
+    return convert_inline(text, "<code>{}</code>", r"<b>\1</b>", r"<i>\1</i>", r'<a href="\2">\1</a>')
+
+
+def iter_html(doc, theme=DEFAULT_THEME):
+    """The page for a report_ir.Document, a fragment at a time."""
+    yield '<!DOCTYPE html>\n<html lang="ca">\n<head>\n<meta charset="utf-8">\n'
+    yield f"<title>{escape(doc.title)}</title>\n<style>\n{CSS.format(**theme._asdict())}</style>\n</head>\n<body>\n"
+
+    front_matter = seen_title = False
+    for block in doc.blocks():
+        kind = block[0]
+
+        if kind == "heading":
+            level, text = block[1], block[2]
+            if level == 1 and not seen_title:
+                seen_title = front_matter = True
+                yield f'<h1 class="title">{inline_html(text)}</h1>\n'
+                yield f'<p class="subtitle">{SCHOOL_LINE}</p>\n'
+                continue
+            front_matter = False
+            tag = "h2" if level <= 2 else "h3"
+            yield f"<{tag}>{inline_html(text)}</{tag}>\n"
+
+        elif kind == "paragraph":
+            if front_matter:
+                for line in block[1]:
+                    yield f'<p class="subtitle">{inline_html(line.strip())}</p>\n'
+                continue
+            text = " ".join(line.strip() for line in block[1])
+            if text.startswith(ACTION_PREFIXES):
+                yield f'<p class="action">{inline_html(text)}</p>\n'
+            elif RE_ITALIC.fullmatch(text):
+                yield f'<p class="footer">{inline_html(text)}</p>\n'
+            else:
+                yield f"<p>{inline_html(text)}</p>\n"
+
+        elif kind == "quote":
+            lines = [f"• {line[2:]}" if line.startswith(("- ", "* ")) else line for line in block[1]]
+            yield f'<aside class="note">{"<br>".join(inline_html(line) for line in lines)}</aside>\n'
+
+        elif kind == "table":
+            headers, rows, types = block[1], block[2], block[3]
+            n = len(headers)
+            cell_open = ['<td class="num">' if t == "int" else "<td>" for t in types]
+            yield "<table>\n<thead><tr>"
+            yield "".join(f"<th>{inline_html(h)}</th>" for h in headers)
+            yield "</tr></thead>\n<tbody>\n"
+            for row in rows:
+                row = (tuple(row) + ("",) * n)[:n]
+                yield "<tr>" + "".join(f"{cell_open[i]}{inline_html(cell)}</td>"
+                                       for i, cell in enumerate(row)) + "</tr>\n"
+            yield "</tbody>\n</table>\n"
+
+        elif kind == "list_item":
+            depth, marker, text = block[1], block[2], block[3]
+            bullet = marker if marker[0].isdigit() else "•"
+            yield f'<div style="margin-left: {1.2 * (depth + 1):.1f}em">{bullet} {inline_html(text)}</div>\n'
+
+        elif kind == "code":
+            yield f"<pre>{escape(block[1])}</pre>\n"
+
+        elif kind == "hr":
+            yield "<hr>\n"
+
+        front_matter = front_matter and kind == "paragraph"
+
+    yield "</body>\n</html>\n"
+
+
+def write_html(doc, dest, theme=DEFAULT_THEME):
+    """Write the page for ``doc`` to ``dest``; returns its size in bytes."""
+    data = "".join(iter_html(doc, theme)).encode("utf-8")
+    with open(dest, "wb") as fh:
+        fh.write(data)
+    return len(data)
+
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Parse-once document model shared by the PDF, HTML and XLSX writers.
+
+A ``Document`` is the title and date of a report plus its sections (see
+md_to_pdf.iter_sections), each a tuple of md_to_pdf blocks: headings,
+paragraphs, note boxes (quotes), list items, code and tables. Table blocks
+carry a fourth item, the type of each column ("int", "date" or "text"):
+the HTML right-aligns number columns and the XLSX stores real numbers and
+dates; the PDF keeps its tables as they were. Everything is plain tuples
+and strings: it pickles into the render cache and round-trips through JSON
+(to_json / from_json).
+
+``parse(path, cache)`` tokenizes a markdown file once and keeps the result
+in the render cache, keyed on the file's content; ``export`` then writes
+any of the three formats from the same Document:
+
+* PDF:  md_to_pdf.render_blocks (make_table, make_note_box, the styles)
+* HTML: report_html.write_html, one self-contained page
+* XLSX: report_xlsx.write_xlsx, a sheet per section with a column to annotate
+
+Usage:
+    python report_ir.py                                    # the inconsistencies report, all three
+    python report_ir.py ../docs/PRD.md --html PRD.html     # only the formats given
+    python report_ir.py report.md --json report.ir.json    # dump the model
+"""
+
+from itertools import chain
+from typing import NamedTuple
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import md_to_pdf
+from md_to_pdf import DEFAULT_PROFILE, DEFAULT_THEME
+from render_cache import RenderCache, file_digest, make_key
+
+IR_VERSION = "1"
+EMPTY_CELLS = ("", "—", "-")
+RE_INT = re.compile(r"-?\d{1,15}")
+RE_SHORT_DATE = re.compile(r"\d{2}/\d{2}/\d{4}")
+
+
+class Document(NamedTuple):
+    title: str
+    date: str       # dd/mm/yyyy, as the PDF header shows it
+    sections: tuple
+
+    def blocks(self):
+        return chain.from_iterable(self.sections)
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# BUILD
+# ═══════════════════════════════════════════════════════════════════════
+def column_types(headers, rows):
+    """The type of each column: "int" or "date" when every non-empty cell is one, else "text"."""
+    types = []
+    for i in range(len(headers)):
+        cells = [md_to_pdf.plain(row[i]) for row in rows if i < len(row)]
+        cells = [cell for cell in cells if cell not in EMPTY_CELLS]
+        if cells and all(RE_INT.fullmatch(cell) for cell in cells):
+            types.append("int")
+        elif cells and all(RE_SHORT_DATE.fullmatch(cell) for cell in cells):
+            types.append("date")
+        else:
+            types.append("text")
+    return tuple(types)
+
+
+def typed_block(block):
+    """Blocks as immutable tuples; tables get their column types."""
+    kind = block[0]
+    if kind == "table":
+        headers, rows = tuple(block[1]), tuple(tuple(row) for row in block[2])
+        return ("table", headers, rows, column_types(headers, rows))
+    if kind in ("paragraph", "quote"):
+        return (kind, tuple(block[1]))
+    return tuple(block)
+
+
+def from_blocks(blocks):
+    """Document for md_to_pdf blocks (parsed markdown or generated, e.g. reconcile.report_blocks).
+
+    Title and date are read the way md_to_pdf.iter_flowables reads them:
+    the first level-1 heading, and a "Data:" line right under it.
+    """
+    meta = md_to_pdf.new_meta()
+    sections, front_matter = [], False
+    for section in md_to_pdf.iter_sections(blocks):
+        typed = []
+        for block in section:
+            kind = block[0]
+            if kind == "heading" and block[1] == 1 and not meta["title"]:
+                meta["title"] = md_to_pdf.plain(block[2])
+                front_matter = True
+            elif kind == "paragraph" and front_matter:
+                for line in block[1]:
+                    label, _, value = md_to_pdf.plain(line).partition(":")
+                    if label.strip().lower() == "data" and value:
+                        meta["date"] = md_to_pdf.short_date(value.strip())
+            else:
+                front_matter = False
+            typed.append(typed_block(block))
+        sections.append(tuple(typed))
+    return Document(meta["title"], meta["date"], tuple(sections))
+
+
+def parse(path, cache=None):
+    """Document for a markdown file, from the cache when neither the file nor the parser changed."""
+    key = None
+    if cache is not None:
+        key = make_key("ir", IR_VERSION, md_to_pdf.renderer_fingerprint(), file_digest(__file__),
+                       file_digest(path))
+        doc = cache.get_object(key)
+        if doc is not None:
+            return doc
+    with open(path, encoding="utf-8") as fh:
+        doc = from_blocks(md_to_pdf.iter_blocks(fh))
+    if cache is not None:
+        cache.put_object(key, doc)
+    return doc
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# SERIALIZATION
+# ═══════════════════════════════════════════════════════════════════════
+def to_json(doc):
+    return json.dumps({"ir": IR_VERSION, "title": doc.title, "date": doc.date, "sections": doc.sections},
+                      ensure_ascii=False, separators=(",", ":"))
+
+
+def _block_from_json(block):
+    if block[0] == "table":   # keep the stored column types
+        return ("table", tuple(block[1]), tuple(map(tuple, block[2])), tuple(block[3]))
+    return typed_block(block)
+
+
+def from_json(text):
+    data = json.loads(text)
+    if data.get("ir") != IR_VERSION:
+        raise ValueError(f"document model version {data.get('ir')!r}, expected {IR_VERSION!r}")
+    sections = tuple(tuple(_block_from_json(block) for block in section) for section in data["sections"])
+    return Document(data["title"], data["date"], sections)
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# EXPORT
+# ═══════════════════════════════════════════════════════════════════════
+def export(doc, pdf=None, html=None, xlsx=None, theme=DEFAULT_THEME, cache=None, profile=DEFAULT_PROFILE):
+    """Write the formats given a path for; returns {format: seconds}."""
+    timings = {}
+    if pdf:
+        start = time.perf_counter()
+        md_to_pdf.render_blocks(doc.blocks(), pdf, theme, cache, profile=profile)
+        timings["pdf"] = time.perf_counter() - start
+    if html:
+        from report_html import write_html
+        start = time.perf_counter()
+        write_html(doc, html, theme)
+        timings["html"] = time.perf_counter() - start
+    if xlsx:
+        from report_xlsx import write_xlsx
+        start = time.perf_counter()
+        write_xlsx(doc, xlsx, theme)
+        timings["xlsx"] = time.perf_counter() - start
+    return timings
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", nargs="?", default=md_to_pdf.default_source, help="markdown file")
+    parser.add_argument("--pdf", help="PDF path")
+    parser.add_argument("--html", help="HTML path")
+    parser.add_argument("--xlsx", help="XLSX path")
+    parser.add_argument("--json", help="also write the document model as JSON")
+    parser.add_argument("--no-cache", action="store_true", help="parse and render everything from scratch")
+    parser.add_argument("--cache-dir", help="cache location (default: ~/.cache/turonia/md_to_pdf)")
+    parser.add_argument("--output-profile", choices=sorted(md_to_pdf.PROFILES), default=DEFAULT_PROFILE.name,
+                        help="see md_to_pdf.PROFILES (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if not (args.pdf or args.html or args.xlsx or args.json):   # all three, next to the source
+        base = os.path.splitext(args.source)[0]
+        args.pdf, args.html, args.xlsx = base + ".pdf", base + ".html", base + ".xlsx"
+
+    cache = None if args.no_cache else RenderCache(args.cache_dir)
+    start = time.perf_counter()
+    doc = parse(args.source, cache)
+    parsed = time.perf_counter() - start
+    tables = sum(block[0] == "table" for block in doc.blocks())
+    print(f"Parsed {os.path.basename(args.source)}: {len(doc.sections)} sections, {tables} tables "
+          f"({parsed * 1000:.1f} ms)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            fh.write(to_json(doc))
+        print(f"Model written: {os.path.abspath(args.json)}")
+
+    timings = export(doc, args.pdf, args.html, args.xlsx, cache=cache,
+                     profile=md_to_pdf.PROFILES[args.output_profile])
+    for fmt, seconds in timings.items():
+        path = getattr(args, fmt)
+        print(f"{fmt.upper():>4}: {os.path.abspath(path)} ({os.path.getsize(path) / 1024:.0f} KB, {seconds:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
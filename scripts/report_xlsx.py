@@ -0,0 +1,155 @@
+"""XLSX writer for report_ir documents: a sheet per section.
+
+The first sheet holds the title, the front matter and the summary; every
+other section gets its own sheet named after its heading. Tables keep
+their typed columns (see report_ir.column_types): counts are numbers and
+dates are dates, so they sort and filter in Excel. Each table gets an
+empty "Anotacions" column where the tutors can note what they fixed.
+
+Written with openpyxl in write-only mode, which streams the rows to the
+file instead of keeping the workbook in memory. Column widths have to be
+set before a sheet's first row, so they are measured in a pass of their
+own (column_widths).
+"""
+
+from datetime import datetime
+import re
+
+from md_to_pdf import ACTION_PREFIXES, DEFAULT_THEME, plain
+
+NOTES_HEADER = "Anotacions"
+FIRST_SHEET = "Informe"
+MAX_WIDTH = 60
+SHEET_NAME_LENGTH = 31   # Excel's limit
+RE_SHEET_INVALID = re.compile(r"[\[\]:*?/\\]")
+
+
+def sheet_title(heading, used):
+    """A valid, unique sheet name for a section heading."""
+    name = RE_SHEET_INVALID.sub("", plain(heading)).strip("' ")[:SHEET_NAME_LENGTH].strip() or "Secció"
+    title, n = name, 2
+    while title.lower() in used:
+        suffix = f" ({n})"
+        title, n = name[:SHEET_NAME_LENGTH - len(suffix)] + suffix, n + 1
+    used.add(title.lower())
+    return title
+
+
+def cell_value(text, kind):
+    """The cell for a table entry of a column of type ``kind``."""
+    text = plain(text)
+    if kind == "int" and text.lstrip("-").isdigit():
+        return int(text)
+    if kind == "date":
+        try:
+            return datetime.strptime(text, "%d/%m/%Y").date()
+        except ValueError:
+            pass
+    return text
+
+
+def column_widths(section):
+    """{column: width} for the tables of a section, from their longest entries."""
+    widths = {}
+
+    def fit(column, value):
+        widths[column] = max(widths.get(column, 8), min(len(str(value)) + 2, MAX_WIDTH))
+
+    for block in section:
+        if block[0] == "table":
+            headers, table_rows, types = block[1], block[2], block[3]
+            for i, h in enumerate((*headers, NOTES_HEADER)):
+                fit(i, plain(h))
+            for row in table_rows:
+                for i, text in enumerate(tuple(row)[:len(headers)]):
+                    fit(i, cell_value(text, types[i]))
+    return widths
+
+
+def write_xlsx(doc, dest, theme=DEFAULT_THEME):
+    """Write ``doc`` to ``dest`` as a workbook; returns the number of sheets."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    def color(hex_color):
+        return hex_color.lstrip("#").upper()
+
+    title_font = Font(bold=True, size=14, color=color(theme.primary))
+    heading_fonts = {2: Font(bold=True, size=12, color=color(theme.primary)),
+                     3: Font(bold=True, size=11, color=color(theme.secondary))}
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill("solid", fgColor=color(theme.table_header))
+    note_font = Font(italic=True, color=color(theme.note_text))
+    note_fill = PatternFill("solid", fgColor=color(theme.note_bg))
+    action_font = Font(bold=True, color=color(theme.accent))
+    wrap = Alignment(wrap_text=True, vertical="top")
+
+    wb = Workbook(write_only=True)
+    used, seen_title = set(), False
+
+    for index, section in enumerate(doc.sections):
+        heading = next((block[2] for block in section if block[0] == "heading"), "")
+        ws = wb.create_sheet(FIRST_SHEET if index == 0 else sheet_title(heading, used))
+        if index == 0:
+            used.add(FIRST_SHEET.lower())
+        for column, width in column_widths(section).items():   # before the first row
+            ws.column_dimensions[get_column_letter(column + 1)].width = width
+
+        def cell(value, font=None, fill=None, number_format=None, table=False):
+            c = WriteOnlyCell(ws, value=value)
+            if font is not None:
+                c.font = font
+            if fill is not None:
+                c.fill = fill
+            if number_format:
+                c.number_format = number_format
+            if table and isinstance(value, str) and len(value) > MAX_WIDTH:   # text outside tables
+                c.alignment = wrap                                              # overflows instead
+            return c
+
+        front_matter, first = False, True
+        for block in section:
+            kind = block[0]
+            if kind == "heading":
+                level, text = block[1], plain(block[2])
+                if not first:
+                    ws.append([])
+                font = title_font if level == 1 else heading_fonts.get(level, heading_fonts[3])
+                ws.append([cell(text, font)])
+            elif kind == "paragraph" and front_matter:   # the lines under the title, one per row
+                for line in block[1]:
+                    ws.append([cell(plain(line))])
+            elif kind == "paragraph":
+                text = " ".join(line.strip() for line in block[1])
+                ws.append([cell(plain(text), action_font if text.startswith(ACTION_PREFIXES) else None)])
+            elif kind == "quote":
+                for line in block[1]:
+                    ws.append([cell(plain(line), note_font, note_fill)])
+            elif kind == "list_item":
+                ws.append([cell(f"{'  ' * block[1]}{block[2]} {plain(block[3])}")])
+            elif kind == "code":
+                for line in block[1].splitlines():
+                    ws.append([cell(line)])
+            elif kind == "table":
+                headers, table_rows, types = block[1], block[2], block[3]
+                n = len(headers)
+                ws.append([cell(plain(h), header_font, header_fill, table=True) for h in (*headers, NOTES_HEADER)])
+                for row in table_rows:
+                    row = (tuple(row) + ("",) * n)[:n]
+                    ws.append([cell(cell_value(text, types[i]),
+                                    number_format="DD/MM/YYYY" if types[i] == "date" else None, table=True)
+                               for i, text in enumerate(row)])
+                ws.append([])
+            # "hr" only separates sections, which are sheets here
+            if block[:2] == ("heading", 1) and not seen_title:
+                seen_title = front_matter = True
+            else:
+                front_matter = front_matter and kind == "paragraph"
+            first = first and kind == "hr"
+
+    if not doc.sections:
+        wb.create_sheet(FIRST_SHEET)
+    wb.save(dest)
+    return len(wb.worksheets)
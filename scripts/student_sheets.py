@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""Render one PDF sheet per student (fitxa de l'alumne) for a whole school.
+
+The Python counterpart of the ``/api/students/[id]/export-pdf`` route, for the
+start of the year when tutors need every sheet at once. Sheets are built
+with the md_to_pdf style system (theme colours, make_table, make_note_box and
+the add_page_number header/footer) and rendered across a process pool. Each
+worker loads reportlab, the paragraph styles and the decoded logo once, then
+reuses them for every student it is given.
+
+Usage:
+    python student_sheets.py students.json --out-dir /tmp/fitxes -j 4
+    python student_sheets.py students.jsonl --year 2025-2026
+    python student_sheets.py students.json --output-profile screen   # smaller, for email
+
+The dump is a JSON array (or JSON lines) with one object per student: the
+clickedu_students columns (first_name, last_name, class_name, idalu, ...)
+plus optional "yearly" (student_yearly_data of the current year), "nese"
+(student_nese_data) and "history" (yearly rows of every year, each with a
+"year" name).
+"""
+
+from functools import lru_cache
+from types import SimpleNamespace
+from xml.sax.saxutils import escape
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+
+from reportlab.lib.enums import TA_RIGHT
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import Flowable, HRFlowable, Paragraph, Spacer, Table, TableStyle
+
+import md_to_pdf
+from md_to_pdf import CM, DEFAULT_PROFILE, DEFAULT_THEME, get_styles, image_for, make_note_box, make_table
+
+default_logo = md_to_pdf.header_logo
+LOGO_WIDTH = 4.5 * CM
+
+# Chunk of students sent to a worker per task: amortizes the pickling and
+# scheduling of a task without leaving workers idle at the end of the batch
+CHUNK = 16
+
+ENUM_LABELS = {
+    "estat": {"resolt": "Resolt", "pendent": "Pendent"},
+    "informe_eap": {
+        "sense_informe": "Sense informe",
+        "nese_annex1": "NESE (Annex 1)",
+        "nee_annex1i2": "NEE (Annex 1 i 2)",
+    },
+    "nise": {"nise": "NISE", "sls": "SLS", "no": "No"},
+    "mesura_nese": {
+        "pi": "PI",
+        "pi_curricular": "PI curricular",
+        "pi_no_curricular": "PI no curricular",
+        "pi_nouvingut": "PI nouvingut",
+        "dua_misu": "DUA / MISU",
+        "no_mesures": "Sense mesures",
+    },
+    "beca_mec": {
+        "sollicitada_curs_actual": "Sol·licitada curs actual",
+        "candidat_proper_curs": "Candidat proper curs",
+        "no_candidat_mec": "No candidat MEC",
+    },
+}
+
+YEARLY_FIELDS = [
+    ("dades_familiars", "Dades familiars rellevants"),
+    ("academic", "Acadèmic"),
+    ("comportament", "Comportament / Convivència"),
+    ("acords_tutoria", "Acords des de Tutoria"),
+    ("observacions", "Observacions"),
+]
+
+NESE_FIELDS = [
+    ("cad", "CAD"),
+    ("informe_diagnostic", "Informe diagnòstic"),
+    ("materies_pi", "Matèries PI"),
+    ("eixos_pi", "Eixos PI"),
+    ("nac_pi", "NAC PI"),
+    ("nac_final", "NAC Final"),
+    ("serveis_externs", "Serveis externs actuals"),
+    ("observacions_curs", "Observacions curs actual"),
+    ("dades_rellevants_historic", "Dades rellevants (Històric)"),
+]
+
+
+def enum_label(field, value):
+    if not value:
+        return "-"
+    return ENUM_LABELS.get(field, {}).get(value, value)
+
+
+def bool_text(value):
+    return "Sí" if value else "No"
+
+
+def text(value):
+    """Paragraph markup for a free-text database value."""
+    if value in (None, ""):
+        return "-"
+    return escape(str(value)).replace("\n", "<br/>")
+
+
+def etapa_label(class_name):
+    if class_name.startswith("I"):
+        return "Infantil"
+    if class_name.startswith("P"):
+        return "Primària"
+    return "Secundària"
+
+
+def sheet_filename(student):
+    name = f"fitxa-{student.get('last_name', '')}-{student.get('first_name', '')}"
+    name = unicodedata.normalize("NFD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    name = re.sub(r"-+", "-", re.sub(r"[^a-zA-Z0-9._-]", "-", name))
+    return name.lower().strip("-") + ".pdf"
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# WORKER RESOURCES
+# ═══════════════════════════════════════════════════════════════════════
+class Logo(Flowable):
+    """Draws an image decoded once per process by md_to_pdf.image_for."""
+
+    def __init__(self, reader, width):
+        super().__init__()
+        iw, ih = reader.getSize()
+        self.reader, self.width, self.height = reader, width, width * ih / iw
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, self.width, self.height, mask="auto")
+
+
+@lru_cache(maxsize=None)
+def sheet_styles(theme=DEFAULT_THEME):
+    """md_to_pdf styles plus the few the sheet header needs (once per process)."""
+    st = SimpleNamespace(**vars(get_styles(theme)))
+    st.style_student = ParagraphStyle(
+        "StudentName", parent=st.style_h1, fontSize=16, leading=19,
+        alignment=TA_RIGHT, spaceBefore=0, spaceAfter=2,
+    )
+    st.style_student_meta = ParagraphStyle(
+        "StudentMeta", parent=st.style_subtitle, fontSize=9, alignment=TA_RIGHT, spaceAfter=0,
+    )
+    st.style_label = ParagraphStyle(
+        "FieldLabel", parent=st.style_table_cell, textColor=st.muted,
+    )
+    return st
+
+
+def _init_worker(theme, logo, profile=DEFAULT_PROFILE):
+    """Warm every shared resource before the first student arrives."""
+    sheet_styles(theme)
+    image_for(logo, LOGO_WIDTH, profile)   # the same call as render_sheet's, so it hits the cache
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# SHEET
+# ═══════════════════════════════════════════════════════════════════════
+def field_table(st, fields, record):
+    """Label / value rows for the free-text fields of a record."""
+    widths = [st.avail * 0.28, st.avail * 0.72]
+    rows = [[Paragraph(label, st.style_label), Paragraph(text(record.get(key)), st.style_table_cell)]
+            for key, label in fields]
+    t = Table(rows, colWidths=widths)
+    t.setStyle(TableStyle([
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("LINEBELOW", (0, 0), (-1, -1), 0.5, st.border_color),
+        ("TOPPADDING", (0, 0), (-1, -1), 4),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+    ]))
+    return t
+
+
+def inline_row(st, fields):
+    """One-row table of short label/value pairs (estat, NISE, ...)."""
+    return make_table(st, [label for label, _ in fields], [[escape(value) for _, value in fields]])
+
+
+def sheet_flowables(st, student, year_name, logo, date=None):
+    yearly = student.get("yearly") or {}
+    nese = student.get("nese")
+    class_name = student.get("class_name") or ""
+
+    meta = [class_name, etapa_label(class_name)]
+    if student.get("idalu"):
+        meta.append(f"IDALU {student['idalu']}")
+    meta.append(f"Curs {year_name or '-'}")
+    right = [
+        Paragraph(escape(f"{student.get('last_name', '')}, {student.get('first_name', '')}"),
+                  st.style_student),
+        Paragraph(escape(" · ".join(meta)), st.style_student_meta),
+    ]
+    if date is None:
+        date = md_to_pdf.build_date().strftime("%d/%m/%Y")
+    if date:
+        right.append(Paragraph(date, st.style_student_meta))
+    logo_cell = Logo(logo, LOGO_WIDTH) if logo is not None else ""
+    header = Table([[logo_cell, right]], colWidths=[5 * CM, st.avail - 5 * CM])
+    header.setStyle(TableStyle([
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("LEFTPADDING", (0, 0), (-1, -1), 0),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 0),
+    ]))
+    story = [header, HRFlowable(width="100%", thickness=1, color=st.primary, spaceBefore=4, spaceAfter=6)]
+
+    story.append(Paragraph("Traspàs de tutoria - Dades bàsiques", st.style_h1))
+    story.append(inline_row(st, [
+        ("Estat", enum_label("estat", yearly.get("estat"))),
+        ("Graella NESE", bool_text(yearly.get("graella_nese"))),
+        ("Curs repetició", yearly.get("curs_repeticio") or "-"),
+    ]))
+    story.append(Spacer(1, 6))
+    story.append(field_table(st, YEARLY_FIELDS, yearly))
+
+    story.append(Paragraph("Dades NESE", st.style_h1))
+    if nese:
+        story.append(Paragraph("Dades administratives", st.style_h2))
+        story.append(inline_row(st, [
+            ("Data incorporació", nese.get("data_incorporacio") or "-"),
+            ("SSD", bool_text(nese.get("ssd"))),
+        ]))
+        story.append(Spacer(1, 6))
+        story.append(field_table(st, [("escolaritzacio_previa", "Escolarització prèvia")], nese))
+
+        story.append(Paragraph("Seguiment POE / MESI", st.style_h2))
+        story.append(inline_row(st, [
+            ("Reunió POE", bool_text(nese.get("reunio_poe"))),
+            ("Reunió MESI", bool_text(nese.get("reunio_mesi"))),
+            ("Reunió EAP", bool_text(nese.get("reunio_eap"))),
+        ]))
+        story.append(Spacer(1, 6))
+        story.append(inline_row(st, [
+            ("Informe EAP", enum_label("informe_eap", nese.get("informe_eap"))),
+            ("NISE", enum_label("nise", nese.get("nise"))),
+            ("Mesura NESE", enum_label("mesura_nese", nese.get("mesura_nese"))),
+            ("Beca MEC", enum_label("beca_mec", nese.get("beca_mec"))),
+        ]))
+
+        story.append(Paragraph("Seguiment tutoria", st.style_h2))
+        story.append(inline_row(st, [("Curs retenció", nese.get("curs_retencio") or "-")]))
+        story.append(Spacer(1, 6))
+        story.append(field_table(st, NESE_FIELDS, nese))
+    else:
+        story.append(make_note_box(st, "No hi ha dades NESE per aquest curs."))
+
+    story.append(Paragraph("Evolució per cursos", st.style_h1))
+    history = student.get("history") or []
+    if not history:
+        story.append(make_note_box(st, "No hi ha dades d'evolució disponibles."))
+    for yd in history:
+        tags = [f"Curs {yd.get('year') or 'Desconegut'}"]
+        if yd.get("graella_nese"):
+            tags.append("[NESE]")
+        if yd.get("estat"):
+            tags.append("[Resolt]" if yd["estat"] == "resolt" else "[Pendent]")
+        if yd.get("curs_repeticio"):
+            tags.append(f"[Rep: {yd['curs_repeticio']}]")
+        story.append(Paragraph(escape("  ".join(tags)), st.style_h2))
+        filled = [(key, label) for key, label in YEARLY_FIELDS if yd.get(key)]
+        if filled:
+            story.append(field_table(st, filled, yd))
+        else:
+            story.append(Paragraph("<i>Sense dades registrades</i>", st.style_body))
+    return story
+
+
+def render_sheet(student, dest, year_name=None, theme=DEFAULT_THEME, logo=default_logo, profile=DEFAULT_PROFILE):
+    """Render one student's sheet to ``dest`` (path or binary file); returns pages."""
+    st = sheet_styles(theme)
+    meta = md_to_pdf.new_meta(profile.deterministic)
+    meta["title"] = f"Fitxa de {student.get('first_name', '')} {student.get('last_name', '')}"
+    doc = md_to_pdf.new_doc(dest, st, meta, profile)
+    doc.logo = image_for(logo, LOGO_WIDTH, profile)   # the page header reuses it: embedded once
+    with md_to_pdf.output_settings(profile):
+        doc.build(sheet_flowables(st, student, year_name, doc.logo, meta["date"]),
+                  onFirstPage=md_to_pdf.add_page_number, onLaterPages=md_to_pdf.add_page_number)
+    return doc.page
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# BATCH
+# ═══════════════════════════════════════════════════════════════════════
+def _render_chunk(tasks, year_name, theme, logo, profile=DEFAULT_PROFILE):
+    results = []
+    for student, dest in tasks:
+        start = time.perf_counter()
+        try:
+            pages = render_sheet(student, dest, year_name, theme, logo, profile)
+            results.append({"dest": dest, "pages": pages, "seconds": time.perf_counter() - start})
+        except Exception as exc:  # reported in the summary, the batch goes on
+            results.append({"dest": dest, "error": f"{type(exc).__name__}: {exc}"})
+    return os.getpid(), md_to_pdf.peak_rss_mb(), results
+
+
+def load_students(path):
+    with open(path, encoding="utf-8") as fh:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in fh if line.strip()]
+        data = json.load(fh)
+    return data.get("students", []) if isinstance(data, dict) else data
+
+
+def render_sheets(students, out_dir, year_name=None, jobs=None, theme=DEFAULT_THEME, logo=default_logo,
+                  profile=DEFAULT_PROFILE):
+    """Render every student's sheet into ``out_dir``.
+
+    Returns (results, workers): one stats dict per student, in input order,
+    and {pid: peak RSS in MB} for every process that rendered sheets.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tasks, used = [], set()
+    for student in students:
+        name = sheet_filename(student)
+        if name in used:   # two students with the same name
+            name = name[:-4] + f"-{student.get('idalu') or student.get('id') or len(used)}.pdf"
+        used.add(name)
+        tasks.append((student, os.path.join(out_dir, name)))
+    chunks = [tasks[i:i + CHUNK] for i in range(0, len(tasks), CHUNK)]
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(chunks)))
+
+    results, workers = [], {}
+    for pid, rss, chunk_results in md_to_pdf.pool_map(
+            _render_chunk, [(chunk, year_name, theme, logo, profile) for chunk in chunks],
+            jobs, _init_worker, (theme, logo, profile)):
+        workers[pid] = max(rss, workers.get(pid, 0))
+        results.extend(chunk_results)
+    return results, workers
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("students", help="student dump (.json array or .jsonl)")
+    parser.add_argument("--out-dir", default="fitxes", help="directory for the PDFs")
+    parser.add_argument("--year", help="current school year name, e.g. 2025-2026")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--logo", default=default_logo, help="logo image for the sheet header")
+    parser.add_argument("--output-profile", choices=sorted(md_to_pdf.PROFILES), default=DEFAULT_PROFILE.name,
+                        help="see md_to_pdf.PROFILES (default: %(default)s)")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="fixed timestamps and IDs, so identical dumps give identical PDFs")
+    args = parser.parse_args(argv)
+    profile = md_to_pdf.PROFILES[args.output_profile]
+    if args.deterministic:
+        profile = profile._replace(deterministic=True)
+
+    students = load_students(args.students)
+    if not students:
+        parser.error("no students in the dump")
+    start = time.perf_counter()
+    results, workers = render_sheets(students, args.out_dir, args.year, args.jobs, logo=args.logo,
+                                     profile=profile)
+    wall = time.perf_counter() - start
+
+    failed = [r for r in results if "error" in r]
+    for r in failed:
+        print(f"FAILED {os.path.basename(r['dest'])}: {r['error']}")
+    pages = sum(r.get("pages", 0) for r in results)
+    print(f"{len(results)} sheets ({pages} pages, {len(failed)} failed) in {wall:.2f}s: "
+          f"{len(results) / wall:.1f} students/s")
+    for pid, rss in sorted(workers.items()):
+        print(f"  worker {pid}: peak RSS {rss:.0f} MB")
+    print(f"Output: {os.path.abspath(args.out_dir)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
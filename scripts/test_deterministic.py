@@ -0,0 +1,63 @@
+"""Behaviour checks for deterministic output (the archive profile): the same
+source gives the same bytes, whenever and however it is rendered.
+
+Run from the repository root or from scripts/:
+    python -m pytest -q scripts
+"""
+
+import io
+import os
+import time
+
+import pytest
+
+import md_to_pdf
+
+ARCHIVE = md_to_pdf.PROFILES["archive"]
+SOURCE = "# Informe\n\n## Primera\n\nUn paràgraf.\n\n## Segona\n\n| A | B |\n|---|---|\n| 1 | 2 |\n"
+
+
+def render(path, profile=ARCHIVE):
+    out = io.BytesIO()
+    md_to_pdf.render(str(path), out, profile=profile)
+    return out.getvalue()
+
+
+def page_text(data):
+    pymupdf = pytest.importorskip("pymupdf")
+    return pymupdf.open("pdf", data)[0].get_text()
+
+
+def test_same_bytes_across_time_and_mtime(tmp_path, monkeypatch):
+    monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+    source = tmp_path / "informe.md"
+    source.write_text(SOURCE, encoding="utf-8")
+    first = render(source)
+    time.sleep(1.1)   # PDF dates have one-second resolution
+    os.utime(source, (0, 0))
+    assert render(source) == first
+    assert render(source, md_to_pdf.DEFAULT_PROFILE) != first
+    assert time.strftime("%d/%m/%Y") not in page_text(first)   # no build date without SOURCE_DATE_EPOCH
+
+
+def test_source_date_epoch_sets_the_date(tmp_path, monkeypatch):
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1760000000")   # 2025-10-09 UTC
+    source = tmp_path / "informe.md"
+    source.write_text(SOURCE, encoding="utf-8")
+    first = render(source)
+    assert render(source) == first
+    assert "09/10/2025" in page_text(first)
+
+
+def test_parallel_layout_is_deterministic(tmp_path, monkeypatch):
+    pytest.importorskip("pymupdf")
+    from bench_pdf import synthetic_blocks
+    from pdf_parallel import render_parallel
+
+    monkeypatch.delenv("SOURCE_DATE_EPOCH", raising=False)
+    outputs = []
+    for _ in range(2):
+        out = io.BytesIO()
+        render_parallel(synthetic_blocks(200), out, jobs=2, profile=ARCHIVE)
+        outputs.append(out.getvalue())
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,91 @@
+"""Behaviour checks for excel_ingest: course names and the rows of a sheet.
+
+Run from the repository root or from scripts/:
+    python -m pytest -q scripts
+"""
+
+import pytest
+
+from excel_ingest import Course, iter_sheet, iter_workbook, parse_course
+
+P3 = Course("primaria", 3)
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# COURSES
+# ═══════════════════════════════════════════════════════════════════════
+@pytest.mark.parametrize("text, expected", [
+    ("I4", Course("infantil", 4)),
+    ("P5", Course("infantil", 5)),
+    ("2n PRI A", Course("primaria", 2)),
+    ("4t ESO B", Course("eso", 4)),
+    ("3r a 4t", Course("primaria", 4)),        # "from a to": the target course
+    ("I5 a 1r", Course("primaria", 1)),        # the level goes down: next etapa
+    ("6è a 1r", Course("eso", 1)),
+    ("Alumnes", None),
+])
+def test_parse_course(text, expected):
+    assert parse_course(text) == expected
+
+
+def test_course_labels():
+    assert parse_course("I5 a 1r").label == "Primer de Primària"
+    assert parse_course("6è a 1r").label == "Primer d'ESO"
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# SHEETS
+# ═══════════════════════════════════════════════════════════════════════
+TRASPASS_ROWS = [
+    ("TRASPÀS 3r PRIMÀRIA", None, None),
+    (None, None, None),
+    ("Nom", "Observacions", "Graella NESE", "Acadèmic"),   # any column order
+    ("Anna Puig", "cap", "Sí", "Bé"),
+    ("* Marcar amb una creu", None, None, None),
+    (None, "sense nom", None, None),
+    ("Si cal, afegiu files", None, None, None),
+    ("Nom Cognom", "exemple", None, None),
+    ("  Pau Vila  ",),                                     # a short row
+]
+
+
+def test_iter_sheet_maps_the_header_and_skips_garbage():
+    records = list(iter_sheet(iter(TRASPASS_ROWS), "traspass", "primaria", P3))
+    assert [(r.name, r.graella_nese, r.academic, r.observacions) for r in records] == [
+        ("Anna Puig", "Sí", "Bé", "cap"),
+        ("Pau Vila", None, None, None),
+    ]
+    assert records[0].source == "Traspàs PRI"
+    assert records[0].course == P3 and records[0].nise is None
+
+
+def test_iter_sheet_nese_header_spans_two_rows():
+    rows = [
+        ("Alumne/a", "NISE", "SSD", "Mesures NESE", "Dades rellevants"),
+        (None, "Sí/No", None, "Ordinàries", None),
+        ("Joan Soler", "NISE", "No", "Suport", "Dislèxia"),
+    ]
+    [record] = iter_sheet(iter(rows), "nese", "primaria", P3)
+    assert (record.name, record.nise, record.ssd, record.mesura_nese, record.dades_rellevants) == (
+        "Joan Soler", "NISE", "No", "Suport", "Dislèxia")
+
+
+def test_iter_sheet_without_a_header():
+    rows = [("Anna Puig", "x")] * 20
+    assert list(iter_sheet(iter(rows), "traspass", "primaria", P3)) == []
+
+
+def test_iter_workbook(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    path = tmp_path / "Traspàs PRI 2025.xlsx"
+    wb = openpyxl.Workbook()
+    wb.active.title = "3r a 4t"
+    for row in TRASPASS_ROWS:
+        wb.active.append(row)
+    wb.save(path)
+
+    records = list(iter_workbook(str(path)))
+    assert [(r.kind, r.etapa, r.course, r.name) for r in records] == [
+        ("traspass", "primaria", Course("primaria", 4), "Anna Puig"),
+        ("traspass", "primaria", Course("primaria", 4), "Pau Vila"),
+    ]
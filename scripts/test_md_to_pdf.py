@@ -0,0 +1,121 @@
+"""Behaviour checks for md_to_pdf: markdown tokenizing, inline markup and the
+streamed story.
+
+Run from the repository root or from scripts/:
+    python -m pytest -q scripts
+"""
+
+import io
+
+import pytest
+
+import md_to_pdf
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# MARKDOWN
+# ═══════════════════════════════════════════════════════════════════════
+SOURCE = """\
+# Títol
+
+**Data**: 22 de febrer de 2026
+segona línia
+
+> **Nota**: una
+> - dos
+
+| Nom | Detall |
+|-----|--------|
+| Anna | a \\| b |
+| Pau |
+
+- u
+  - dos
+1. tres
+
+```
+codi
+```
+
+---
+"""
+
+
+def test_iter_blocks():
+    assert list(md_to_pdf.iter_blocks(io.StringIO(SOURCE))) == [
+        ("heading", 1, "Títol"),
+        ("paragraph", ["**Data**: 22 de febrer de 2026", "segona línia"]),
+        ("quote", ["**Nota**: una", "- dos"]),
+        ("table", ["Nom", "Detall"], [["Anna", "a | b"], ["Pau"]]),
+        ("list_item", 0, "-", "u"),
+        ("list_item", 1, "-", "dos"),
+        ("list_item", 0, "1.", "tres"),
+        ("code", "codi"),
+        ("hr",),
+    ]
+
+
+def test_inline_applies_emphasis_across_code_spans():
+    assert md_to_pdf.inline("**marcats com a `graella_nese = true`** al traspàs") == (
+        '<b>marcats com a <font name="Courier">graella_nese = true</font></b> al traspàs')
+    assert md_to_pdf.inline("`a**b**` i `x<y`") == (
+        '<font name="Courier">a**b**</font> i <font name="Courier">x&lt;y</font>')
+    assert md_to_pdf.inline("sense marques") == "sense marques"
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("## Migració a C#", ("heading", 2, "Migració a C#")),
+    ("### Tancada ###", ("heading", 3, "Tancada")),
+])
+def test_heading_closing_hashes(line, expected):
+    assert list(md_to_pdf.iter_blocks(io.StringIO(line + "\n"))) == [expected]
+
+
+def test_inline_link_target_is_a_valid_attribute():
+    assert md_to_pdf.inline('[a](http://x"y)', link_color="#000") == (
+        '<link href="http://x&quot;y" color="#000">a</link>')
+
+
+def test_iter_blocks_streams_its_input():
+    def lines():
+        yield from ("# Títol\n", "\n", "primer\n", "\n")
+        raise AssertionError("read past the blocks asked for")
+
+    blocks = md_to_pdf.iter_blocks(lines())
+    assert next(blocks) == ("heading", 1, "Títol")
+    assert next(blocks) == ("paragraph", ["primer"])
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# RENDER
+# ═══════════════════════════════════════════════════════════════════════
+def test_lazy_story_pulls_only_what_platypus_looks_at():
+    pulled = []
+
+    def flowables():
+        for i in range(1000):
+            pulled.append(i)
+            yield i
+
+    story = md_to_pdf.LazyStory(flowables())
+    assert len(story) == len(pulled) == story.LOOKAHEAD
+    assert story[0] == 0
+    del story[0]
+    story.insert(0, "remainder")   # a split puts the rest of a flowable back in front
+    assert story[0:2] == ["remainder", 1]
+    assert story.count == len(pulled) < 2 * story.LOOKAHEAD
+
+
+def test_render_on_an_untested_reportlab_takes_the_stock_path(monkeypatch):
+    pymupdf = pytest.importorskip("pymupdf")
+    from bench_pdf import synthetic_blocks
+
+    monkeypatch.setattr(md_to_pdf, "REPORTLAB_TESTED", ((0, 0), (0, 1)))
+    md_to_pdf.reportlab_internals.cache_clear()
+    try:
+        out = io.BytesIO()
+        md_to_pdf.render_blocks(synthetic_blocks(50), out)
+    finally:
+        md_to_pdf.reportlab_internals.cache_clear()
+    doc = pymupdf.open("pdf", out.getvalue())
+    assert f"Pàgina 1 de {doc.page_count}" in doc[0].get_text()
@@ -0,0 +1,53 @@
+"""Behaviour checks for pdf_tables.LongTable: page-sized chunks in order, with
+the row striping carried across them.
+
+Run from the repository root or from scripts/:
+    python -m pytest -q scripts
+"""
+
+import md_to_pdf
+from pdf_tables import LongTable, make_header_cells
+
+WIDTHS = [200, 200]
+
+
+def split_all(table, height=700):
+    """The Tables a LongTable is split into, page after page, and their start rows."""
+    chunks = []
+    while True:
+        table.wrap(sum(WIDTHS), height)
+        start = table.start
+        parts = table.split(sum(WIDTHS), height)
+        chunks.append((start, parts[0]))
+        if len(parts) == 1:
+            return chunks
+        table = parts[1]
+
+
+def test_long_table_splits_in_order_with_continuous_stripes():
+    st = md_to_pdf.get_styles()
+    rows = [[f"r{i}", "línia llarga " * 20 if i % 17 == 0 else "x"] for i in range(300)]
+    header = make_header_cells(st, ["Nom", "Detall"], [w - 12 for w in WIDTHS])
+    chunks = split_all(LongTable(st, header, rows, WIDTHS))
+
+    assert len(chunks) > 2
+    seen = []
+    for start, chunk in chunks:
+        data = chunk._cellvalues
+        assert data[0] == header   # the header is repeated on every page
+        seen.extend(row[0] for row in data[1:])
+        stripes = chunk._bkgrndcmds[-1][3]
+        for offset in range(len(data) - 1):
+            # the colour of each row depends on its row number in the whole table
+            assert stripes[offset % 2] == [None, st.table_alt][(start + offset) % 2]
+    assert seen == [row[0] for row in rows]
+    assert any(start % 2 for start, _ in chunks[1:])   # a chunk started on an odd row
+
+
+def test_short_long_table_is_one_chunk():
+    st = md_to_pdf.get_styles()
+    header = make_header_cells(st, ["Nom", "Detall"], [w - 12 for w in WIDTHS])
+    table = LongTable(st, header, [["a", "b"]] * 3, WIDTHS)
+    assert table.wrap(sum(WIDTHS), 700)[1] < 700
+    [(start, chunk)] = split_all(table)
+    assert start == 0 and len(chunk._cellvalues) == 4
@@ -0,0 +1,51 @@
+"""Behaviour checks for the table of contents and the "Pàgina X de Y" footers,
+on a render reopened with PyMuPDF.
+
+Run from the repository root or from scripts/:
+    python -m pytest -q scripts
+"""
+
+import io
+import zlib
+
+import pytest
+
+import md_to_pdf
+
+
+def test_render_footers_toc_and_page_streams():
+    pymupdf = pytest.importorskip("pymupdf")
+    from bench_pdf import synthetic_blocks
+
+    out = io.BytesIO()
+    stats = md_to_pdf.render_blocks(synthetic_blocks(300), out, toc=True)
+    doc = pymupdf.open("pdf", out.getvalue())
+    total = doc.page_count
+    assert total == stats["pages"] > 3
+
+    for number, page in enumerate(doc, 1):
+        # "Pàgina X de Y" is spliced into each sealed page's deflate stream
+        # (seal_previous_page / finish_page): every stream must still inflate
+        # with a valid checksum, and the footer must be there.
+        for xref in page.get_contents():
+            zlib.decompress(doc.xref_stream_raw(xref))
+        assert f"Pàgina {number} de {total}" in page.get_text()
+
+    # The TOC's page numbers, top to bottom, are the pages of the headings
+    outline = doc.get_toc()
+    toc_page = doc[0]
+    numbers = [(word[1], int(word[4])) for word in toc_page.get_text("words")
+               if word[4].isdigit() and word[0] > toc_page.rect.width * 0.8
+               and word[1] < md_to_pdf.PAGE_H - md_to_pdf.BOTTOM_MARGIN]
+    assert [n for _, n in sorted(numbers)] == [page for _, _, page in outline]
+    for _, title, page in outline:
+        assert title in doc[page - 1].get_text()
+
+
+def test_toc_takes_a_single_layout_pass():
+    from bench_pdf import synthetic_blocks
+    from render_profile import Profiler
+
+    profiler = Profiler()
+    stats = md_to_pdf.render_blocks(synthetic_blocks(300), io.BytesIO(), toc=True, profiler=profiler)
+    assert profiler.pages == stats["pages"]   # every page laid out once
@@ -0,0 +1,88 @@
+"""Behaviour checks for reconcile: name matching and the report data.
+
+Run from the repository root or from scripts/:
+    python -m pytest -q scripts
+"""
+
+import pytest
+
+from excel_ingest import Course, Record
+from reconcile import Student, StudentIndex, name_tokens, reconcile
+
+P4, P3, ESO1 = Course("primaria", 4), Course("primaria", 3), Course("eso", 1)
+
+STUDENTS = [
+    Student("Pengxiang", "Yin", P4, False),
+    Student("Maria", "García López", P3, False),
+    Student("Maria", "García López", ESO1, False),
+    Student("Marc", "Soler Vidal", P4, False),
+    Student("Marc", "Soler Vidal", P4, True),
+    Student("Roumayssae", "Maalem", P4, False),
+]
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# MATCHING
+# ═══════════════════════════════════════════════════════════════════════
+def test_name_tokens_reorders_surnames_first():
+    assert name_tokens("García López, María") == ["MARIA", "GARCIA", "LOPEZ"]
+    assert name_tokens("M. Soler") == ["M", "SOLER"]
+
+
+@pytest.mark.parametrize("name, course, expected", [
+    ("Pengxiang Yin", None, 0),
+    ("YIN PENGXIANG", None, 0),                # word order ignored
+    ("Yin, Pengxiang", None, 0),               # "Cognoms, Nom"
+    ("Pengxian Yin", None, 0),                 # one letter missing
+    ("Roumaysae Maalem", P4, 5),               # typo, with a course
+    ("María García López", ESO1, 2),           # same name: the course decides
+    ("María García López", P3, 1),
+    ("María García López", None, None),        # same name, no course: ambiguous
+    ("Marc Soler Vidal", P4, None),            # same name and course: ambiguous
+    ("Anna Puig", None, None),                 # nobody
+    ("", None, None),
+])
+def test_match(name, course, expected):
+    assert StudentIndex(STUDENTS).match(name, course) == expected
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# RECONCILIATION
+# ═══════════════════════════════════════════════════════════════════════
+I3 = Course("infantil", 3)
+
+CLICKEDU = [
+    Student("Anna", "Puig", P3, False),        # transfer, flagged: nothing to report
+    Student("Pau", "Vila", P4, False),         # no transfer and NESE unflagged: sections 1 and 3
+    Student("Nil", "Roca", I3, False),         # no transfer, but new to the school
+    Student("Joan", "Soler", ESO1, False),     # transfer, NESE unflagged: section 3 only
+]
+
+
+def traspass(name, course, graella=None):
+    return Record("traspass", course.etapa, course, name, graella_nese=graella)
+
+
+def nese(name, course, **fields):
+    return Record("nese", course.etapa, course, name, **fields)
+
+
+def test_reconcile():
+    result = reconcile(CLICKEDU, [
+        traspass("Puig, Anna", P3),
+        traspass("Puig, Anna", P3, graella="Sí"),        # listed again: the later row counts
+        traspass("Soler, Joan", ESO1, graella="no"),
+        traspass("Marta Desconeguda", P3),
+        nese("Pau Vila", P4, observacions="Dislèxia"),
+        nese("Joan Soler", ESO1),
+        nese("Anna Puig", P3),
+        nese("Marta Desconeguda", P3, observacions="Nova"),
+    ])
+    assert result.missing_transfer == [CLICKEDU[1]]
+    assert result.excluded_i3 == 1
+    assert [(s, r.name) for s, r in result.nese_unflagged] == [
+        (CLICKEDU[1], "Pau Vila"), (CLICKEDU[3], "Joan Soler")]
+    assert result.overlap_1_3 == [CLICKEDU[1]]
+    # one unknown person from two workbooks, with the first note found
+    assert result.unknown == [("Marta Desconeguda", P3, ["Traspàs PRI", "NESE PRI"], "Nova")]
+    assert result.unknown_records == 2
@@ -0,0 +1,73 @@
+"""Behaviour checks for render_cache and the cached render paths of md_to_pdf.
+
+Run from the repository root or from scripts/:
+    python -m pytest -q scripts
+"""
+
+import os
+
+import md_to_pdf
+from render_cache import RenderCache, make_key
+
+SOURCE = """\
+# Informe
+
+## Primera
+
+Un paràgraf.
+
+## Segona
+
+Un altre.
+"""
+
+
+def test_make_key_separates_its_parts():
+    assert make_key("ab", "c") != make_key("a", "bc")
+    assert make_key("a", b"b") == make_key("a", "b")
+
+
+def test_render_reuses_the_document_then_the_unchanged_sections(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"))
+    source, dest = tmp_path / "doc.md", str(tmp_path / "doc.pdf")
+    source.write_text(SOURCE, encoding="utf-8")
+
+    assert md_to_pdf.render(str(source), dest, cache=cache)["cache"] == "miss"
+    first = open(dest, "rb").read()
+    assert md_to_pdf.render(str(source), dest, cache=cache)["cache"] == "hit"
+    assert open(dest, "rb").read() == first
+
+    source.write_text(SOURCE.replace("Un altre.", "Un altre, canviat."), encoding="utf-8")
+    stats = md_to_pdf.render(str(source), dest, cache=cache)
+    assert stats["cache"] == "miss"
+    assert stats["sections_reused"] == stats["sections"] - 1
+
+    theme = md_to_pdf.DEFAULT_THEME._replace(primary="#000000")
+    assert md_to_pdf.render(str(source), dest, theme, cache)["cache"] == "miss"
+
+
+def test_evicts_least_recently_used_entries(tmp_path):
+    cache = RenderCache(str(tmp_path), max_bytes=2500)
+    for n, key in enumerate(("a" * 64, "b" * 64)):
+        cache.put_document_bytes(key, b"x" * 1000)
+        os.utime(cache._path("docs", key, ".pdf"), (n, n))
+    assert cache.get_document("a" * 64, str(tmp_path / "out.pdf"))   # a is now the most recent
+
+    cache.put_document_bytes("c" * 64, b"x" * 1000)
+    assert cache.size <= cache.max_bytes
+    assert not cache.get_document("b" * 64, str(tmp_path / "out.pdf"))
+    assert cache.get_document("a" * 64, str(tmp_path / "out.pdf"))
+    assert cache.get_document("c" * 64, str(tmp_path / "out.pdf"))
+
+
+def test_size_and_clear_leave_other_directories_alone(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=1500)
+    other = tmp_path / "cache" / "fonts" / "face.pkl"
+    other.parent.mkdir(parents=True)
+    other.write_bytes(b"x" * 10_000)
+
+    cache.put_object("d" * 64, ["flowables"])
+    assert cache.get_object("d" * 64) == ["flowables"]
+    assert cache.size < 1500 and other.exists()
+    cache.clear()
+    assert cache.get_object("d" * 64) is None and other.exists()
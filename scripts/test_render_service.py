@@ -0,0 +1,96 @@
+"""Behaviour checks for render_service: request validation, admission and
+recovery from a dead worker, over HTTP.
+
+Run from the repository root or from scripts/:
+    python -m pytest -q scripts
+"""
+
+from http.server import ThreadingHTTPServer
+import http.client
+import json
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+import render_service
+from render_service import BadDocument, document_blocks
+
+
+@pytest.mark.parametrize("body", [
+    b"{",
+    b"[]",
+    b'{"blocks": 5}',
+    b'{"blocks": [["heading", "1", "x"]]}',
+    b'{"blocks": [["table", ["a"], "rows"]]}',
+    b'{"sections": "abc"}',
+    b'{"title": "x", "sections": [{"tables": [{"rows": 5}]}]}',
+    b'{"other": 1}',
+])
+def test_malformed_json_documents(body):
+    with pytest.raises(BadDocument):
+        document_blocks("application/json", body)
+
+
+def test_json_documents():
+    assert document_blocks("application/json", b'{"blocks": [["heading", 1, "T"], ["hr"]]}') == [
+        ("heading", 1, "T"), ("hr",)]
+    assert document_blocks("application/json", b'{"markdown": "# T"}') == [("heading", 1, "T")]
+
+
+@pytest.fixture
+def service():
+    svc = render_service.RenderService(jobs=1, queue=0)
+    handler = type("TestHandler", (render_service.Handler,), {"service": svc})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    httpd.daemon_threads, httpd.verbose = True, False
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    def request(method, path, body=None, content_type="text/markdown"):
+        conn = http.client.HTTPConnection("127.0.0.1", httpd.server_port, timeout=60)
+        conn.request(method, path, body, {"Content-Type": content_type})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+
+    svc.request = request
+    yield svc
+    httpd.shutdown()
+    httpd.server_close()
+    svc.close()
+
+
+def test_render_and_admission(service):
+    status, headers, body = service.request("POST", "/render", "# Hola\n\nUn paràgraf.\n".encode())
+    assert status == 200 and body.startswith(b"%PDF") and headers["X-Render-Pages"] == "1"
+
+    status, _, body = service.request("POST", "/render", b'{"blocks": 5}', "application/json")
+    assert status == 400 and "blocks" in json.loads(body)["error"]
+
+    assert service.slots.acquire(blocking=False)   # the one slot is taken
+    try:
+        status, headers, _ = service.request("POST", "/render", b"# Hola")
+        assert status == 503 and headers["Retry-After"] == "1"
+    finally:
+        service.slots.release()
+    assert service.request("POST", "/render", b"# Hola")[0] == 200
+
+    metrics = service.request("GET", "/metrics")[2].decode()
+    assert 'render_requests_total{path="/render",status="503"} 1' in metrics
+
+
+def test_pool_is_replaced_when_a_worker_dies(service):
+    assert service.request("GET", "/health")[0] == 200
+    for process in list(service.pool._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+    deadline = time.monotonic() + 10
+    while True:   # until the pool notices
+        status, _, body = service.request("GET", "/health")
+        if status != 200 or time.monotonic() > deadline:
+            break
+        time.sleep(0.1)
+    assert status == 503 and json.loads(body)["status"] == "degraded"
+    status, _, body = service.request("GET", "/health")
+    assert status == 200 and json.loads(body)["pool_restarts"] == {"crash": 1}
+    assert service.request("POST", "/render", b"# Hola")[0] == 200
@@ -0,0 +1,76 @@
+"""Behaviour checks for report_ir and its HTML and XLSX writers.
+
+Run from the repository root or from scripts/:
+    python -m pytest -q scripts
+"""
+
+from datetime import datetime
+import io
+
+import pytest
+
+import md_to_pdf
+import report_ir
+from report_html import iter_html
+from report_xlsx import write_xlsx
+
+SOURCE = """\
+# Informe
+
+**Data**: 22 de febrer de 2026
+
+## Alumnes
+
+| Nom | Alumnes | Data | Nota |
+|-----|---------|------|------|
+| **Anna** | 3 | 01/02/2026 | 7 |
+| Pau | — | 03/04/2025 | NP |
+
+---
+
+# Annex
+
+línia u
+línia dos
+"""
+
+
+def parse(source=SOURCE):
+    return report_ir.from_blocks(md_to_pdf.iter_blocks(io.StringIO(source)))
+
+
+def test_document_model():
+    doc = parse()
+    assert (doc.title, doc.date) == ("Informe", "22/02/2026")
+    [table] = [block for block in doc.blocks() if block[0] == "table"]
+    assert table[3] == ("text", "int", "date", "text")   # "—" is an empty cell; "NP" is not a number
+
+
+def test_json_round_trip():
+    doc = parse()
+    assert report_ir.from_json(report_ir.to_json(doc)) == doc
+    with pytest.raises(ValueError):
+        report_ir.from_json('{"ir": "0", "title": "", "date": "", "sections": []}')
+
+
+def test_html_has_one_title():
+    html = "".join(iter_html(parse()))
+    assert html.count('<h1 class="title">') == 1
+    assert "<p>línia u línia dos</p>" in html
+    assert '<td class="num">3</td>' in html
+
+
+def test_xlsx_cells_are_typed(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    dest = tmp_path / "informe.xlsx"
+    assert write_xlsx(parse(), str(dest)) == 3
+
+    wb = openpyxl.load_workbook(dest)
+    assert wb.sheetnames == ["Informe", "Alumnes", "Annex"]
+    rows = [[cell for cell in row if cell is not None] for row in wb["Alumnes"].iter_rows(values_only=True)]
+    assert ["Nom", "Alumnes", "Data", "Nota", "Anotacions"] in rows
+    assert ["Anna", 3, datetime(2026, 2, 1), "7"] in rows
+    assert ["Pau", "—", datetime(2025, 4, 3), "NP"] in rows
+    # only the first level-1 heading is the title: the lines under "Annex" are a paragraph
+    assert [row for row in wb["Annex"].iter_rows(values_only=True)] == [("Annex",), ("línia u línia dos",)]
+    assert [row[0] for row in wb["Informe"].iter_rows(values_only=True)] == ["Informe", "Data: 22 de febrer de 2026"]